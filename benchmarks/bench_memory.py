@@ -0,0 +1,186 @@
+"""Memory benchmarks of the public methods of dicomhandler.
+
+Every case of ``bench_time.py`` is run in a new process over the
+synthetic patients of each size tier. The peak of the Python
+allocations (tracemalloc) and the increase of the peak resident set
+size (RSS) of the process are reported. Each case is run with the file
+it uses, the structure set or the plan, and the cases that use both
+(e.g. ``save``) are run once with each of them. The peak is also
+reported per contour point for the structure set and per control point
+for the plan. The results are appended to the same history as the time
+benchmarks.
+
+Run from the root of the repository::
+
+    $ python benchmarks/bench_memory.py --tiers tiny small medium
+
+"""
+import argparse
+import concurrent.futures
+import gc
+import multiprocessing
+import sys
+import tracemalloc
+
+import common
+
+import synthetic
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+DEFAULT_TIERS = ["tiny", "small", "medium"]
+
+HISTORY = common.PATH / "history.jsonl"
+
+# ru_maxrss is reported in bytes by macOS and in kilobytes by Linux.
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+# Size of the workload of each file, in the keys of ``common.sizes``,
+# and name of the peak per unit.
+UNITS = {
+    "struct": ("points", "bytes_per_point"),
+    "plan": ("control_points", "bytes_per_control_point"),
+}
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def _peak_rss():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+def measure(case, files):
+    """Measure the memory of a case in the current process.
+
+    Returns the peak of the traced allocations and the increase of the
+    peak RSS, in bytes. The increase is zero if the case does not go
+    beyond the peak reached while loading the patient.
+    """
+    function = common.CASES[case](files)
+    gc.collect()
+    rss = _peak_rss()
+    tracemalloc.start()
+    try:
+        function()
+        _, traced = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    peak = _peak_rss()
+    return {
+        "traced_peak_bytes": traced,
+        "rss_peak_bytes": peak,
+        "rss_increase_bytes": None if rss is None else peak - rss,
+    }
+
+
+def run(tiers, cases):
+    """Measure the cases for every tier, each one in a new process."""
+    environment = common.environment()
+    context = multiprocessing.get_context("spawn")
+    records = []
+    for tier in tiers:
+        files = common.make_files(tier)
+        sizes = common.sizes(tier)
+        for case in cases:
+            for workload in common.WORKLOADS[case]:
+                with concurrent.futures.ProcessPoolExecutor(
+                    1, mp_context=context
+                ) as executor:
+                    result = executor.submit(
+                        measure, case, common.workload_files(files, workload)
+                    ).result()
+                unit, per_unit = UNITS[workload]
+                records.append(
+                    {
+                        **environment,
+                        "benchmark": "memory",
+                        "tier": tier,
+                        "case": case,
+                        "workload": workload,
+                        unit: sizes[unit],
+                        **result,
+                        per_unit: result["traced_peak_bytes"] / sizes[unit],
+                    }
+                )
+    return records
+
+
+def compare(records, history, threshold):
+    """Print the records and their ratio with the previous run.
+
+    Returns the number of cases that allocate more than ``threshold``
+    times the previous run.
+    """
+    regressions = 0
+    print(
+        f"{'tier':<8}{'case':<30}{'file':<8}{'traced [MB]':>12}"
+        f"{'RSS+ [MB]':>11}{'B/unit':>10}{'ratio':>8}"
+    )
+    for record in records:
+        old = common.previous(history, record)
+        increase = record["rss_increase_bytes"]
+        per_unit = UNITS[record["workload"]][1]
+        line = f"{record['tier']:<8}{record['case']:<30}"
+        line += f"{record['workload']:<8}"
+        line += f"{record['traced_peak_bytes'] / 2**20:>12.2f}"
+        line += (
+            f"{'-':>11}" if increase is None else f"{increase / 2**20:>11.2f}"
+        )
+        line += f"{record[per_unit]:>10.1f}"
+        if old is not None and old["traced_peak_bytes"]:
+            ratio = record["traced_peak_bytes"] / old["traced_peak_bytes"]
+            line += f"{ratio:>8.2f}"
+            if ratio > threshold:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    """Run the memory benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--tiers",
+        nargs="+",
+        default=DEFAULT_TIERS,
+        choices=list(synthetic.TIERS),
+    )
+    parser.add_argument(
+        "--cases", nargs="+", default=list(common.CASES), choices=common.CASES
+    )
+    parser.add_argument("--history", default=HISTORY)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="ratio with the previous run reported as a regression",
+    )
+    parser.add_argument(
+        "--no-record",
+        action="store_true",
+        help="do not append the results to the history",
+    )
+    args = parser.parse_args(argv)
+
+    records = run(args.tiers, args.cases)
+    history = common.read_history(args.history)
+    regressions = compare(records, history, args.threshold)
+    if not args.no_record:
+        common.append_history(args.history, records)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Time benchmarks of the public methods of dicomhandler.
+
+Every case is measured over the synthetic patients of each size tier
+and the results are appended to a JSON lines history. Each result is
+compared with the last one recorded for the same case, so regressions
+show up between commits.
+
+Run from the root of the repository::
+
+    $ python benchmarks/bench_time.py --tiers tiny small medium
+
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import common
+
+import synthetic
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+DEFAULT_TIERS = ["tiny", "small", "medium"]
+
+HISTORY = common.PATH / "history.jsonl"
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def measure(case, files, repeat):
+    """Time a case ``repeat`` times, with a fresh patient each time.
+
+    The process-wide caches are emptied before each repeat, so every
+    repeat is cold; the warm cases fill them in their own setup.
+    Returns the times in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        common.reset()
+        function = common.CASES[case](files)
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(tiers, cases, repeat):
+    """Measure the cases for every tier and return the records."""
+    environment = common.environment()
+    records = []
+    for tier in tiers:
+        files = common.make_files(tier)
+        sizes = common.sizes(tier)
+        for case in cases:
+            times = measure(case, files, repeat)
+            records.append(
+                {
+                    **environment,
+                    "benchmark": "time",
+                    "tier": tier,
+                    "case": case,
+                    **sizes,
+                    "repeat": repeat,
+                    "min_s": min(times),
+                    "median_s": statistics.median(times),
+                }
+            )
+    return records
+
+
+def compare(records, history, threshold):
+    """Print the records and their ratio with the previous run.
+
+    Returns the number of cases slower than ``threshold`` times the
+    previous run.
+    """
+    regressions = 0
+    print(f"{'tier':<8}{'case':<30}{'min [s]':>12}{'ratio':>8}")
+    for record in records:
+        old = common.previous(history, record)
+        line = f"{record['tier']:<8}{record['case']:<30}"
+        line += f"{record['min_s']:>12.4f}"
+        if old is not None:
+            ratio = record["min_s"] / old["min_s"]
+            line += f"{ratio:>8.2f}"
+            if ratio > threshold:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    """Run the time benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--tiers",
+        nargs="+",
+        default=DEFAULT_TIERS,
+        choices=list(synthetic.TIERS),
+    )
+    parser.add_argument(
+        "--cases", nargs="+", default=list(common.CASES), choices=common.CASES
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--history", default=HISTORY)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="ratio with the previous run reported as a regression",
+    )
+    parser.add_argument(
+        "--no-record",
+        action="store_true",
+        help="do not append the results to the history",
+    )
+    args = parser.parse_args(argv)
+
+    records = run(args.tiers, args.cases, args.repeat)
+    history = common.read_history(args.history)
+    regressions = compare(records, history, args.threshold)
+    if not args.no_record:
+        common.append_history(args.history, records)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
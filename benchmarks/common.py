@@ -0,0 +1,257 @@
+"""Shared pieces of the benchmarks.
+
+Defines the operations measured over the synthetic patients and the
+history file where the results are recorded.
+
+"""
+import datetime as dt
+import io
+import json
+import pathlib
+import platform
+import subprocess
+import tempfile
+
+from dicomhandler import summary_cache
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.report import report
+
+import numpy as np
+
+import pandas as pd
+
+import pydicom
+
+import synthetic
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+PATH = pathlib.Path(__file__).resolve().parent
+
+TARGET = "ROI 002"
+
+# Order of the files of ``make_files``.
+FILES = ["struct", "plan"]
+
+# =============================================================================
+# CASES
+# =============================================================================
+
+
+def load(files):
+    """Build a ``DicomInfo`` object from the content of the files."""
+    return DicomInfo(*[synthetic.from_bytes(content) for content in files])
+
+
+def reset():
+    """Empty the process-wide caches, so a case is measured cold."""
+    summary_cache.SUMMARY_CACHE.clear()
+
+
+def _case_dcmread(files):
+    return lambda: [synthetic.from_bytes(content) for content in files]
+
+
+def _case_construction(files):
+    datasets = [synthetic.from_bytes(content) for content in files]
+    return lambda: DicomInfo(*datasets)
+
+
+def _case_anonymize(files):
+    return load(files).anonymize
+
+
+def _case_struct_to_csv(files):
+    dicom = load(files)
+    return lambda: dicom.struct_to_csv(io.StringIO())
+
+
+def _case_iter_contours(files):
+    dicom = load(files)
+    return lambda: sum(len(points) for *_, points in dicom.iter_all_contours())
+
+
+def _case_mlc_to_csv(files):
+    dicom = load(files)
+    return lambda: dicom.mlc_to_csv(io.StringIO())
+
+
+def _case_summarize(files):
+    return load(files).summarize_to_dataframe
+
+
+def _case_summarize_area(files):
+    dicom = load(files)
+    return lambda: dicom.summarize_to_dataframe(area=True)
+
+
+def _case_summarize_warm(files):
+    # Another object with the same plan fills the process-wide cache.
+    load(files).summarize_to_dataframe()
+    return load(files).summarize_to_dataframe
+
+
+def _case_complexity(files):
+    return load(files).complexity_metrics
+
+
+def _case_fluence(files):
+    return load(files).fluence_map
+
+
+def _case_mlc_sampler(files):
+    sampler = load(files).mlc_sampler()
+    return lambda: sum(len(batch) for batch in sampler.random(10**6, seed=0))
+
+
+def _case_move(files):
+    dicom = load(files)
+    return lambda: dicom.move(TARGET, 10.0, "yaw")
+
+
+def _case_add_margin(files):
+    dicom = load(files)
+    return lambda: dicom.add_margin(TARGET, 2.0)
+
+
+def _case_report(files):
+    dicom = load(files)
+    moved = dicom.move(TARGET, 1.0, "x")
+    return lambda: report(dicom, moved, TARGET)
+
+
+def _case_save(files):
+    dicom = load(files)
+    if dicom.dicom_struct is not None:
+        dicom = dicom.move(TARGET, 10.0, "yaw")
+    directory = tempfile.mkdtemp(prefix="dicomhandler-bench-")
+    return lambda: dicom.save(directory)
+
+
+CASES = {
+    "dcmread": _case_dcmread,
+    "DicomInfo": _case_construction,
+    "anonymize": _case_anonymize,
+    "struct_to_csv": _case_struct_to_csv,
+    "iter_contours": _case_iter_contours,
+    "mlc_to_csv": _case_mlc_to_csv,
+    "summarize_to_dataframe": _case_summarize,
+    "summarize_to_dataframe(area)": _case_summarize_area,
+    "summarize_to_dataframe(warm)": _case_summarize_warm,
+    "complexity_metrics": _case_complexity,
+    "fluence_map": _case_fluence,
+    "mlc_sampler": _case_mlc_sampler,
+    "move": _case_move,
+    "add_margin": _case_add_margin,
+    "report": _case_report,
+    "save": _case_save,
+}
+
+# Files used by each case. The cases that use both files are measured
+# once with each of them.
+WORKLOADS = {
+    "dcmread": FILES,
+    "DicomInfo": FILES,
+    "anonymize": FILES,
+    "struct_to_csv": ["struct"],
+    "iter_contours": ["struct"],
+    "mlc_to_csv": ["plan"],
+    "summarize_to_dataframe": ["plan"],
+    "summarize_to_dataframe(area)": ["plan"],
+    "summarize_to_dataframe(warm)": ["plan"],
+    "complexity_metrics": ["plan"],
+    "fluence_map": ["plan"],
+    "mlc_sampler": ["plan"],
+    "move": ["struct"],
+    "add_margin": ["struct"],
+    "report": ["struct"],
+    "save": FILES,
+}
+
+# =============================================================================
+# PATIENTS
+# =============================================================================
+
+
+def make_files(tier, seed=0):
+    """Build the content of the RS and RP files of a tier.
+
+    Each run reads the files again, so the measures include the
+    decoding of the values, as with files read from disk.
+    """
+    return [
+        synthetic.to_bytes(dataset)
+        for dataset in synthetic.make_tier(tier, seed)
+    ]
+
+
+def workload_files(files, workload):
+    """Select the content of the file of a workload ('struct' or 'plan')."""
+    return [files[FILES.index(workload)]]
+
+
+def sizes(tier):
+    """Return the number of contour points and control points of a tier."""
+    struct = synthetic.TIERS[tier]["struct"]
+    plan = synthetic.TIERS[tier]["plan"]
+    return {
+        "points": (struct["rois"] - 1) * struct["slices"] * struct["points"]
+        + 1,
+        "control_points": plan["beams"] * plan["control_points"],
+    }
+
+
+# =============================================================================
+# HISTORY
+# =============================================================================
+
+
+def environment():
+    """Describe the versions and the machine of the run."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PATH,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pydicom": pydicom.__version__,
+    }
+
+
+def read_history(path):
+    """Read the records of a history file, in order."""
+    path = pathlib.Path(path)
+    if not path.exists():
+        return []
+    with open(path) as fp:
+        return [json.loads(line) for line in fp if line.strip()]
+
+
+def append_history(path, records):
+    """Append records to a history file, one JSON object per line."""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as fp:
+        for record in records:
+            fp.write(json.dumps(record) + "\n")
+
+
+def previous(history, record, keys=("benchmark", "tier", "case", "workload")):
+    """Find the last record of the history measuring the same case."""
+    for old in reversed(history):
+        if all(old.get(key) == record.get(key) for key in keys):
+            return old
+    return None
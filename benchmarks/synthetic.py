@@ -0,0 +1,292 @@
+"""Synthetic patients for the benchmarks.
+
+Allows to build structure sets and plans of any size, with the layout
+read by ``DicomInfo``. The contours are stored as encoded Decimal
+Strings, so the datasets behave as the ones read from a file.
+
+"""
+import io
+
+from dicomhandler import ds_codec
+
+import numpy as np
+
+from pydicom import dcmread, dcmwrite
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.sequence import Sequence
+from pydicom.tag import Tag
+from pydicom.uid import (
+    ImplicitVRLittleEndian,
+    RTPlanStorage,
+    RTStructureSetStorage,
+    generate_uid,
+)
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+CONTOUR_DATA_TAG = Tag("ContourData")
+
+TIERS = {
+    "tiny": {
+        "struct": {"rois": 4, "slices": 5, "points": 16},
+        "plan": {"beams": 1, "control_points": 5, "leaves": 60},
+    },
+    "small": {
+        "struct": {"rois": 10, "slices": 20, "points": 64},
+        "plan": {"beams": 2, "control_points": 30, "leaves": 60},
+    },
+    "medium": {
+        "struct": {"rois": 20, "slices": 60, "points": 200},
+        "plan": {"beams": 4, "control_points": 90, "leaves": 60},
+    },
+    "large": {
+        "struct": {"rois": 30, "slices": 120, "points": 400},
+        "plan": {"beams": 8, "control_points": 180, "leaves": 80},
+    },
+    "body": {
+        "struct": {"rois": 40, "slices": 250, "points": 1000},
+        "plan": {"beams": 10, "control_points": 360, "leaves": 80},
+    },
+}
+
+PATIENT = {
+    "PatientName": "Synthetic^Patient",
+    "PatientID": "BENCH0001",
+    "PatientBirthDate": "19700101",
+    "OperatorsName": "Bench^Operator",
+    "InstanceCreationDate": "20220101",
+}
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def _new_file(modality, sop_class):
+    dataset = Dataset()
+    for keyword, value in PATIENT.items():
+        setattr(dataset, keyword, value)
+    dataset.Modality = modality
+    dataset.SOPClassUID = sop_class
+    dataset.SOPInstanceUID = generate_uid()
+    dataset.file_meta = FileMetaDataset()
+    dataset.file_meta.MediaStorageSOPClassUID = sop_class
+    dataset.file_meta.MediaStorageSOPInstanceUID = dataset.SOPInstanceUID
+    dataset.file_meta.TransferSyntaxUID = ImplicitVRLittleEndian
+    dataset.is_little_endian, dataset.is_implicit_VR = True, True
+    return dataset
+
+
+def _device(kind, positions):
+    device = Dataset()
+    device.RTBeamLimitingDeviceType = kind
+    device.LeafJawPositions = [float(value) for value in positions]
+    return device
+
+
+# =============================================================================
+# GENERATORS
+# =============================================================================
+
+
+def make_struct(rois=10, slices=20, points=64, seed=0):
+    """Build a structure set with ellipsoidal structures.
+
+    The structures are called ROI 001, ROI 002, etc. The last one is
+    the isocenter, called Coord 1, with a single point. The first one
+    is the biggest (as a BODY contour), the others are smaller and
+    placed around the isocenter.
+
+    Parameters
+    ----------
+    rois : int, default 10
+        Number of structures, including the isocenter.
+    slices : int, default 20
+        Number of slices of each structure.
+    points : int, default 64
+        Number of points of each slice.
+    seed : int, default 0
+        Seed of the random generator.
+
+    Returns
+    -------
+    pydicom.dataset.Dataset
+        RTSTRUCT dataset.
+    """
+    rng = np.random.default_rng(seed)
+    struct = _new_file("RTSTRUCT", RTStructureSetStorage)
+    struct.StructureSetROISequence = Sequence()
+    struct.ROIContourSequence = Sequence()
+    struct.RTROIObservationsSequence = Sequence()
+    angles = np.linspace(0.0, 2 * np.pi, points, endpoint=False)
+    for number in range(1, rois + 1):
+        roi = Dataset()
+        roi.ROINumber = number
+        roi.ROIName = "Coord 1" if number == rois else f"ROI {number:03d}"
+        contour = Dataset()
+        contour.ReferencedROINumber = number
+        contour.ContourSequence = Sequence()
+        observation = Dataset()
+        observation.ObservationNumber = number
+        observation.ReferencedROINumber = number
+        observation.RTROIInterpretedType = "ORGAN"
+        if number == rois:
+            item = Dataset()
+            item.ContourGeometricType = "POINT"
+            item.NumberOfContourPoints = 1
+            item[CONTOUR_DATA_TAG] = ds_codec.ds_element(
+                CONTOUR_DATA_TAG, [0.0, 0.0, 0.0]
+            )
+            contour.ContourSequence.append(item)
+        else:
+            scale = 150.0 if number == 1 else rng.uniform(5.0, 40.0)
+            center = (
+                np.zeros(3)
+                if number == 1
+                else rng.uniform(-60.0, 60.0, size=3)
+            )
+            heights = np.linspace(-1.0, 1.0, slices + 2)[1:-1]
+            for height in heights:
+                radius = scale * np.sqrt(1.0 - height**2)
+                data = np.empty((points, 3))
+                data[:, 0] = center[0] + radius * np.cos(angles)
+                data[:, 1] = center[1] + 0.8 * radius * np.sin(angles)
+                data[:, 2] = center[2] + scale * height
+                item = Dataset()
+                item.ContourGeometricType = "CLOSED_PLANAR"
+                item.NumberOfContourPoints = points
+                item[CONTOUR_DATA_TAG] = ds_codec.ds_element(
+                    CONTOUR_DATA_TAG, data, precision=8
+                )
+                contour.ContourSequence.append(item)
+        struct.StructureSetROISequence.append(roi)
+        struct.ROIContourSequence.append(contour)
+        struct.RTROIObservationsSequence.append(observation)
+    return struct
+
+
+def make_plan(beams=2, control_points=30, leaves=60, seed=0):
+    """Build a VMAT plan with random leaf positions.
+
+    Each beam has the jaws ASYMX and ASYMY and a multileaf collimator
+    MLCX. The first control point has the three devices and the rest
+    only the MLC, as in the plans exported by the planning systems.
+
+    Parameters
+    ----------
+    beams : int, default 2
+        Number of beams (arcs).
+    control_points : int, default 30
+        Number of control points of each beam.
+    leaves : int, default 60
+        Number of leaf pairs of the MLC.
+    seed : int, default 0
+        Seed of the random generator.
+
+    Returns
+    -------
+    pydicom.dataset.Dataset
+        RTPLAN dataset.
+    """
+    rng = np.random.default_rng(seed)
+    plan = _new_file("RTPLAN", RTPlanStorage)
+    plan.RTPlanLabel = "Synthetic"
+    plan.DoseReferenceSequence = Sequence()
+    for number in range(1, 3):
+        for kind, dose in [("TARGET", 20.0), ("POINT", 19.5)]:
+            reference = Dataset()
+            reference.DoseReferenceNumber = len(plan.DoseReferenceSequence) + 1
+            reference.DoseReferenceDescription = f"PTV {number}"
+            reference.DoseReferenceStructureType = kind
+            reference.TargetPrescriptionDose = dose
+            reference.DoseReferencePointCoordinates = [
+                float(value) for value in rng.uniform(-30.0, 30.0, 3)
+            ]
+            plan.DoseReferenceSequence.append(reference)
+
+    width = 200.0 / leaves
+    boundaries = [-100.0 + width * item for item in range(leaves + 1)]
+    plan.BeamSequence = Sequence()
+    for number in range(1, beams + 1):
+        beam = Dataset()
+        beam.BeamNumber = number
+        beam.BeamName = f"Arc {number}"
+        beam.NumberOfControlPoints = control_points
+        beam.BeamLimitingDeviceSequence = Sequence()
+        for kind in ["ASYMX", "ASYMY", "MLCX"]:
+            device = Dataset()
+            device.RTBeamLimitingDeviceType = kind
+            device.NumberOfLeafJawPairs = leaves if kind == "MLCX" else 1
+            if kind == "MLCX":
+                device.LeafPositionBoundaries = boundaries
+            beam.BeamLimitingDeviceSequence.append(device)
+        direction = "CW" if number % 2 else "CC"
+        gantry = np.linspace(181.0, 179.0 + 360.0, control_points) % 360
+        if direction == "CC":
+            gantry = gantry[::-1]
+        beam.ControlPointSequence = Sequence()
+        for item in range(control_points):
+            opening = rng.uniform(0.0, 40.0, leaves)
+            shift = rng.uniform(-20.0, 20.0, leaves)
+            mlc = np.concatenate([shift - opening / 2, shift + opening / 2])
+            point = Dataset()
+            point.ControlPointIndex = item
+            point.GantryAngle = round(float(gantry[item]), 1)
+            point.CumulativeMetersetWeight = item / (control_points - 1)
+            point.BeamLimitingDevicePositionSequence = Sequence()
+            if item == 0:
+                point.GantryRotationDirection = direction
+                point.PatientSupportAngle = 0.0
+                point.IsocenterPosition = [0.0, 0.0, 0.0]
+                point.BeamLimitingDevicePositionSequence.extend(
+                    [
+                        _device("ASYMX", [-50.0, 50.0]),
+                        _device("ASYMY", [-50.0, 50.0]),
+                    ]
+                )
+            else:
+                point.GantryRotationDirection = "NONE"
+            point.BeamLimitingDevicePositionSequence.append(
+                _device("MLCX", mlc.round(2))
+            )
+            beam.ControlPointSequence.append(point)
+        plan.BeamSequence.append(beam)
+    return plan
+
+
+def make_tier(tier, seed=0):
+    """Build the structure set and the plan of a size tier.
+
+    Parameters
+    ----------
+    tier : str
+        Name of the tier, a key of ``TIERS``.
+    seed : int, default 0
+        Seed of the random generator.
+
+    Returns
+    -------
+    tuple
+        Structure set and plan datasets.
+    """
+    sizes = TIERS[tier]
+    return (
+        make_struct(seed=seed, **sizes["struct"]),
+        make_plan(seed=seed, **sizes["plan"]),
+    )
+
+
+def to_bytes(dataset):
+    """Encode a dataset as the content of a DICOM file."""
+    buffer = io.BytesIO()
+    dcmwrite(buffer, dataset, write_like_original=False)
+    return buffer.getvalue()
+
+
+def from_bytes(content):
+    """Read a dataset from the content of a DICOM file."""
+    dataset = dcmread(io.BytesIO(content))
+    dataset.filename = None
+    return dataset
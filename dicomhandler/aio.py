@@ -0,0 +1,223 @@
+"""Asynchronous front end of dicomhandler.
+
+Allows to load, transform and export patients from an ``asyncio``
+application without blocking the event loop. The reading and the
+writing of the files and the methods of ``DicomInfo`` run in an
+executor. The number of operations running at the same time is
+bounded, so many patients can be in flight with a fixed memory
+budget::
+
+    >>> import asyncio
+    >>> from dicomhandler.aio import AsyncHandler
+    >>> async def export(paths, output):
+    ...     handler = AsyncHandler(limit=8)
+    ...     dicom = await handler.load(*paths)
+    ...     await handler.struct_to_csv(dicom, output)
+    >>> asyncio.run(export(['RS.dcm', 'RP.dcm'], 'structures.csv'))
+
+With a ``concurrent.futures.ProcessPoolExecutor`` the objects are
+copied to the worker processes: ``inplace`` and the progress callbacks
+have no effect on the caller.
+
+"""
+import asyncio
+import functools
+import io
+import pathlib
+import weakref
+
+import pydicom
+
+from .dicom_info import DicomInfo
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def _csv_text(dicom, method, kwargs):
+    """Run an export method of ``DicomInfo`` and return the csv text."""
+    buffer = io.StringIO()
+    getattr(dicom, method)(buffer, **kwargs)
+    return buffer.getvalue()
+
+
+def _call(dicom, method, args, kwargs):
+    return getattr(dicom, method)(*args, **kwargs)
+
+
+# =============================================================================
+# HANDLER
+# =============================================================================
+
+
+class AsyncHandler:
+    """Run the operations of dicomhandler from a coroutine.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor, default None
+        Executor of the reading and the methods. By default the
+        executor of the event loop (threads).
+    limit : int, default 16
+        Maximum number of operations running at the same time.
+
+    Examples
+    --------
+    >>> from concurrent.futures import ProcessPoolExecutor
+    >>> with ProcessPoolExecutor() as pool:
+    ...     handler = AsyncHandler(executor=pool, limit=32)
+    """
+
+    def __init__(self, executor=None, limit=16):
+        if limit < 1:
+            raise ValueError("The limit must be at least 1")
+        self.executor = executor
+        self.limit = limit
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        # A semaphore belongs to the loop where it is used.
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    async def run(self, function, *args, **kwargs):
+        """Run ``function(*args, **kwargs)`` in the executor.
+
+        The call waits while ``limit`` operations are running.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore():
+            return await loop.run_in_executor(
+                self.executor, functools.partial(function, *args, **kwargs)
+            )
+
+    async def read(self, path, **kwargs):
+        """Read a DICOM file.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            Path of the file.
+        **kwargs
+            Arguments of ``pydicom.dcmread``.
+
+        Returns
+        -------
+        pydicom.dataset.FileDataset
+            The dataset of the file.
+        """
+        return await self.run(pydicom.dcmread, str(path), **kwargs)
+
+    async def load(self, *paths):
+        """Read the files of a patient and build a ``DicomInfo``.
+
+        The files are read at the same time.
+
+        Parameters
+        ----------
+        *paths : str or pathlib.Path
+            Paths of the RS, RP and RD files.
+
+        Returns
+        -------
+        DicomInfo
+            Object with the files of the patient.
+        """
+        datasets = await asyncio.gather(*[self.read(path) for path in paths])
+        return await self.run(DicomInfo, *datasets)
+
+    async def call(self, dicom, method, *args, **kwargs):
+        """Run a method of ``DicomInfo`` in the executor.
+
+        Parameters
+        ----------
+        dicom : DicomInfo
+            Object of the patient.
+        method : str
+            Name of the method, e.g. ``'summarize_to_dataframe'``.
+        *args, **kwargs
+            Arguments of the method.
+
+        Returns
+        -------
+        object
+            The result of the method.
+        """
+        return await self.run(_call, dicom, method, args, kwargs)
+
+    async def anonymize(self, dicom, **kwargs):
+        """Run ``DicomInfo.anonymize`` in the executor."""
+        return await self.call(dicom, "anonymize", **kwargs)
+
+    async def move(self, dicom, *args, **kwargs):
+        """Run ``DicomInfo.move`` in the executor."""
+        return await self.call(dicom, "move", *args, **kwargs)
+
+    async def add_margin(self, dicom, *args, **kwargs):
+        """Run ``DicomInfo.add_margin`` in the executor."""
+        return await self.call(dicom, "add_margin", *args, **kwargs)
+
+    async def summarize_to_dataframe(self, dicom, area=False):
+        """Run ``DicomInfo.summarize_to_dataframe`` in the executor."""
+        return await self.call(dicom, "summarize_to_dataframe", area=area)
+
+    async def save(self, dicom, directory, **kwargs):
+        """Run ``DicomInfo.save`` in the executor."""
+        return await self.call(dicom, "save", directory, **kwargs)
+
+    async def _export(self, dicom, method, path_or_buff, kwargs):
+        if isinstance(path_or_buff, (str, pathlib.Path)):
+            # The file is written by the executor.
+            return await self.call(dicom, method, path_or_buff, **kwargs)
+        text = await self.run(_csv_text, dicom, method, kwargs)
+        if path_or_buff is None:
+            return text
+        path_or_buff.write(text)
+
+    async def struct_to_csv(self, dicom, path_or_buff=None, **kwargs):
+        """Export the structures to a csv file.
+
+        The csv text is built and the file is written in the executor.
+        A buffer is filled in the event loop with the built text.
+
+        Parameters
+        ----------
+        dicom : DicomInfo
+            Object of the patient.
+        path_or_buff : str, pathlib.Path or StringIO, default None
+            Path or buffer of the csv. If None, the text is returned.
+        **kwargs
+            Arguments of ``DicomInfo.struct_to_csv``.
+
+        Returns
+        -------
+        str or None
+            The csv text if ``path_or_buff`` is None.
+        """
+        return await self._export(dicom, "struct_to_csv", path_or_buff, kwargs)
+
+    async def mlc_to_csv(self, dicom, path_or_buff=None, **kwargs):
+        """Export the MLC positions to a csv file.
+
+        The csv text is built and the file is written in the executor.
+        A buffer is filled in the event loop with the built text.
+
+        Parameters
+        ----------
+        dicom : DicomInfo
+            Object of the patient.
+        path_or_buff : str, pathlib.Path or StringIO, default None
+            Path or buffer of the csv. If None, the text is returned.
+        **kwargs
+            Arguments of ``DicomInfo.mlc_to_csv``.
+
+        Returns
+        -------
+        str or None
+            The csv text if ``path_or_buff`` is None.
+        """
+        return await self._export(dicom, "mlc_to_csv", path_or_buff, kwargs)
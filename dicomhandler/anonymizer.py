@@ -0,0 +1,486 @@
+"""Anonymization of DICOM files.
+
+Allows to anonymize datasets with de-identification profiles and to
+anonymize whole directory trees of DICOM files without building
+``DicomInfo`` objects.
+
+A profile maps attributes (keywords or tags) to actions:
+
+    * ``'remove'``: delete the attribute.
+    * ``('replace', value)``: overwrite the value.
+    * ``'hash'``: replace the value by a hash of it, so the same
+      identifier is anonymized in the same way in every file.
+    * ``'keep'``: leave the attribute (and, for a sequence, all its
+      items) untouched.
+
+The attributes are searched at every level of the datasets, including
+the items of nested sequences.
+
+"""
+import copy
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pydicom
+from pydicom.datadict import dictionary_VR
+from pydicom.dataelem import DataElement
+from pydicom.tag import Tag
+from pydicom.uid import DeflatedExplicitVRLittleEndian, generate_uid
+
+from . import instrumentation
+
+ANONYMOUS_VALUES = {
+    "PatientName": "PatientName",
+    "PatientBirthDate": "19720101",
+    "OperatorsName": "OperatorName",
+    "InstanceCreationDate": "19720101",
+}
+
+BASIC_PROFILE = {
+    "PatientName": ("replace", ANONYMOUS_VALUES["PatientName"]),
+    "PatientBirthDate": ("replace", ANONYMOUS_VALUES["PatientBirthDate"]),
+    "OperatorsName": ("replace", ANONYMOUS_VALUES["OperatorsName"]),
+    "InstanceCreationDate": (
+        "replace",
+        ANONYMOUS_VALUES["InstanceCreationDate"],
+    ),
+    "PatientID": "hash",
+    "OtherPatientIDs": "remove",
+    "OtherPatientIDsSequence": "remove",
+    "OtherPatientNames": "remove",
+    "PatientBirthName": "remove",
+    "PatientMotherBirthName": "remove",
+    "PatientAddress": "remove",
+    "PatientTelephoneNumbers": "remove",
+    "MedicalRecordLocator": "remove",
+    "ReferencedPatientSequence": "remove",
+    "AccessionNumber": "hash",
+    "ReferringPhysicianName": ("replace", ""),
+    "PhysiciansOfRecord": "remove",
+    "PerformingPhysicianName": "remove",
+    "RequestingPhysician": "remove",
+    "ReviewerName": ("replace", "ReviewerName"),
+    "ReviewDate": ("replace", "19720101"),
+    "ReviewTime": ("replace", "000000"),
+    "InstitutionName": "remove",
+    "InstitutionAddress": "remove",
+    "InstitutionalDepartmentName": "remove",
+    "StationName": "remove",
+}
+
+ACTIONS = ["remove", "replace", "hash", "keep"]
+
+# Maximum length of the hashed values for each VR (16 by default).
+HASH_LENGTHS = {"LO": 64, "PN": 64, "ST": 64, "LT": 64, "UT": 64}
+
+MANIFEST_NAME = "anonymize_manifest.jsonl"
+
+
+# =============================================================================
+# PROFILES
+# =============================================================================
+
+
+class CompiledProfile(dict):
+    """Table of a profile indexed by tag, see ``compile_profile``."""
+
+
+def replacements(name=True, birth=True, operator=True, creation=True):
+    """Build the profile of ``DicomInfo.anonymize``.
+
+    Parameters
+    ----------
+    name : bool, default True
+        Anonymize the patient name.
+    birth : bool, default True
+        Anonymize the patient birth date.
+    operator : bool, default True
+        Anonymize the operator name.
+    creation : bool, default True
+        Anonymize the instance creation date.
+
+    Returns
+    -------
+    dict
+        Profile that replaces the selected attributes.
+    """
+    flags = [name, birth, operator, creation]
+    return {
+        keyword: ("replace", value)
+        for flag, (keyword, value) in zip(flags, ANONYMOUS_VALUES.items())
+        if flag
+    }
+
+
+def compile_profile(profile):
+    """Translate a profile into a table indexed by tag.
+
+    The table is computed once and can be shared by all the files of a
+    run (and sent to other processes).
+
+    Parameters
+    ----------
+    profile : dict
+        Keywords or tags of the attributes and their actions.
+
+    Returns
+    -------
+    CompiledProfile
+        Dictionary of tags (int) and tuples ``(action, value)``.
+
+    Raises
+    ------
+    ValueError
+        If an attribute or an action is not valid.
+
+    Examples
+    --------
+    >>> import dicomhandler.anonymizer as an
+    >>> table = an.compile_profile({'PatientID': 'hash'})
+    """
+    table = CompiledProfile()
+    for key, action in profile.items():
+        try:
+            tag = Tag(key)
+        except ValueError:
+            raise ValueError(f"{key} is not a DICOM attribute")
+        action, value = (action, None) if isinstance(action, str) else action
+        if action not in ACTIONS:
+            raise ValueError(f"Action must be one of {ACTIONS}, not {action}")
+        table[int(tag)] = (action, value)
+    return table
+
+
+def _hash_value(value, vr, salt):
+    """Hash a value keeping it valid for its VR."""
+    if vr == "UI":
+        return generate_uid(entropy_srcs=[salt, str(value)])
+    digest = hashlib.sha256(f"{salt}{value}".encode()).hexdigest()
+    return digest[: HASH_LENGTHS.get(vr, 16)].upper()
+
+
+def _walk(dataset, table, salt):
+    """Apply the table to every element of a dataset and its items."""
+    for element in list(dataset.elements()):
+        tag = element.tag
+        action, value = table.get(tag, (None, None))
+        if action == "keep":
+            continue
+        elif action == "remove":
+            del dataset[tag]
+            continue
+        vr = element.VR
+        if vr is None:
+            try:
+                vr = dictionary_VR(tag)
+            except KeyError:
+                vr = "UN"
+        if action == "replace":
+            dataset[tag] = DataElement(tag, vr, value)
+        elif action == "hash":
+            original = dataset[tag].value
+            if original not in [None, ""]:
+                hashed = _hash_value(original, vr, salt)
+                dataset[tag] = DataElement(tag, vr, hashed)
+        elif vr == "SQ":
+            for item in dataset[tag].value:
+                _walk(item, table, salt)
+
+
+def apply_profile(dataset, profile, inplace=False, salt=""):
+    """Anonymize a dataset with a profile.
+
+    Every element of the dataset, and of the items of its sequences, is
+    visited once and looked up in the table of the profile, so the cost
+    is linear in the size of the dataset whatever the number of
+    attributes of the profile.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        Dataset to anonymize.
+    profile : dict
+        Profile (see the module documentation) or table returned by
+        ``compile_profile``.
+    inplace : bool, default False
+        Modify the dataset instead of a copy of it.
+    salt : str, default ''
+        Secret added to the hashed values.
+
+    Returns
+    -------
+    pydicom.dataset.Dataset
+        Anonymized dataset.
+
+    Raises
+    ------
+    ValueError
+        If the profile is not valid.
+
+    Examples
+    --------
+    >>> import dicomhandler.anonymizer as an
+    >>> anonymous = an.apply_profile(plan, an.BASIC_PROFILE)
+    >>> # Anonymize without copying the dataset.
+    >>> an.apply_profile(plan, an.BASIC_PROFILE, inplace=True)
+    """
+    table = profile
+    if not isinstance(profile, CompiledProfile):
+        table = compile_profile(profile)
+    if not inplace:
+        dataset = copy.deepcopy(dataset)
+    _walk(dataset, table, salt)
+    return dataset
+
+
+# =============================================================================
+# FILES
+# =============================================================================
+
+
+@instrumentation.instrumented("anonymizer.anonymize_file")
+def anonymize_file(source, destination, profile=None, salt=""):
+    """Anonymize a single DICOM file.
+
+    The file is read only up to the pixel data. The header is written
+    anonymized and the remaining bytes (pixel data and any trailing
+    element) are copied from the source file without being decoded.
+
+    Parameters
+    ----------
+    source : str or pathlib.Path
+        Path of the DICOM file.
+    destination : str or pathlib.Path
+        Path of the anonymized file. It can not be the source file.
+    profile : dict, default None
+        Profile or table of ``compile_profile``. By default the profile
+        of ``replacements()``.
+    salt : str, default ''
+        Secret added to the hashed values.
+
+    Raises
+    ------
+    ValueError
+        If the source and the destination are the same file.
+
+    Examples
+    --------
+    >>> import dicomhandler.anonymizer as an
+    >>> an.anonymize_file('RD.dcm', 'anonymous/RD.dcm')
+    """
+    profile = replacements() if profile is None else profile
+    source, destination = pathlib.Path(source), pathlib.Path(destination)
+    if destination.exists() and source.samefile(destination):
+        raise ValueError("The destination must be different from the source")
+    with open(source, "rb") as fp:
+        dataset = pydicom.dcmread(fp, stop_before_pixels=True)
+        transfer_syntax = dataset.file_meta.get("TransferSyntaxUID")
+        if transfer_syntax == DeflatedExplicitVRLittleEndian:
+            # The offsets of a deflated file do not match its bytes.
+            fp.seek(0)
+            dataset = pydicom.dcmread(fp)
+        offset = fp.tell()
+        with instrumentation.stage("profile"):
+            apply_profile(dataset, profile, inplace=True, salt=salt)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        with instrumentation.stage("write"), open(destination, "wb") as output:
+            pydicom.dcmwrite(output, dataset, write_like_original=True)
+            fp.seek(offset)
+            shutil.copyfileobj(fp, output)
+            instrumentation.count("bytes_written", output.tell())
+
+
+def _anonymize_task(task):
+    """Anonymize one file of a directory, isolating its errors."""
+    source, destination, relative, table, salt = task
+    try:
+        anonymize_file(
+            pathlib.Path(source) / relative,
+            pathlib.Path(destination) / relative,
+            table,
+            salt,
+        )
+    except Exception as error:
+        return relative, f"{type(error).__name__}: {error}"
+    return relative, None
+
+
+def read_manifest(path):
+    """Read the files already anonymized from a manifest.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Path of the manifest (JSON lines).
+
+    Returns
+    -------
+    set
+        Relative paths of the files anonymized without errors.
+
+    Notes
+    -----
+    A run interrupted while writing leaves a partial last line without
+    a newline. It is ignored if it can not be decoded.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as fp:
+        for line in fp:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                if line.endswith("\n"):
+                    raise
+                break
+            if entry["error"] is None:
+                done.add(entry["file"])
+    return done
+
+
+def _end_manifest(path):
+    """Make a manifest end with a newline before appending to it.
+
+    A partial last line that can not be decoded is removed, otherwise
+    the missing newline is added.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as fp:
+        size = fp.seek(0, os.SEEK_END)
+        start = size
+        while start > 0:
+            block = max(start - 4096, 0)
+            fp.seek(block)
+            newline = fp.read(start - block).rfind(b"\n")
+            if newline >= 0:
+                start = block + newline + 1
+                break
+            start = block
+        if start == size:
+            return
+        fp.seek(start)
+        try:
+            json.loads(fp.read())
+        except ValueError:
+            fp.truncate(start)
+        else:
+            fp.write(b"\n")
+
+
+@instrumentation.instrumented("anonymizer.anonymize_directory")
+def anonymize_directory(
+    source,
+    destination,
+    pattern="*.dcm",
+    workers=None,
+    chunksize=64,
+    manifest=None,
+    profile=None,
+    salt="",
+    name=True,
+    birth=True,
+    operator=True,
+    creation=True,
+):
+    """Anonymize all the DICOM files of a directory tree.
+
+    The tree of ``source`` is reproduced in ``destination``. The files
+    are distributed in chunks in a pool of processes and every file is
+    read once (see ``anonymize_file``). The result of each file is
+    appended to a manifest as soon as it is finished, so an interrupted
+    run can be resumed: the files already anonymized are skipped. An
+    error in one file is recorded in the manifest and does not stop
+    the rest.
+
+    Parameters
+    ----------
+    source : str or pathlib.Path
+        Directory with the DICOM files.
+    destination : str or pathlib.Path
+        Directory for the anonymized files.
+    pattern : str, default '*.dcm'
+        Pattern of the file names, searched recursively.
+    workers : int, default None
+        Number of processes. By default the number of CPUs. With one
+        worker the files are anonymized in the current process.
+    chunksize : int, default 64
+        Number of files sent to a process at once.
+    manifest : str or pathlib.Path, default None
+        Path of the manifest. By default ``anonymize_manifest.jsonl``
+        in the destination directory.
+    profile : dict, default None
+        De-identification profile, e.g. ``BASIC_PROFILE``. By default
+        the attributes selected with the flags are replaced.
+    salt : str, default ''
+        Secret added to the hashed values.
+    name, birth, operator, creation : bool, default True
+        Attributes to anonymize when no profile is given (see
+        ``DicomInfo.anonymize``).
+
+    Returns
+    -------
+    dict
+        Number of files ``anonymized``, ``skipped`` (already in the
+        manifest) and ``failed``.
+
+    Raises
+    ------
+    ValueError
+        If the profile is not valid.
+
+    Examples
+    --------
+    >>> import dicomhandler.anonymizer as an
+    >>> an.anonymize_directory('archive', 'export', workers=8)
+    {'anonymized': 1520, 'skipped': 0, 'failed': 0}
+    """
+    source, destination = pathlib.Path(source), pathlib.Path(destination)
+    if profile is None:
+        profile = replacements(name, birth, operator, creation)
+    table = compile_profile(profile)
+    destination.mkdir(parents=True, exist_ok=True)
+    manifest = destination / MANIFEST_NAME if manifest is None else manifest
+    done = read_manifest(manifest)
+    files = sorted(
+        path.relative_to(source).as_posix()
+        for path in source.rglob(pattern)
+        if path.is_file()
+    )
+    tasks = [
+        (str(source), str(destination), relative, table, salt)
+        for relative in files
+        if relative not in done
+    ]
+    summary = {
+        "anonymized": 0,
+        "skipped": len(files) - len(tasks),
+        "failed": 0,
+    }
+    _end_manifest(manifest)
+    with open(manifest, "a") as log:
+        if workers == 1:
+            results = map(_anonymize_task, tasks)
+            _log_results(results, log, summary)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(_anonymize_task, tasks, chunksize=chunksize)
+                _log_results(results, log, summary)
+    for key, value in summary.items():
+        instrumentation.count(f"files_{key}", value)
+    return summary
+
+
+def _log_results(results, log, summary):
+    """Append the results to the manifest as they arrive."""
+    for relative, error in results:
+        log.write(json.dumps({"file": relative, "error": error}) + "\n")
+        log.flush()
+        summary["failed" if error else "anonymized"] += 1
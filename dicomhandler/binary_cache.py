@@ -0,0 +1,272 @@
+"""Binary cache of the parsed DICOM files.
+
+Reading a structure set with pydicom converts every ``ContourData``
+value from a DS string, which takes most of the time of the runs that
+read the same files again and again. A ``BinaryCache`` keeps the points
+of the structures and the MLC positions of the plans in NumPy files,
+keyed by a hash of the contents of each DICOM file::
+
+    >>> from dicomhandler.binary_cache import BinaryCache
+    >>> cache = BinaryCache('cache')
+    >>> dicom = cache.load('RS.dcm', 'RP.dcm')
+
+The first load reads the files with pydicom and writes the entries.
+The next loads of the same files read the points with memory-mapped
+arrays (see ``DicomInfo.compact``) and the structure set without its
+``ContourData``, and give the MLC positions of the plans without
+converting its DS values. The entry of a modified file has another
+hash, so it is never served stale arrays. The plans and doses are
+still read with pydicom, without converting their values until they
+are used. A file is parsed only once when its entry is written.
+
+"""
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+
+import numpy as np
+
+from pydicom import dcmread, dcmwrite
+
+from . import instrumentation
+from .compact import CompactROI
+from .dicom_info import DicomInfo
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Changing the layout of the entries changes the keys, so the old
+# entries are not read.
+FORMAT_VERSION = 1
+
+CHUNK_SIZE = 2**20
+
+# =============================================================================
+# KEYS
+# =============================================================================
+
+
+def file_hash(path):
+    """Hash the contents of a file.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Path of the file.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest, which includes ``FORMAT_VERSION``.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"dicomhandler-{FORMAT_VERSION}".encode())
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+
+class BinaryCache:
+    """Directory with the parsed arrays of DICOM files.
+
+    Each entry is a directory named with the hash of a file. The entry
+    of a structure set has the dataset without ``ContourData``
+    (``struct.dcm``), the points of all the slices (``points.npy``),
+    the offsets of the slices (``offsets.npy``) and the first slice of
+    each structure (``rois.npy``). The entry of a plan has the leaf
+    positions of every control point (``mlc.npy``), their offsets
+    (``mlc_offsets.npy``) and the number of control points of each
+    beam (``beams.npy``).
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path
+        Directory of the entries. It is created if needed.
+    mmap : bool, default True
+        Read the arrays as read-only memory maps instead of loading
+        them in memory.
+    """
+
+    def __init__(self, directory, mmap=True):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.mmap = mmap
+
+    def __len__(self):
+        """Number of entries."""
+        return sum(1 for path in self._entries())
+
+    def _entries(self):
+        """Iterate over the directories of the entries."""
+        for path in self.directory.iterdir():
+            if path.is_dir() and not path.name.startswith("."):
+                yield path
+
+    def _array(self, entry, name):
+        """Read an array of an entry."""
+        mode = "r" if self.mmap else None
+        return np.load(entry / f"{name}.npy", mmap_mode=mode)
+
+    @instrumentation.instrumented("BinaryCache.load")
+    def load(self, *paths):
+        """Build a ``DicomInfo`` from DICOM files, using the entries.
+
+        Parameters
+        ----------
+        paths : str or pathlib.Path
+            Paths of the RS, RP and RD files of a patient.
+
+        Returns
+        -------
+        DicomInfo
+            Object with the files. Its structures are compact, with
+            the points stored in the cache.
+
+        Raises
+        ------
+        ValueError
+            If the modality is not supported or if many files has the
+            same modality.
+        """
+        datasets, entries = [], {}
+        for path in paths:
+            entry = self.directory / file_hash(path)
+            if entry.is_dir():
+                instrumentation.count("binary_cache_hits")
+                dataset = self._read_dataset(path, entry)
+            else:
+                instrumentation.count("binary_cache_misses")
+                # The dataset parsed to write the entry is used again.
+                dataset = self._write(path, entry)
+            datasets.append(dataset)
+            entries[dataset.Modality] = entry
+        dicom = DicomInfo(*datasets)
+        if "RTSTRUCT" in entries:
+            self._read_struct(dicom, entries["RTSTRUCT"])
+        if "RTPLAN" in entries:
+            self._read_plan(dicom, entries["RTPLAN"])
+        return dicom
+
+    def _read_dataset(self, path, entry):
+        """Read the dataset of a file with an entry.
+
+        A structure set is read without its points. The other files are
+        read lazily by pydicom: their sequences are kept as raw bytes
+        until they are used, and the MLC positions are taken from the
+        entry.
+        """
+        with open(entry / "meta.json") as file:
+            modality = json.load(file)["modality"]
+        if modality == "RTSTRUCT":
+            return dcmread(entry / "struct.dcm")
+        return dcmread(path)
+
+    def _read_struct(self, dicom, entry):
+        """Give the compact points of the entry to the object."""
+        points = self._array(entry, "points")
+        offsets = self._array(entry, "offsets")
+        rois = self._array(entry, "rois")
+        for index, (first, last) in enumerate(zip(rois[:-1], rois[1:])):
+            # The offsets of a structure include the end of its last
+            # slice.
+            slices = offsets[first:][: last - first + 1]
+            start, stop = slices[0], slices[-1]
+            dicom._compact[index] = CompactROI(
+                points[start:stop], slices - start
+            )
+
+    def _read_plan(self, dicom, entry):
+        """Give the MLC positions of the entry to the object."""
+        values = self._array(entry, "mlc")
+        offsets = self._array(entry, "mlc_offsets")
+        positions = [
+            values[start:stop] for start, stop in zip(offsets, offsets[1:])
+        ]
+        beams, first = [], 0
+        for count in self._array(entry, "beams"):
+            beams.append(positions[first:][:count])
+            first += count
+        dicom._derive("mlc", ["plan"], lambda: beams)
+
+    def _write(self, path, entry):
+        """Parse a DICOM file and write its entry.
+
+        Returns the dataset to load: the structure set without its
+        points or the parsed file.
+        """
+        dataset = dcmread(path)
+        temporary = pathlib.Path(
+            tempfile.mkdtemp(prefix=".", dir=self.directory)
+        )
+        try:
+            if dataset.Modality == "RTSTRUCT":
+                dataset = self._write_struct(dataset, temporary)
+            elif dataset.Modality == "RTPLAN":
+                self._write_plan(dataset, temporary)
+            with open(temporary / "meta.json", "w") as file:
+                json.dump({"modality": dataset.Modality}, file)
+            os.rename(temporary, entry)
+        except OSError:
+            # Another process wrote the same entry.
+            if not entry.is_dir():
+                raise
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+        return dataset
+
+    def _write_struct(self, dataset, temporary):
+        """Write the compact points and the stripped structure set.
+
+        Returns the stripped structure set.
+        """
+        dicom = DicomInfo(dataset).compact()
+        records = [dicom._compact[index] for index in sorted(dicom._compact)]
+        offsets, rois = [0], [0]
+        for record in records:
+            offsets.extend(offsets[-1] + record.offsets[1:])
+            rois.append(len(offsets) - 1)
+        np.save(
+            temporary / "points.npy",
+            np.concatenate(
+                [record.points for record in records]
+                + [np.empty((0, 3), dtype=np.float32)]
+            ),
+        )
+        np.save(temporary / "offsets.npy", np.array(offsets, dtype=np.int64))
+        np.save(temporary / "rois.npy", np.array(rois, dtype=np.int64))
+        dcmwrite(
+            temporary / "struct.dcm",
+            dicom.dicom_struct,
+            write_like_original=False,
+        )
+        return dicom.dicom_struct
+
+    def _write_plan(self, dataset, temporary):
+        """Write the leaf positions of every control point."""
+        beams = DicomInfo(dataset)._mlc_arrays()
+        positions = [array for beam in beams for array in beam]
+        offsets = np.cumsum([0] + [len(array) for array in positions])
+        np.save(
+            temporary / "mlc.npy",
+            np.concatenate(positions + [np.empty(0)]),
+        )
+        np.save(temporary / "mlc_offsets.npy", offsets.astype(np.int64))
+        np.save(
+            temporary / "beams.npy",
+            np.array([len(beam) for beam in beams], dtype=np.int64),
+        )
+
+    def clear(self):
+        """Remove every entry."""
+        for path in list(self._entries()):
+            shutil.rmtree(path)
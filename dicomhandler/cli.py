@@ -0,0 +1,315 @@
+"""Command line interface of dicomhandler.
+
+Allows to run the exports and transformations over directory trees.
+Each directory with DICOM files is a patient. The patients are
+processed in parallel by a pool of processes and an error in a patient
+does not stop the others::
+
+    $ dicomhandler struct archive/ export/ --workers 8
+    $ dicomhandler mlc archive/ export/
+    $ dicomhandler summary archive/ export/ --area
+    $ dicomhandler move archive/ export/ --struct 'GTV' --value 1.0 --key x
+    $ dicomhandler margin archive/ export/ --struct 'GTV' --margin 2.0
+    $ dicomhandler anonymize archive/ export/ --profile basic
+
+The results are written in the output directory with the relative path
+of each patient.
+
+"""
+import argparse
+import os
+import pathlib
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pydicom
+from pydicom.errors import InvalidDicomError
+
+from . import __version__, anonymizer, ds_codec
+from .dicom_info import DicomInfo
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Modalities read for each command.
+MODALITIES = {
+    "struct": ("RTSTRUCT",),
+    "mlc": ("RTPLAN",),
+    "summary": ("RTPLAN",),
+    "move": ("RTSTRUCT",),
+    "margin": ("RTSTRUCT",),
+}
+
+PROFILES = {"basic": anonymizer.BASIC_PROFILE, "legacy": None}
+
+# =============================================================================
+# PATIENTS
+# =============================================================================
+
+
+def find_patients(source, pattern="*.dcm"):
+    """Find the directories with DICOM files.
+
+    Parameters
+    ----------
+    source : str or pathlib.Path
+        Root of the directory tree.
+    pattern : str, default '*.dcm'
+        Pattern of the DICOM files.
+
+    Returns
+    -------
+    list
+        Paths of the patient directories relative to ``source``.
+    """
+    source = pathlib.Path(source)
+    return sorted(
+        {
+            path.parent.relative_to(source).as_posix()
+            for path in source.rglob(pattern)
+            if path.is_file()
+        }
+    )
+
+
+def load_patient(directory, modalities, pattern="*.dcm"):
+    """Build a ``DicomInfo`` with the files of a directory.
+
+    Only the files of the given modalities are kept. The pixel data is
+    not read.
+
+    Raises
+    ------
+    ValueError
+        If there is no file of the modalities.
+    """
+    datasets = []
+    for path in sorted(pathlib.Path(directory).glob(pattern)):
+        try:
+            dataset = pydicom.dcmread(path, stop_before_pixels=True)
+        except InvalidDicomError:
+            continue
+        if dataset.get("Modality") in modalities:
+            datasets.append(dataset)
+    if not datasets:
+        raise ValueError(f"No {' or '.join(modalities)} file in {directory}")
+    return DicomInfo(*datasets)
+
+
+def _process(command, dicom, output, options):
+    if command == "struct":
+        dicom.struct_to_csv(output / "structures.csv", names=options["names"])
+    elif command == "mlc":
+        dicom.mlc_to_csv(output / "mlc.csv")
+    elif command == "summary":
+        summary = dicom.summarize_to_dataframe(area=options["area"])
+        summary.to_csv(output / "summary.csv", index=False)
+    elif command == "move":
+        origin = [options["origin"]] if options["origin"] else []
+        dicom.move(
+            options["struct"],
+            options["value"],
+            options["key"],
+            *origin,
+            new_name=options["new_name"],
+            inplace=options["new_name"] is None,
+            precision=options["precision"],
+        ).save(output)
+    elif command == "margin":
+        dicom.add_margin(
+            options["struct"],
+            options["margin"],
+            new_name=options["new_name"],
+            inplace=options["new_name"] is None,
+            precision=options["precision"],
+        ).save(output)
+
+
+def _patient_task(task):
+    """Process a patient and return the error instead of raising it."""
+    command, source, destination, relative, options = task
+    try:
+        dicom = load_patient(
+            pathlib.Path(source) / relative,
+            MODALITIES[command],
+            options["pattern"],
+        )
+        output = pathlib.Path(destination) / relative
+        output.mkdir(parents=True, exist_ok=True)
+        _process(command, dicom, output, options)
+    except Exception as error:
+        return relative, f"{type(error).__name__}: {error}"
+    return relative, None
+
+
+def run_patients(
+    command, source, destination, options, workers=None, chunksize=4
+):
+    """Run a command over all the patients of a directory tree.
+
+    Parameters
+    ----------
+    command : str
+        One of ``'struct'``, ``'mlc'``, ``'summary'``, ``'move'`` or
+        ``'margin'``.
+    source, destination : str or pathlib.Path
+        Input and output directory trees.
+    options : dict
+        Options of the command, as parsed by ``main``.
+    workers : int, default None
+        Number of processes. By default one per CPU. With 1 the
+        patients are processed in the current process.
+    chunksize : int, default 4
+        Number of patients sent together to a process.
+
+    Returns
+    -------
+    dict
+        Error of each patient by relative path, None if it was
+        processed.
+    """
+    tasks = [
+        (command, str(source), str(destination), relative, options)
+        for relative in find_patients(source, options["pattern"])
+    ]
+    if workers == 1:
+        results = list(map(_patient_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_patient_task, tasks, chunksize=chunksize))
+    return dict(results)
+
+
+# =============================================================================
+# PARSER
+# =============================================================================
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog="dicomhandler", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument(
+        "--version", action="version", version=f"%(prog)s {__version__}"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("source", help="directory tree with the patients")
+    common.add_argument("destination", help="output directory")
+    common.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes (default: one per CPU)",
+    )
+    common.add_argument(
+        "--chunksize",
+        type=int,
+        help="patients or files sent together to a process",
+    )
+    common.add_argument("--pattern", default="*.dcm")
+
+    struct = commands.add_parser(
+        "struct", parents=[common], help="export the structures to csv"
+    )
+    struct.add_argument("--names", nargs="+", help="structures to export")
+    commands.add_parser(
+        "mlc", parents=[common], help="export the MLC positions to csv"
+    )
+    summary = commands.add_parser(
+        "summary", parents=[common], help="export the plan summary to csv"
+    )
+    summary.add_argument("--area", action="store_true")
+
+    move = commands.add_parser(
+        "move", parents=[common], help="rotate or translate a structure"
+    )
+    move.add_argument("--struct", required=True)
+    move.add_argument("--value", type=float, required=True)
+    move.add_argument(
+        "--key",
+        required=True,
+        choices=["roll", "pitch", "yaw", "x", "y", "z"],
+    )
+    move.add_argument("--origin", type=float, nargs=3)
+    move.add_argument("--new-name")
+    move.add_argument(
+        "--precision",
+        type=int,
+        default=ds_codec.DEFAULT_PRECISION,
+        help="significant digits of the written coordinates",
+    )
+
+    margin = commands.add_parser(
+        "margin", parents=[common], help="expand or contract a structure"
+    )
+    margin.add_argument("--struct", required=True)
+    margin.add_argument("--margin", type=float, required=True)
+    margin.add_argument("--new-name")
+    margin.add_argument(
+        "--precision",
+        type=int,
+        default=ds_codec.DEFAULT_PRECISION,
+        help="significant digits of the written coordinates",
+    )
+
+    anonymize = commands.add_parser(
+        "anonymize", parents=[common], help="anonymize the DICOM files"
+    )
+    anonymize.add_argument(
+        "--profile",
+        choices=list(PROFILES),
+        default="legacy",
+        help="'legacy' replaces the name, birth date, operator and "
+        "creation date; 'basic' applies the de-identification profile",
+    )
+    anonymize.add_argument("--salt", default="")
+    return parser
+
+
+def main(argv=None):
+    """Run the command line interface.
+
+    Returns
+    -------
+    int
+        0 if every patient was processed, 1 otherwise.
+    """
+    args = _parser().parse_args(argv)
+    if args.command == "anonymize":
+        summary = anonymizer.anonymize_directory(
+            args.source,
+            args.destination,
+            pattern=args.pattern,
+            workers=args.workers,
+            chunksize=args.chunksize or 64,
+            profile=PROFILES[args.profile],
+            salt=args.salt,
+        )
+        print(
+            f"{summary['anonymized']} anonymized, {summary['skipped']} "
+            f"skipped, {summary['failed']} failed"
+        )
+        return 1 if summary["failed"] else 0
+
+    skip = ["command", "source", "destination", "workers", "chunksize"]
+    options = {
+        key: value for key, value in vars(args).items() if key not in skip
+    }
+    results = run_patients(
+        args.command,
+        args.source,
+        args.destination,
+        options,
+        workers=args.workers,
+        chunksize=args.chunksize or 4,
+    )
+    failed = 0
+    for relative, error in results.items():
+        if error:
+            failed += 1
+            print(f"{relative}: {error}", file=sys.stderr)
+    print(f"{len(results) - failed} patients processed, {failed} failed")
+    return 1 if failed else 0
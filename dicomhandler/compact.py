@@ -0,0 +1,103 @@
+"""Compact storage of the contour points.
+
+pydicom keeps the ``ContourData`` of a slice as a list of Python floats
+or DS strings, which takes between 24 and 60 bytes per coordinate. A
+``CompactROI`` keeps all the slices of a structure in a single float32
+array of shape (n, 3), 4 bytes per coordinate, and the position of
+each slice in an int32 array of offsets::
+
+    >>> dicom = DicomInfo(struct, plan).compact()
+    >>> dicom.expand()
+
+The points are converted to DS strings again only when the files are
+written (see ``DicomInfo.save``). float32 keeps about 7 significant
+digits, so the compact coordinates are written with at most
+``COMPACT_PRECISION`` digits.
+
+"""
+import numpy as np
+
+from pydicom.tag import Tag
+
+from . import ds_codec
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+CONTOUR_DATA_TAG = Tag("ContourData")
+
+# Significant digits kept by float32.
+COMPACT_PRECISION = 7
+
+# =============================================================================
+# COMPACT ROI
+# =============================================================================
+
+
+class CompactROI:
+    """Points of all the slices of a structure.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        float32 array of shape (n, 3) with the points of every slice.
+    offsets : numpy.ndarray
+        int32 array with the index of the first point of each slice
+        and the total number of points at the end.
+
+    The arrays are read-only, so the records can be shared by the
+    copies of a ``DicomInfo``.
+    """
+
+    __slots__ = ("points", "offsets")
+
+    def __init__(self, points, offsets):
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.points.flags.writeable = False
+        self.offsets.flags.writeable = False
+
+    @classmethod
+    def from_contours(cls, contours):
+        """Build the record from the items of a ``ContourSequence``.
+
+        The slices without ``ContourData`` are kept with 0 points.
+        """
+        arrays, offsets = [], [0]
+        for contour in contours:
+            data = ds_codec.ds_array(contour, CONTOUR_DATA_TAG)
+            data = data[: len(data) // 3 * 3].astype(np.float32)
+            arrays.append(data)
+            offsets.append(offsets[-1] + len(data) // 3)
+        points = np.concatenate(arrays) if arrays else np.empty(0)
+        return cls(points, offsets)
+
+    def __len__(self):
+        """Number of slices."""
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        """Representation of the record."""
+        return (
+            f"<CompactROI {len(self)} slices, {len(self.points)} points, "
+            f"{self.nbytes} bytes>"
+        )
+
+    @property
+    def nbytes(self):
+        """Bytes of the arrays."""
+        return self.points.nbytes + self.offsets.nbytes
+
+    def contour(self, item):
+        """Return the points of a slice as a read-only (n, 3) view."""
+        start, stop = self.offsets[item], self.offsets[item + 1]
+        return self.points[start:stop]
+
+    def ds_element(self, item, precision=COMPACT_PRECISION):
+        """Encode the points of a slice as a ``ContourData`` element."""
+        return ds_codec.ds_element(
+            CONTOUR_DATA_TAG,
+            self.contour(item),
+            min(precision, COMPACT_PRECISION),
+        )
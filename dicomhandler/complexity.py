@@ -0,0 +1,274 @@
+"""Complexity metrics of the MLC apertures of a plan.
+
+Allows to score the modulation of many plans (e.g. the VMAT plans of an
+archive) with the usual complexity metrics, computed with NumPy over all
+the control points of a beam at once. The leaf positions of a beam are
+an array of shape (control points, 2, leaves), with the positions of the
+bank A and B::
+
+    >>> import dicomhandler.complexity as cx
+    >>> metrics = cx.beam_metrics(positions, widths, weights, gantry)
+
+The metrics of a control point are averaged over the segments of the
+beam, weighted with the meterset delivered in each segment:
+
+    * MCS: modulation complexity score, the product of the leaf sequence
+      variability of both banks and the aperture area variability
+      (McNiven et al., 2010).
+    * Leaf travel: total distance moved by the leaves.
+    * Area and perimeter of the aperture.
+    * Edge metric: perimeter of the aperture over its area.
+    * SAS: small aperture score, the fraction of open leaf pairs with a
+      gap below a threshold.
+    * Leaf speed: leaf steps over the time of each segment, estimated
+      from the gantry and meterset steps with the maximum gantry speed
+      and dose rate.
+
+See ``DicomInfo.complexity_metrics`` for the metrics of a plan.
+
+"""
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Gap in mm below which an open leaf pair is a small aperture.
+SMALL_APERTURE = 5.0
+
+# Maximum gantry speed in degrees per second.
+GANTRY_SPEED = 6.0
+
+# Maximum dose rate in MU per minute.
+DOSE_RATE = 600.0
+
+# Metrics averaged over the segments of a beam.
+AVERAGED = ["MCS", "area", "perimeter", "edge_metric", "SAS"]
+
+# =============================================================================
+# CONTROL POINTS
+# =============================================================================
+
+
+def _sequence_variability(bank, opened):
+    """Leaf sequence variability of a bank at each control point."""
+    pairs = opened[:, 1:] & opened[:, :-1]
+    high = np.where(opened, bank, -np.inf).max(axis=1)
+    low = np.where(opened, bank, np.inf).min(axis=1)
+    spread = np.where(opened.any(axis=1), high - low, 0.0)
+    steps = np.abs(np.diff(bank, axis=1))
+    count = pairs.sum(axis=1)
+    total = np.where(pairs, spread[:, None] - steps, 0.0).sum(axis=1)
+    valid = (count > 0) & (spread > 0)
+    return np.divide(
+        total,
+        count * spread,
+        out=np.ones(len(bank)),
+        where=valid,
+    )
+
+
+def aperture_metrics(positions, widths, small_aperture=SMALL_APERTURE):
+    """Metrics of the aperture of each control point.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Leaf positions in mm of shape (control points, 2, leaves).
+    widths : numpy.ndarray
+        Widths of the leaves in mm.
+    small_aperture : float, default 5.0
+        Gap in mm below which an open leaf pair is a small aperture.
+
+    Returns
+    -------
+    dict
+        Arrays with a value per control point: ``'area'`` (mm2),
+        ``'perimeter'`` (mm), ``'edge_metric'`` (1/mm), ``'SAS'`` and
+        ``'MCS'``.
+    """
+    positions = np.asarray(positions, dtype=float)
+    widths = np.asarray(widths, dtype=float)
+    bank_a, bank_b = positions[:, 0], positions[:, 1]
+    gaps = np.clip(bank_b - bank_a, 0.0, None)
+    opened = gaps > 0
+    area = gaps @ widths
+
+    # The sides along the leaves are the parts of the gaps of adjacent
+    # leaves that do not overlap, including the first and last leaves.
+    lower = np.pad(np.where(opened, bank_a, 0.0), ((0, 0), (1, 1)))
+    upper = np.pad(np.where(opened, bank_b, 0.0), ((0, 0), (1, 1)))
+    lengths = upper - lower
+    overlap = np.clip(
+        np.minimum(upper[:, 1:], upper[:, :-1])
+        - np.maximum(lower[:, 1:], lower[:, :-1]),
+        0.0,
+        None,
+    )
+    both = (lengths[:, 1:] > 0) & (lengths[:, :-1] > 0)
+    sides = lengths[:, 1:] + lengths[:, :-1] - 2 * np.where(both, overlap, 0)
+    perimeter = sides.sum(axis=1) + 2 * (opened @ widths)
+
+    open_pairs = opened.sum(axis=1)
+    small = (opened & (gaps < small_aperture)).sum(axis=1)
+
+    # The aperture area variability compares each aperture with the
+    # widest positions of the leaves in the beam.
+    ever = opened.any(axis=0)
+    widest = np.where(ever, bank_b.max(axis=0) - bank_a.min(axis=0), 0.0)
+    variability = _sequence_variability(
+        bank_a, opened
+    ) * _sequence_variability(bank_b, opened)
+    aav = np.divide(
+        gaps.sum(axis=1),
+        widest.sum(),
+        out=np.zeros(len(gaps)),
+        where=widest.sum() > 0,
+    )
+    return {
+        "area": area,
+        "perimeter": perimeter,
+        "edge_metric": np.divide(
+            perimeter, area, out=np.zeros(len(area)), where=area > 0
+        ),
+        "SAS": np.divide(
+            small, open_pairs, out=np.zeros(len(area)), where=open_pairs > 0
+        ),
+        "MCS": variability * aav,
+    }
+
+
+# =============================================================================
+# BEAMS
+# =============================================================================
+
+
+def gantry_steps(gantry):
+    """Rotation in degrees between consecutive gantry angles."""
+    steps = np.diff(np.asarray(gantry, dtype=float))
+    return np.abs((steps + 180.0) % 360.0 - 180.0)
+
+
+def beam_metrics(
+    positions,
+    widths,
+    weights,
+    gantry,
+    meterset=1.0,
+    small_aperture=SMALL_APERTURE,
+    gantry_speed=GANTRY_SPEED,
+    dose_rate=DOSE_RATE,
+):
+    """Complexity metrics of a beam.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Leaf positions in mm of shape (control points, 2, leaves).
+    widths : numpy.ndarray
+        Widths of the leaves in mm.
+    weights : numpy.ndarray
+        Cumulative meterset weight of each control point.
+    gantry : numpy.ndarray
+        Gantry angle in degrees of each control point.
+    meterset : float, default 1.0
+        Monitor units of the beam.
+    small_aperture : float, default 5.0
+        Gap in mm below which an open leaf pair is a small aperture.
+    gantry_speed : float, default 6.0
+        Maximum gantry speed in degrees per second.
+    dose_rate : float, default 600.0
+        Maximum dose rate in MU per minute.
+
+    Returns
+    -------
+    dict
+        ``'MCS'``, ``'area'``, ``'perimeter'``, ``'edge_metric'`` and
+        ``'SAS'`` averaged over the segments weighted with their
+        meterset, ``'leaf_travel'`` (mm), ``'mean_leaf_speed'`` and
+        ``'max_leaf_speed'`` (mm/s) over the segments that take some
+        time.
+
+    Raises
+    ------
+    ValueError
+        If the number of weights or gantry angles is not the number of
+        control points.
+    """
+    positions = np.asarray(positions, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    count = len(positions)
+    if len(weights) != count or len(gantry) != count:
+        raise ValueError("One weight and gantry angle per control point")
+    apertures = aperture_metrics(positions, widths, small_aperture)
+    metrics = {}
+    if count == 1:
+        for name in AVERAGED:
+            metrics[name] = float(apertures[name][0])
+        metrics["leaf_travel"] = 0.0
+        metrics["mean_leaf_speed"] = metrics["max_leaf_speed"] = 0.0
+        return metrics
+
+    # Each segment gets the mean of the metrics at its control points.
+    delivered = np.diff(weights)
+    total = delivered.sum()
+    relative = (
+        delivered / total
+        if total > 0
+        else np.full(count - 1, 1.0 / (count - 1))
+    )
+    for name in AVERAGED:
+        values = apertures[name]
+        metrics[name] = float(relative @ ((values[1:] + values[:-1]) / 2))
+
+    moves = np.abs(np.diff(positions, axis=0)).reshape(count - 1, -1)
+    metrics["leaf_travel"] = float(moves.sum())
+    monitor_units = delivered / (weights[-1] or 1.0) * meterset
+    time = np.maximum(
+        gantry_steps(gantry) / gantry_speed,
+        monitor_units / (dose_rate / 60.0),
+    )
+    timed = time > 0
+    if timed.any():
+        speeds = moves[timed] / time[timed, None]
+        metrics["mean_leaf_speed"] = float(speeds.mean())
+        metrics["max_leaf_speed"] = float(speeds.max())
+    else:
+        metrics["mean_leaf_speed"] = metrics["max_leaf_speed"] = 0.0
+    return metrics
+
+
+def plan_metrics(beams, metersets):
+    """Combine the metrics of the beams of a plan.
+
+    Parameters
+    ----------
+    beams : list of dict
+        Metrics of each beam, as returned by ``beam_metrics``.
+    metersets : list of float
+        Monitor units of each beam.
+
+    Returns
+    -------
+    dict
+        The averaged metrics weighted with the monitor units of the
+        beams, the total leaf travel, the mean leaf speed weighted with
+        the leaf travel and the maximum leaf speed.
+    """
+    metersets = np.asarray(metersets, dtype=float)
+    if metersets.sum() > 0:
+        relative = metersets / metersets.sum()
+    else:
+        relative = np.full(len(beams), 1.0 / len(beams))
+    metrics = {
+        name: float(sum(w * beam[name] for w, beam in zip(relative, beams)))
+        for name in AVERAGED
+    }
+    travel = np.array([beam["leaf_travel"] for beam in beams])
+    metrics["leaf_travel"] = float(travel.sum())
+    speeds = np.array([beam["mean_leaf_speed"] for beam in beams])
+    metrics["mean_leaf_speed"] = float(
+        speeds @ travel / travel.sum() if travel.sum() > 0 else 0.0
+    )
+    metrics["max_leaf_speed"] = max(beam["max_leaf_speed"] for beam in beams)
+    return metrics
@@ -0,0 +1,230 @@
+"""Bulk encoding and decoding of Decimal String values.
+
+Allows to format whole coordinate arrays into valid DICOM Decimal
+String (DS) byte strings in a single pass, instead of letting pydicom
+format every value on write, and to parse the raw bytes of large DS
+elements (``ContourData``, ``LeafJawPositions``) into NumPy arrays
+without creating a pydicom ``DSfloat`` for every value.
+
+"""
+
+import numpy as np
+
+from pydicom.dataelem import RawDataElement
+from pydicom.multival import MultiValue
+from pydicom.tag import Tag
+
+DEFAULT_PRECISION = 10
+
+DS_MAX_LENGTH = 16
+
+
+def validate_precision(precision):
+    """Check that the values formatted with a precision are valid DS.
+
+    Parameters
+    ----------
+    precision : int
+        Significant digits of each value.
+
+    Raises
+    ------
+    ValueError
+        If the precision is not an int between 1 and 10.
+    """
+    if (
+        not isinstance(precision, int)
+        or isinstance(precision, bool)
+        or not 1 <= precision <= 10
+    ):
+        raise ValueError("The precision must be between 1 and 10")
+
+
+def _fit_ds(value, precision):
+    """Format a value with the largest precision that fits in DS."""
+    text = b"%.*g" % (precision, value)
+    while len(text) > DS_MAX_LENGTH:
+        precision -= 1
+        text = b"%.*g" % (precision, value)
+    return text
+
+
+def format_ds(values, precision=DEFAULT_PRECISION):
+    r"""Format an array of numbers as a DS byte string.
+
+    All the values are formatted with a single format operation with
+    ``precision`` significant digits and joined with the DICOM value
+    delimiter (backslash). The result is padded to an even length, as
+    required by the standard.
+
+    Parameters
+    ----------
+    values : array_like
+        Numbers to encode. Multidimensional arrays are flattened.
+    precision : int, default 10
+        Significant digits of each value. With 10 digits a negative
+        value with a three digit exponent (e.g. ``-1.234567891e-100``)
+        needs 17 characters: the precision of those values is reduced
+        so that they fit in the 16 characters allowed by DS.
+
+    Returns
+    -------
+    bytes
+        Backslash delimited values.
+
+    Raises
+    ------
+    ValueError
+        If the precision is not between 1 and 10 or if some value is
+        not finite.
+
+    Examples
+    --------
+    >>> import dicomhandler.ds_codec as dc
+    >>> dc.format_ds([0.1 + 0.2, -1.0, 2.5], precision=6)
+    b'0.3\\-1\\2.5'
+    """
+    validate_precision(precision)
+    array = np.asarray(values, dtype=float).ravel()
+    if not np.all(np.isfinite(array)):
+        raise ValueError("DS values must be finite")
+    if array.size == 0:
+        return b""
+    values = array.tolist()
+    template = "\\".join([f"%.{precision}g"] * array.size)
+    encoded = (template % tuple(values)).encode("ascii")
+    # Sign, digits, point and exponent: only the values with a three
+    # digit exponent can exceed the length of DS.
+    if precision + 7 > DS_MAX_LENGTH:
+        magnitude = np.abs(array[array != 0])
+        if np.any((magnitude >= 1e100) | (magnitude < 1e-99)):
+            encoded = b"\\".join(_fit_ds(value, precision) for value in values)
+    if len(encoded) % 2:
+        encoded += b" "
+    return encoded
+
+
+def ds_element(tag, values, precision=DEFAULT_PRECISION):
+    """Build an already encoded DS element.
+
+    The element is created as a raw element, so pydicom writes its
+    bytes as they are and only parses them back if the value is read.
+
+    Parameters
+    ----------
+    tag : int, tuple or str
+        Tag or keyword of the element, e.g. ``'ContourData'``.
+    values : array_like
+        Numbers to encode.
+    precision : int, default 10
+        Significant digits of each value.
+
+    Returns
+    -------
+    pydicom.dataelem.RawDataElement
+        Element ready to be assigned with ``dataset[tag] = element``.
+    """
+    value = format_ds(values, precision)
+    return RawDataElement(Tag(tag), "DS", len(value), value, 0, True, True)
+
+
+def parse_ds(value):
+    r"""Parse a DS byte string into an array of floats.
+
+    All the values are converted by NumPy in a single operation.
+
+    Parameters
+    ----------
+    value : bytes
+        Backslash delimited values, as stored in the file. The padding
+        spaces are ignored.
+
+    Returns
+    -------
+    numpy.ndarray
+        Values of the string, empty if the string has no values.
+
+    Raises
+    ------
+    ValueError
+        If some value is not a number.
+
+    Examples
+    --------
+    >>> import dicomhandler.ds_codec as dc
+    >>> dc.parse_ds(b'0.3\\-1\\2.5 ')
+    array([ 0.3, -1. ,  2.5])
+    """
+    if value is None or not value.strip():
+        return np.empty(0)
+    return np.array(value.split(b"\\"), dtype=float)
+
+
+def ds_count(dataset, tag):
+    """Count the values of a DS element of a dataset.
+
+    The delimiters of a raw element are counted in its bytes, so the
+    element is kept raw and no value is parsed.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        Dataset with the element, e.g. an item of ``ContourSequence``.
+    tag : int, tuple or str
+        Tag or keyword of the element.
+
+    Returns
+    -------
+    int
+        Number of values, 0 if the element is missing or empty.
+    """
+    tag = Tag(tag)
+    if tag not in dataset:
+        return 0
+    element = dataset.get_item(tag)
+    if element.is_raw and element.VR in ("DS", "UN", None):
+        if element.value is None or not element.value.strip():
+            return 0
+        return element.value.count(b"\\") + 1
+    values = dataset[tag].value
+    if values is None:
+        return 0
+    if not isinstance(values, (MultiValue, list, tuple)):
+        return 1
+    return len(values)
+
+
+def ds_array(dataset, tag):
+    """Read a DS element of a dataset as an array of floats.
+
+    If the element was not read by pydicom yet, its raw bytes are
+    parsed with ``parse_ds`` and the element is kept raw, so the
+    dataset does not store a ``DSfloat`` for every value. Otherwise the
+    values of the element are converted.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        Dataset with the element, e.g. an item of ``ContourSequence``.
+    tag : int, tuple or str
+        Tag or keyword of the element.
+
+    Returns
+    -------
+    numpy.ndarray
+        Values of the element, empty if the element is missing or
+        empty.
+    """
+    tag = Tag(tag)
+    if tag not in dataset:
+        return np.empty(0)
+    element = dataset.get_item(tag)
+    # Implicit VR files are read without the VR of the raw elements.
+    if element.is_raw and element.VR in ("DS", "UN", None):
+        return parse_ds(element.value)
+    values = dataset[tag].value
+    if values is None:
+        return np.empty(0)
+    if not isinstance(values, (MultiValue, list, tuple)):
+        values = [values]
+    return np.array(values, dtype=float)
@@ -0,0 +1,172 @@
+"""Approximate fluence maps of the MLC apertures.
+
+Allows to check the plans without a dose calculation. The aperture of
+each control point is rasterized onto a grid in the beam's eye view
+(BEV), with the leaf positions along the x axis and the leaf boundaries
+along the y axis::
+
+    >>> import dicomhandler.fluence as fl
+    >>> fluence, x, y = fl.fluence_map(positions, boundaries, weights)
+
+The fraction of each pixel covered by the gap of a leaf pair is exact,
+so the pixels at the leaf tips and at the leaf boundaries get partial
+values. Each control point is weighted with half of the meterset of the
+segments before and after it, so the fluence is the meterset delivered
+through each pixel. The transmission through the leaves, the tongue and
+groove and the penumbra are not modelled.
+
+"""
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Number of control points rasterized at once, which bounds the memory
+# of the intermediate arrays.
+CHUNK_SIZE = 32
+
+# =============================================================================
+# GRID
+# =============================================================================
+
+
+def grid_edges(start, stop, resolution):
+    """Edges of the pixels of an axis.
+
+    Parameters
+    ----------
+    start, stop : float
+        Limits of the axis in mm. The last pixel ends at or after
+        ``stop``.
+    resolution : float
+        Size of the pixels in mm.
+
+    Returns
+    -------
+    numpy.ndarray
+        Edges of the pixels, one more than the number of pixels.
+    """
+    count = max(int(np.ceil((stop - start) / resolution - 1e-9)), 1)
+    return start + resolution * np.arange(count + 1)
+
+
+def coverage(lower, upper, edges):
+    """Fraction of each pixel between the lower and upper limits.
+
+    Parameters
+    ----------
+    lower, upper : numpy.ndarray
+        Limits of the intervals, of the same shape.
+    edges : numpy.ndarray
+        Edges of the pixels.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array with an extra last axis for the pixels.
+    """
+    inside = np.minimum(upper[..., None], edges[1:]) - np.maximum(
+        lower[..., None], edges[:-1]
+    )
+    return np.clip(inside, 0.0, None) / np.diff(edges)
+
+
+def control_point_weights(weights):
+    """Meterset of each control point from the cumulative weights.
+
+    Each segment gives half of its meterset to the control points at
+    its ends. A beam with a single control point gets its last weight.
+    """
+    weights = np.asarray(weights, dtype=float)
+    if len(weights) == 1:
+        return weights.copy()
+    delivered = np.diff(weights)
+    return (np.append(delivered, 0.0) + np.insert(delivered, 0, 0.0)) / 2
+
+
+# =============================================================================
+# FLUENCE
+# =============================================================================
+
+
+def fluence_map(
+    positions, boundaries, weights, resolution=1.0, extent=None, jaws=None
+):
+    """Fluence of a beam over a BEV grid.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        Leaf positions in mm of shape (control points, 2, leaves).
+    boundaries : numpy.ndarray
+        Leaf position boundaries in mm, one more than the leaves.
+    weights : numpy.ndarray
+        Cumulative meterset of each control point, in MU or relative.
+    resolution : float, default 1.0
+        Size of the pixels in mm.
+    extent : tuple, default None
+        Limits of the grid in mm, (xmin, xmax, ymin, ymax). By default
+        the y axis spans the leaf boundaries and the x axis the same
+        distance from the central axis.
+    jaws : tuple, default None
+        Positions of the jaws in mm, (x1, x2, y1, y2), that limit the
+        apertures.
+
+    Returns
+    -------
+    numpy.ndarray
+        Fluence of shape (y pixels, x pixels), in the units of the
+        weights.
+    numpy.ndarray
+        Centres of the pixels along x.
+    numpy.ndarray
+        Centres of the pixels along y.
+
+    Raises
+    ------
+    ValueError
+        If the resolution is not positive, if the extent is empty or if
+        the number of leaves or weights does not match.
+    """
+    if resolution <= 0:
+        raise ValueError("The resolution must be positive")
+    positions = np.asarray(positions, dtype=float)
+    boundaries = np.asarray(boundaries, dtype=float)
+    if positions.shape[2] != len(boundaries) - 1:
+        raise ValueError("One boundary more than the leaves")
+    if len(weights) != len(positions):
+        raise ValueError("One weight per control point")
+    if extent is None:
+        half = np.abs(boundaries[[0, -1]]).max()
+        extent = (-half, half, boundaries[0], boundaries[-1])
+    xmin, xmax, ymin, ymax = extent
+    if xmin >= xmax or ymin >= ymax:
+        raise ValueError("The extent must not be empty")
+    x_edges = grid_edges(xmin, xmax, resolution)
+    y_edges = grid_edges(ymin, ymax, resolution)
+
+    bank_a, bank_b = positions[:, 0], positions[:, 1]
+    lower, upper = boundaries[:-1], boundaries[1:]
+    if jaws is not None:
+        x1, x2, y1, y2 = jaws
+        bank_a, bank_b = np.maximum(bank_a, x1), np.minimum(bank_b, x2)
+        lower, upper = np.clip(lower, y1, y2), np.clip(upper, y1, y2)
+
+    # The apertures are accumulated by leaf first, and then spread
+    # over the rows of pixels of each leaf.
+    leaves = np.zeros((positions.shape[2], len(x_edges) - 1))
+    meterset = control_point_weights(weights)
+    for start in range(0, len(positions), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        leaves += np.einsum(
+            "c,cln->ln",
+            meterset[start:stop],
+            coverage(bank_a[start:stop], bank_b[start:stop], x_edges),
+        )
+    rows = coverage(lower, upper, y_edges)
+    return (
+        rows.T @ leaves,
+        (x_edges[1:] + x_edges[:-1]) / 2,
+        (y_edges[1:] + y_edges[:-1]) / 2,
+    )
@@ -0,0 +1,325 @@
+"""Vectorized geometry of the contours.
+
+Allows to simplify the oversampled contours (e.g. BODY or couch
+structures) before the exports and transformations. The points of a
+slice are an array of shape (n, 3)::
+
+    >>> import dicomhandler.geometry as gm
+    >>> simplified, deviation = gm.simplify(points, tolerance=0.5)
+
+The consecutive duplicates are removed and the collinear runs are
+reduced with the Douglas-Peucker algorithm: a point is kept only if
+the simplified contour would pass farther than ``tolerance`` from it.
+
+The contours can also be resampled at a uniform distance along their
+perimeter, or with a fixed number of points::
+
+    >>> resampled = gm.resample(points, spacing=1.0)
+    >>> resampled = gm.resample(points, count=64)
+
+"""
+import numpy as np
+
+# =============================================================================
+# DISTANCES
+# =============================================================================
+
+
+def segment_distances(points, start, end):
+    """Distances from points to segments.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        Points of shape (n, 3).
+    start, end : numpy.ndarray
+        Ends of the segments, of shape (3,) or (n, 3).
+
+    Returns
+    -------
+    numpy.ndarray
+        Distance of each point to its segment.
+    """
+    points = np.asarray(points, dtype=float)
+    start = np.broadcast_to(np.asarray(start, dtype=float), points.shape)
+    direction = np.broadcast_to(np.asarray(end, dtype=float), points.shape)
+    direction = direction - start
+    length = np.einsum("ij,ij->i", direction, direction)
+    projection = np.einsum("ij,ij->i", points - start, direction)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length > 0, projection / length, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.linalg.norm(points - (start + t[:, None] * direction), axis=1)
+
+
+# =============================================================================
+# SIMPLIFICATION
+# =============================================================================
+
+
+def remove_duplicates(points, closed=True):
+    """Find the points equal to the previous one.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        Points of shape (n, 3).
+    closed : bool, default True
+        If True, the last point is also compared with the first one.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean mask of the points to keep.
+    """
+    points = np.asarray(points, dtype=float)
+    keep = np.ones(len(points), dtype=bool)
+    if len(points) > 1:
+        keep[1:] = np.any(points[1:] != points[:-1], axis=1)
+        if closed and np.array_equal(points[-1], points[0]):
+            keep[-1] = False
+    return keep
+
+
+def _douglas_peucker(points, tolerance, keep, first, last):
+    # The segments are processed with a stack instead of recursion,
+    # and the distances of each segment in a single operation.
+    stack = [(first, last)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        inner = points[start:end][1:]
+        distances = segment_distances(inner, points[start], points[end])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            farthest += start + 1
+            keep[farthest] = True
+            stack.append((start, farthest))
+            stack.append((farthest, end))
+
+
+def douglas_peucker(points, tolerance, closed=True):
+    """Find the points kept by the Douglas-Peucker algorithm.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        Points of shape (n, 3).
+    tolerance : float
+        Maximum distance in mm from a removed point to the simplified
+        contour.
+    closed : bool, default True
+        If True, the contour goes back from the last point to the first
+        one. A closed contour keeps at least 3 points.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean mask of the points to keep.
+    """
+    points = np.asarray(points, dtype=float)
+    count = len(points)
+    if count < 3:
+        return np.ones(count, dtype=bool)
+    if not closed:
+        keep = np.zeros(count, dtype=bool)
+        keep[[0, -1]] = True
+        _douglas_peucker(points, tolerance, keep, 0, count - 1)
+        return keep
+    # The closed contour is split at the point farthest from the first
+    # one; the first point is repeated at the end to close it.
+    extended = np.vstack([points, points[:1]])
+    keep = np.zeros(count + 1, dtype=bool)
+    farthest = int(np.argmax(np.linalg.norm(points - points[0], axis=1)))
+    keep[[0, farthest, count]] = True
+    _douglas_peucker(extended, tolerance, keep, 0, farthest)
+    _douglas_peucker(extended, tolerance, keep, farthest, count)
+    keep = keep[:count]
+    if keep.sum() < 3:
+        distances = segment_distances(points, points[0], points[farthest])
+        distances[keep] = -1.0
+        keep[int(np.argmax(distances))] = True
+    return keep
+
+
+def deviation(points, keep, closed=True):
+    """Maximum distance from the removed points to the kept contour.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        Points of shape (n, 3).
+    keep : numpy.ndarray
+        Boolean mask of the kept points.
+    closed : bool, default True
+        If True, the contour goes back from the last point to the first
+        one.
+
+    Returns
+    -------
+    float
+        Maximum deviation in mm, 0 if no point was removed.
+    """
+    points = np.asarray(points, dtype=float)
+    kept = np.flatnonzero(keep)
+    if len(kept) == len(points) or len(kept) == 0:
+        return 0.0
+    removed = np.flatnonzero(~np.asarray(keep))
+    if closed:
+        # The points after the last kept one go back to the first one.
+        ends = np.append(kept, kept[0] + len(points))
+        extended = np.vstack([points, points])
+    else:
+        ends, extended = kept, points
+    segment = np.searchsorted(ends, removed, side="right") - 1
+    inside = (segment >= 0) & (segment < len(ends) - 1)
+    distances = np.zeros(len(removed))
+    distances[inside] = segment_distances(
+        points[removed[inside]],
+        extended[ends[segment[inside]]],
+        extended[ends[segment[inside] + 1]],
+    )
+    # The points before the first kept one of a closed contour belong
+    # to the closing segment.
+    before = ~inside
+    if closed and before.any():
+        distances[before] = segment_distances(
+            points[removed[before]], points[kept[-1]], points[kept[0]]
+        )
+    return float(distances.max())
+
+
+def simplify(points, tolerance, closed=True):
+    """Remove the duplicated and redundant points of a contour.
+
+    Parameters
+    ----------
+    points : array_like
+        Points of shape (n, 3).
+    tolerance : float
+        Maximum distance in mm from a removed point to the simplified
+        contour.
+    closed : bool, default True
+        If True, the contour goes back from the last point to the first
+        one.
+
+    Returns
+    -------
+    numpy.ndarray
+        Kept points, in the same order.
+    float
+        Maximum distance in mm from a removed point to the simplified
+        contour.
+
+    Raises
+    ------
+    ValueError
+        If the tolerance is negative.
+
+    Examples
+    --------
+    >>> square = [[0, 0, 0], [1, 0, 0], [2, 0, 0], [2, 2, 0], [0, 2, 0]]
+    >>> simplify(square, 0.1)[0].tolist()
+    [[0.0, 0.0, 0.0], [2.0, 0.0, 0.0], [2.0, 2.0, 0.0], [0.0, 2.0, 0.0]]
+    """
+    if tolerance < 0:
+        raise ValueError("The tolerance must be positive")
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    unique = points[remove_duplicates(points, closed)]
+    keep = douglas_peucker(unique, tolerance, closed)
+    return unique[keep], deviation(unique, keep, closed)
+
+
+# =============================================================================
+# RESAMPLING
+# =============================================================================
+
+
+def arc_lengths(points, closed=True):
+    """Distance along the contour from the first point to each point.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        Points of shape (n, 3).
+    closed : bool, default True
+        If True, the length of the segment from the last point to the
+        first one is added at the end.
+
+    Returns
+    -------
+    numpy.ndarray
+        Cumulative lengths, of size n + 1 if ``closed`` and n if not.
+        The last one is the perimeter (or the length) of the contour.
+    """
+    points = np.asarray(points, dtype=float)
+    if closed and len(points):
+        points = np.vstack([points, points[:1]])
+    segments = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    return np.concatenate([[0.0], np.cumsum(segments)])
+
+
+def resample(points, spacing=None, count=None, closed=True):
+    """Place the points of a contour at a uniform distance.
+
+    The new points are interpolated along the segments of the contour,
+    starting at its first point. Either ``spacing`` or ``count`` must
+    be given.
+
+    Parameters
+    ----------
+    points : array_like
+        Points of shape (n, 3).
+    spacing : float, default None
+        Maximum distance in mm between consecutive points. The points
+        are placed at the same distance, the largest one not greater
+        than ``spacing``.
+    count : int, default None
+        Number of points of the resampled contour.
+    closed : bool, default True
+        If True, the contour goes back from the last point to the first
+        one. A closed contour keeps at least 3 points and an open one
+        at least 2, that include its ends.
+
+    Returns
+    -------
+    numpy.ndarray
+        Resampled points of shape (count, 3).
+
+    Raises
+    ------
+    ValueError
+        If both or none of ``spacing`` and ``count`` are given, or if
+        they are not positive.
+
+    Examples
+    --------
+    >>> square = [[0, 0, 0], [2, 0, 0], [2, 2, 0], [0, 2, 0]]
+    >>> resample(square, spacing=1.0)[:3].tolist()
+    [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [2.0, 0.0, 0.0]]
+    """
+    if (spacing is None) == (count is None):
+        raise ValueError("Give either the spacing or the count")
+    minimum = 3 if closed else 2
+    if spacing is not None and spacing <= 0:
+        raise ValueError("The spacing must be positive")
+    if count is not None and count < minimum:
+        raise ValueError(f"The count must be at least {minimum}")
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    points = points[remove_duplicates(points, closed)]
+    lengths = arc_lengths(points, closed)
+    total = lengths[-1]
+    if count is None:
+        count = int(np.ceil(total / spacing - 1e-9)) + (not closed)
+        count = max(count, minimum)
+    if total == 0.0:
+        return np.repeat(points[:1], count, axis=0)
+    if closed:
+        points = np.vstack([points, points[:1]])
+        positions = np.arange(count) * (total / count)
+    else:
+        positions = np.linspace(0.0, total, count)
+    return np.column_stack(
+        [np.interp(positions, lengths, points[:, axis]) for axis in range(3)]
+    )
@@ -0,0 +1,306 @@
+"""Optional instrumentation of the public methods.
+
+Allows to record how long each call takes, split in stages (copy,
+parse, dataframe, write, ...), and counters of the processed data
+(points, slices, control points, bytes written).
+
+The instrumentation is disabled by default: an instrumented call only
+checks a flag before running. It is enabled globally with ``enable``,
+which stores the calls in ``REGISTRY``, or for a block of code with
+``instrument``, which returns its own registry::
+
+    >>> from dicomhandler import instrumentation
+    >>> with instrumentation.instrument() as registry:
+    ...     dicom.struct_to_csv('output.csv')
+    >>> registry.to_dataframe()
+
+The functions added with ``add_callback`` receive every finished call
+while the instrumentation is enabled.
+
+"""
+import contextlib
+import functools
+import threading
+import time
+
+import pandas as pd
+
+# =============================================================================
+# STATE
+# =============================================================================
+
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+
+# Set by ``enable``, registries of the active ``instrument`` blocks and
+# functions added with ``add_callback``.
+_GLOBAL = False
+_BLOCKS = []
+_CALLBACKS = []
+
+_ENABLED = False
+
+# =============================================================================
+# RECORDS
+# =============================================================================
+
+
+class CallRecord:
+    """Timings and counters of a call to an instrumented function.
+
+    Attributes
+    ----------
+    name : str
+        Name of the function, e.g. ``'DicomInfo.move'``.
+    depth : int
+        Number of instrumented calls running when the call started.
+    duration : float
+        Time of the call in seconds.
+    stages : dict
+        Accumulated time in seconds of each stage.
+    counters : dict
+        Accumulated value of each counter.
+    error : str or None
+        Name of the exception raised by the call.
+    """
+
+    def __init__(self, name, depth=0):
+        self.name = name
+        self.depth = depth
+        self.duration = 0.0
+        self.stages = {}
+        self.counters = {}
+        self.error = None
+
+    def __repr__(self):
+        """Representation of the record."""
+        return (
+            f"<CallRecord {self.name} {self.duration:.6f}s "
+            f"stages={self.stages} counters={self.counters}>"
+        )
+
+    def as_dict(self):
+        """Flatten the record, with ``stage_`` prefixed timings."""
+        data = {
+            "name": self.name,
+            "depth": self.depth,
+            "duration": self.duration,
+            "error": self.error,
+        }
+        data.update(
+            {f"stage_{stage}": value for stage, value in self.stages.items()}
+        )
+        data.update(self.counters)
+        return data
+
+
+class Registry:
+    """Collection of the finished calls."""
+
+    def __init__(self):
+        self.records = []
+
+    def __len__(self):
+        """Number of records."""
+        return len(self.records)
+
+    def add(self, record):
+        """Store a record."""
+        with _LOCK:
+            self.records.append(record)
+
+    def clear(self):
+        """Remove all the records."""
+        with _LOCK:
+            self.records.clear()
+
+    def to_dataframe(self):
+        """Report the records in a dataframe, one row per call."""
+        with _LOCK:
+            rows = [record.as_dict() for record in self.records]
+        return pd.DataFrame(rows, columns=None if rows else ["name"])
+
+
+REGISTRY = Registry()
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+
+def _update():
+    global _ENABLED
+    _ENABLED = _GLOBAL or bool(_BLOCKS)
+
+
+def is_enabled():
+    """Return True if the calls are being recorded."""
+    return _ENABLED
+
+
+def enable():
+    """Record the calls in ``REGISTRY`` and send them to the callbacks."""
+    global _GLOBAL
+    with _LOCK:
+        _GLOBAL = True
+        _update()
+
+
+def disable():
+    """Stop recording in ``REGISTRY``.
+
+    The calls are still recorded inside the active ``instrument``
+    blocks.
+    """
+    global _GLOBAL
+    with _LOCK:
+        _GLOBAL = False
+        _update()
+
+
+def add_callback(callback):
+    """Call ``callback(record)`` after each instrumented call."""
+    with _LOCK:
+        _CALLBACKS.append(callback)
+
+
+def remove_callback(callback):
+    """Remove a function added with ``add_callback``."""
+    with _LOCK:
+        _CALLBACKS.remove(callback)
+
+
+@contextlib.contextmanager
+def instrument(callback=None):
+    """Record the calls made inside a block of code.
+
+    Parameters
+    ----------
+    callback : callable, default None
+        Function called with each record of the block.
+
+    Yields
+    ------
+    Registry
+        Registry with the calls of the block.
+    """
+    registry = Registry()
+    block = (registry, callback)
+    with _LOCK:
+        _BLOCKS.append(block)
+        _update()
+    try:
+        yield registry
+    finally:
+        with _LOCK:
+            _BLOCKS.remove(block)
+            _update()
+
+
+def _dispatch(record):
+    with _LOCK:
+        sinks = [registry.add for registry, _ in _BLOCKS]
+        sinks += [callback for _, callback in _BLOCKS if callback]
+        if _GLOBAL:
+            sinks.append(REGISTRY.add)
+        sinks += _CALLBACKS
+    for sink in sinks:
+        sink(record)
+
+
+# =============================================================================
+# HOOKS
+# =============================================================================
+
+
+def _stack():
+    stack = getattr(_LOCAL, "stack", None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    return stack
+
+
+def instrumented(name):
+    """Decorate a function to record its calls.
+
+    Parameters
+    ----------
+    name : str
+        Name of the records of the function.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return function(*args, **kwargs)
+            stack = _stack()
+            record = CallRecord(name, len(stack))
+            stack.append(record)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except BaseException as error:
+                record.error = type(error).__name__
+                raise
+            finally:
+                record.duration = time.perf_counter() - start
+                stack.pop()
+                _dispatch(record)
+
+        return wrapper
+
+    return decorator
+
+
+class _Stage:
+    __slots__ = ("record", "name", "start")
+
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stages = self.record.stages
+        stages[self.name] = stages.get(self.name, 0.0) + elapsed
+        return False
+
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def stage(name):
+    """Time a stage of the current call.
+
+    Returns a context manager. If the instrumentation is disabled or if
+    there is no instrumented call running, it does nothing.
+    """
+    if not _ENABLED:
+        return _NULL_STAGE
+    stack = _stack()
+    if not stack:
+        return _NULL_STAGE
+    return _Stage(stack[-1], name)
+
+
+def count(name, value=1):
+    """Add ``value`` to a counter of the current call."""
+    if not _ENABLED:
+        return
+    stack = _stack()
+    if stack:
+        counters = stack[-1].counters
+        counters[name] = counters.get(name, 0) + value
+
+
+def tell(buffer):
+    """Return the position of a buffer, or None if it is not available."""
+    try:
+        return buffer.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
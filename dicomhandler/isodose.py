@@ -0,0 +1,293 @@
+"""Isodose lines of the dose grids.
+
+Allows to convert the isodose lines of an RTDOSE file into structures.
+Each plane of the grid is traced with the marching squares algorithm
+for all the levels at once, and the iso-lines are closed contours in
+the coordinates of the patient::
+
+    >>> import dicomhandler.isodose as iso
+    >>> lines = iso.marching_squares(plane, levels=[10.0, 19.0])
+    >>> contours = iso.isodose_contours(frames, [10.0, 19.0], geometry)
+
+The planes are read one by one, so ``frames`` can be a memory-mapped
+array or the view of the pixel data returned by ``dose_frames``. The
+pixels at the border of the grid are surrounded by a dose below every
+level, so the iso-lines that reach the border are closed along it. At
+the saddle cells, the regions above the level are joined if the mean
+of the cell is above it.
+
+See ``DicomInfo.isodose`` to add the isodose lines to the structures.
+
+"""
+import numpy as np
+
+# =============================================================================
+# MARCHING SQUARES
+# =============================================================================
+
+
+def _edge_points(plane, levels):
+    """Crossings of the levels along the horizontal and vertical edges.
+
+    Returns the positions (row, column) of the crossings, of shape
+    (levels, edges, 2), with the horizontal edges first.
+    """
+    level = levels[:, None, None]
+    pieces = []
+    for first, second, shift in [
+        (plane[:, :-1], plane[:, 1:], (0.0, 1.0)),
+        (plane[:-1, :], plane[1:, :], (1.0, 0.0)),
+    ]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.clip((level - first) / (second - first), 0.0, 1.0)
+        row, column = np.indices(first.shape)
+        pieces.append(
+            np.stack(
+                [
+                    row + shift[0] * np.nan_to_num(fraction),
+                    column + shift[1] * np.nan_to_num(fraction),
+                ],
+                axis=-1,
+            ).reshape(len(levels), -1, 2)
+        )
+    return np.concatenate(pieces, axis=1)
+
+
+def _cell_edges(rows, columns):
+    """Index of the four edges of each cell, of shape (cells, 4)."""
+    horizontal = np.arange(rows * (columns - 1)).reshape(rows, columns - 1)
+    vertical = rows * (columns - 1) + np.arange((rows - 1) * columns)
+    vertical = vertical.reshape(rows - 1, columns)
+    return np.stack(
+        [
+            horizontal[:-1],
+            vertical[:, 1:],
+            horizontal[1:],
+            vertical[:, :-1],
+        ],
+        axis=-1,
+    ).reshape(-1, 4)
+
+
+def _successors(plane, levels, edges):
+    """Oriented segments of every level as edge successors.
+
+    The corners of a cell are its top left, top right, bottom right and
+    bottom left pixels, and the edge k goes from the corner k to k + 1.
+    Around the corners of a cell, an edge goes into the region above
+    the level or out of it. Each segment goes from an edge into the
+    region to an edge out of it, so the segments of adjacent cells are
+    chained through their common edge.
+    """
+    count = edges.max() + 1
+    successor = np.full(len(levels) * count, -1)
+    corners = np.stack(
+        [plane[:-1, :-1], plane[:-1, 1:], plane[1:, 1:], plane[1:, :-1]],
+        axis=-1,
+    ).reshape(-1, 4)
+    above = corners[None] >= levels[:, None, None]
+    following = np.roll(above, -1, axis=-1)
+    inward = ~above & following
+    outward = above & ~following
+    saddle = inward.sum(axis=-1) == 2
+    joined = corners.mean(axis=-1)[None] >= levels[:, None]
+    offset = (np.arange(len(levels)) * count)[:, None]
+    single = np.argmax(outward, axis=-1)
+    for edge in range(4):
+        selected = inward[..., edge]
+        target = np.where(
+            saddle,
+            np.where(joined, (edge - 1) % 4, (edge + 1) % 4),
+            single,
+        )
+        level, cell = np.nonzero(selected)
+        target = target[level, cell]
+        source = edges[cell, edge] + offset[level, 0]
+        successor[source] = edges[cell, target] + offset[level, 0]
+    return successor
+
+
+def marching_squares(plane, levels):
+    """Trace the iso-lines of a plane.
+
+    Parameters
+    ----------
+    plane : array_like
+        Values of shape (rows, columns).
+    levels : array_like
+        Values of the iso-lines.
+
+    Returns
+    -------
+    list
+        For each level, a list with the closed iso-lines as arrays of
+        shape (n, 2) with the positions (row, column) in pixels. The
+        first point is not repeated at the end.
+
+    Examples
+    --------
+    >>> plane = [[0, 0, 0], [0, 2, 0], [0, 0, 0]]
+    >>> marching_squares(plane, [1.0])[0][0].tolist()
+    [[1.0, 0.5], [1.5, 1.0], [1.0, 1.5], [0.5, 1.0]]
+    """
+    plane = np.asarray(plane, dtype=float)
+    levels = np.atleast_1d(np.asarray(levels, dtype=float))
+    low = min(np.nanmin(plane, initial=0.0), levels.min()) - 1.0
+    padded = np.pad(np.nan_to_num(plane, nan=low), 1, constant_values=low)
+    rows, columns = padded.shape
+    edges = _cell_edges(rows, columns)
+    successor = _successors(padded, levels, edges)
+    points = _edge_points(padded, levels).reshape(-1, 2) - 1.0
+    points = np.clip(points, 0.0, np.array(plane.shape) - 1.0)
+
+    lines = [[] for _ in levels]
+    count = edges.max() + 1
+    crossed = np.flatnonzero(successor >= 0)
+    # The successors are followed by position in the crossed edges, so
+    # the walk only visits the points of the iso-lines.
+    following = np.searchsorted(crossed, successor[crossed]).tolist()
+    visited = [False] * len(crossed)
+    for start in range(len(crossed)):
+        if visited[start]:
+            continue
+        loop, current = [], start
+        while not visited[current]:
+            visited[current] = True
+            loop.append(current)
+            current = following[current]
+        line = points[crossed[loop]]
+        keep = np.ones(len(line), dtype=bool)
+        keep[1:] = np.any(line[1:] != line[:-1], axis=1)
+        if len(line) > 1 and np.array_equal(line[-1], line[0]):
+            keep[-1] = False
+        line = line[keep]
+        if len(line) >= 3:
+            lines[crossed[start] // count].append(line)
+    return lines
+
+
+# =============================================================================
+# DOSE GRID
+# =============================================================================
+
+
+def grid_geometry(dataset):
+    """Position of the pixels of an RTDOSE dataset.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        RTDOSE dataset.
+
+    Returns
+    -------
+    dict
+        ``'origin'`` (position of the first pixel), ``'row'`` and
+        ``'column'`` (displacements in mm between adjacent columns and
+        rows), ``'normal'`` (unit vector between the planes) and
+        ``'offsets'`` (distance in mm from the first plane to each
+        plane).
+    """
+    origin = np.array(dataset.ImagePositionPatient, dtype=float)
+    orientation = np.array(
+        dataset.get("ImageOrientationPatient", [1, 0, 0, 0, 1, 0]),
+        dtype=float,
+    )
+    row_spacing, column_spacing = np.array(dataset.PixelSpacing, dtype=float)
+    offsets = np.array(
+        dataset.get("GridFrameOffsetVector", [0.0]), dtype=float
+    )
+    # The offsets are relative to the first plane only if the first one
+    # is 0; otherwise they are its position.
+    offsets = offsets - offsets[0]
+    return {
+        "origin": origin,
+        "row": orientation[:3] * column_spacing,
+        "column": orientation[3:] * row_spacing,
+        "normal": np.cross(orientation[:3], orientation[3:]),
+        "offsets": offsets,
+    }
+
+
+def dose_frames(dataset):
+    """Planes of an RTDOSE dataset without decoding the pixel data.
+
+    The planes of an uncompressed dataset are a read-only view of the
+    bytes of ``PixelData``, so they are not copied and each plane is
+    converted only when it is traced. The ``pixel_array`` is used for
+    the compressed transfer syntaxes.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        RTDOSE dataset.
+
+    Returns
+    -------
+    numpy.ndarray
+        Stored values of shape (planes, rows, columns), without the
+        ``DoseGridScaling``.
+    """
+    meta = getattr(dataset, "file_meta", None)
+    syntax = meta.get("TransferSyntaxUID") if meta is not None else None
+    shape = (
+        int(dataset.get("NumberOfFrames", 1)),
+        dataset.Rows,
+        dataset.Columns,
+    )
+    if syntax is not None and syntax.is_compressed:
+        return dataset.pixel_array.reshape(shape)
+    little = getattr(dataset, "is_little_endian", None)
+    if little is None:
+        little = syntax is None or syntax.is_little_endian
+    kind = "i" if dataset.get("PixelRepresentation", 0) else "u"
+    dtype = np.dtype(f"{kind}{dataset.BitsAllocated // 8}")
+    dtype = dtype.newbyteorder("<" if little else ">")
+    return np.frombuffer(
+        dataset.PixelData, dtype, int(np.prod(shape))
+    ).reshape(shape)
+
+
+def isodose_contours(frames, levels, geometry, scaling=1.0):
+    """Trace the isodose lines of every plane of a dose grid.
+
+    Parameters
+    ----------
+    frames : array_like
+        Dose grid of shape (planes, rows, columns), e.g. the
+        ``pixel_array`` of an RTDOSE dataset or a memory-mapped array.
+    levels : array_like
+        Doses of the isodose lines, in the units of the scaled grid.
+    geometry : dict
+        Position of the pixels, as returned by ``grid_geometry``.
+    scaling : float, default 1.0
+        Factor applied to each plane, e.g. ``DoseGridScaling``.
+
+    Returns
+    -------
+    list
+        For each level, a list with the closed isodose lines as arrays
+        of shape (n, 3) in the coordinates of the patient.
+
+    Raises
+    ------
+    ValueError
+        If the number of planes does not match the offsets.
+    """
+    levels = np.atleast_1d(np.asarray(levels, dtype=float))
+    if len(frames) != len(geometry["offsets"]):
+        raise ValueError("One offset per plane of the grid")
+    contours = [[] for _ in levels]
+    for frame, offset in zip(frames, geometry["offsets"]):
+        plane = np.asarray(frame, dtype=float) * scaling
+        if plane.max(initial=-np.inf) < levels.min():
+            continue
+        start = geometry["origin"] + offset * geometry["normal"]
+        for level, lines in enumerate(marching_squares(plane, levels)):
+            for line in lines:
+                contours[level].append(
+                    start
+                    + line[:, 1:] * geometry["row"]
+                    + line[:, :1] * geometry["column"]
+                )
+    return contours
@@ -0,0 +1,191 @@
+"""Progress reporting and cancellation of long operations.
+
+Allows to follow the exports and transformations of big structures
+(e.g. BODY) and to stop them from another thread. The methods that
+support it receive a ``progress`` callback and a ``cancel`` token::
+
+    >>> from dicomhandler.progress import CancellationToken
+    >>> token = CancellationToken()
+    >>> def show(info):
+    ...     print(f"{info.fraction:.0%} {info.rate:.0f} points/s")
+    >>> dicom.struct_to_csv('output.csv', progress=show, cancel=token)
+
+Calling ``token.cancel()`` makes the method raise ``Cancelled`` at the
+next slice.
+
+"""
+import threading
+import time
+
+# =============================================================================
+# CANCELLATION
+# =============================================================================
+
+
+class Cancelled(Exception):
+    """The operation was cancelled with its token."""
+
+
+class CancellationToken:
+    """Flag to request the cancellation of an operation.
+
+    The token can be shared between threads and by many operations.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self):
+        """Return True if the cancellation was requested."""
+        return self._event.is_set()
+
+    def cancel(self):
+        """Request the cancellation."""
+        self._event.set()
+
+    def raise_if_cancelled(self):
+        """Raise ``Cancelled`` if the cancellation was requested."""
+        if self._event.is_set():
+            raise Cancelled("The operation was cancelled")
+
+
+# =============================================================================
+# PROGRESS
+# =============================================================================
+
+
+class ProgressInfo:
+    """State of an operation sent to the progress callback.
+
+    Attributes
+    ----------
+    operation : str
+        Name of the method, e.g. ``'struct_to_csv'``.
+    unit : str
+        Unit of the work: ``'points'`` or ``'control points'``.
+    done : int
+        Processed units.
+    total : int
+        Units to process.
+    item : str or None
+        Structure or beam being processed.
+    items_done : int
+        Finished structures or beams.
+    items_total : int
+        Structures or beams to process.
+    elapsed : float
+        Seconds since the start of the operation.
+    finished : bool
+        True in the last notification.
+    """
+
+    def __init__(self, operation, unit, total, items_total):
+        self.operation = operation
+        self.unit = unit
+        self.done = 0
+        self.total = total
+        self.item = None
+        self.items_done = 0
+        self.items_total = items_total
+        self.elapsed = 0.0
+        self.finished = False
+
+    def __repr__(self):
+        """Representation of the state."""
+        return (
+            f"<ProgressInfo {self.operation} {self.done}/{self.total} "
+            f"{self.unit}, {self.rate:.0f} {self.unit}/s>"
+        )
+
+    @property
+    def fraction(self):
+        """Processed fraction, between 0 and 1."""
+        if self.total:
+            return min(self.done / self.total, 1.0)
+        return 1.0 if self.finished else 0.0
+
+    @property
+    def rate(self):
+        """Throughput in units per second."""
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class Tracker:
+    """Report the progress of an operation and check its cancellation.
+
+    Parameters
+    ----------
+    operation : str
+        Name of the operation.
+    callback : callable, default None
+        Function called with a ``ProgressInfo``.
+    cancel : CancellationToken, default None
+        Token checked at each step.
+    total : int, default 0
+        Units to process.
+    items : int, default 0
+        Structures or beams to process.
+    unit : str, default 'points'
+        Unit of the work.
+    interval : float, default 0.1
+        Minimum seconds between two notifications inside a structure
+        or beam. The start and end of each one are always notified.
+    """
+
+    def __init__(
+        self,
+        operation,
+        callback=None,
+        cancel=None,
+        total=0,
+        items=0,
+        unit="points",
+        interval=0.1,
+    ):
+        self.callback = callback
+        self.cancel = cancel
+        self.interval = interval
+        self.info = ProgressInfo(operation, unit, total, items)
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def _notify(self, now=None):
+        now = time.perf_counter() if now is None else now
+        self._last = now
+        self.info.elapsed = now - self._start
+        self.callback(self.info)
+
+    def check(self):
+        """Raise ``Cancelled`` if the cancellation was requested."""
+        if self.cancel is not None:
+            self.cancel.raise_if_cancelled()
+
+    def start_item(self, name):
+        """Start a structure or beam."""
+        self.check()
+        self.info.item = name
+        if self.callback is not None:
+            self._notify()
+
+    def advance(self, amount=1):
+        """Add processed units."""
+        self.check()
+        self.info.done += amount
+        if self.callback is not None:
+            now = time.perf_counter()
+            if now - self._last >= self.interval:
+                self._notify(now)
+
+    def finish_item(self):
+        """Finish a structure or beam."""
+        self.info.items_done += 1
+        if self.callback is not None:
+            self._notify()
+
+    def finish(self):
+        """Send the last notification."""
+        self.info.finished = True
+        self.info.item = None
+        if self.callback is not None:
+            self._notify()
@@ -7,7 +7,10 @@ import numpy as np
 
 import pandas as pd
 
+from . import instrumentation
 
+
+@instrumentation.instrumented("report")
 def report(dicom1, dicom2, struct):
     """Report metrics from structures.
 
@@ -46,29 +49,24 @@ def report(dicom1, dicom2, struct):
     >>> # Report for the original and displaced lesion.
     >>> rp(dicom, moved, 'tumor')
     """
-    all_values, radius, distance = [], [], []
-    for _, file in enumerate([dicom1, dicom2]):
-        for item, name in enumerate(file.dicom_struct.StructureSetROISequence):
-            array = []
-            if name.ROIName == struct:
-                for _, contour in enumerate(
-                    file.dicom_struct.ROIContourSequence[item].ContourSequence
-                ):
-                    count = 0
-                    while count < int(len(contour.ContourData) / 3):
-                        array.append(
-                            [
-                                float(contour.ContourData[3 * count]),
-                                float(contour.ContourData[3 * count + 1]),
-                                float(contour.ContourData[3 * count + 2]),
-                            ]
-                        )
-                        count = count + 1
-                all_values.append(array)
+    all_values, centres, radius, distance = [], [], [], []
+    with instrumentation.stage("parse"):
+        for file in [dicom1, dicom2]:
+            names = [
+                name.ROIName
+                for name in file.dicom_struct.StructureSetROISequence
+            ]
+            if struct in names:
+                # The points are cached by the object until the
+                # structure is modified.
+                points = file._roi_points(struct)
+                instrumentation.count("points", len(points))
+                all_values.append(points)
+                centres.append(file._centroid(struct))
     if len(all_values) == 0:
         raise ValueError("Wrong name or name must match between two DICOM")
     elif len(all_values[0][:][:]) == len(all_values[1][:][:]):
-        centermass = np.mean(all_values, axis=1)
+        centermass = np.array(centres)
         difference = np.array(all_values[0][:][:]) - np.array(
             all_values[1][:][:]
         )
@@ -0,0 +1,240 @@
+"""Streaming samples of the MLC states of a beam.
+
+Allows to feed Monte Carlo simulations with the machine state between
+the control points. The gantry angle, the jaws and the leaves are
+interpolated linearly between the control points, and the samples are
+yielded in batches, so any number of them is produced with constant
+memory::
+
+    >>> sampler = dicom.mlc_sampler(beam=1)
+    >>> for batch in sampler.random(10_000_000, seed=0):
+    ...     simulate(batch)
+
+Each sample is a row with the columns of ``MLCSampler.columns``: the
+relative cumulative meterset, the gantry angle, the jaws (X1, X2, Y1,
+Y2) and the positions of the leaves of the bank A and then the bank B.
+The batches can also be written to a binary file with ``write``.
+
+"""
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+BATCH_SIZE = 10_000
+
+JAW_COLUMNS = ["X1", "X2", "Y1", "Y2"]
+
+# =============================================================================
+# SAMPLER
+# =============================================================================
+
+
+def _locate(cumulative, values):
+    """Segment and fraction of each value along a cumulative array.
+
+    The segments without length (e.g. without meterset) are never
+    selected, except at the end of the array.
+    """
+    last = len(cumulative) - 2
+    index = np.clip(np.searchsorted(cumulative, values, "right") - 1, 0, last)
+    length = cumulative[index + 1] - cumulative[index]
+    fraction = np.divide(
+        values - cumulative[index],
+        length,
+        out=np.ones(len(values)),
+        where=length > 0,
+    )
+    return index, np.clip(fraction, 0.0, 1.0)
+
+
+class MLCSampler:
+    """Interpolated states of a beam between its control points.
+
+    Parameters
+    ----------
+    weights : numpy.ndarray
+        Cumulative meterset weight of each control point.
+    gantry : numpy.ndarray
+        Gantry angle in degrees of each control point.
+    jaws : numpy.ndarray
+        Positions of the jaws (X1, X2, Y1, Y2) of each control point, of
+        shape (control points, 4).
+    leaves : numpy.ndarray
+        Positions of the leaves of each control point, of shape
+        (control points, 2 * leaves).
+
+    Raises
+    ------
+    ValueError
+        If the arrays do not have a row per control point.
+    """
+
+    def __init__(self, weights, gantry, jaws, leaves):
+        weights = np.asarray(weights, dtype=float)
+        count = len(weights)
+        leaves = np.asarray(leaves, dtype=float).reshape(count, -1)
+        jaws = np.asarray(jaws, dtype=float).reshape(-1, 4)
+        if count < 1 or len(gantry) != count or len(jaws) != count:
+            raise ValueError("One value per control point")
+        if weights[-1] > 0:
+            weights = weights / weights[-1]
+        else:
+            weights = np.linspace(0.0, 1.0, count)
+        # A beam with a single control point is repeated, so every
+        # sample has a segment.
+        if count == 1:
+            weights = np.array([0.0, 1.0])
+            gantry, jaws, leaves = [
+                np.repeat(array, 2, axis=0)
+                for array in (np.asarray(gantry, dtype=float), jaws, leaves)
+            ]
+        # The gantry is unwrapped, so it is interpolated along its
+        # rotation and not across 0 degrees.
+        unwrapped = np.unwrap(np.asarray(gantry, dtype=float), period=360.0)
+        self.weights = weights
+        self.travel = np.concatenate(
+            [[0.0], np.cumsum(np.abs(np.diff(unwrapped)))]
+        )
+        self.states = np.column_stack([weights, unwrapped, jaws, leaves])
+        self.differences = np.diff(self.states, axis=0)
+        self.leaves = leaves.shape[1] // 2
+
+    @property
+    def columns(self):
+        """Names of the columns of the samples."""
+        return (
+            ["meterset", "gantry"]
+            + JAW_COLUMNS
+            + [f"A{leaf + 1}" for leaf in range(self.leaves)]
+            + [f"B{leaf + 1}" for leaf in range(self.leaves)]
+        )
+
+    def _interpolate(self, index, fraction):
+        """States at the fractions of the segments."""
+        states = self.differences[index]
+        states *= fraction[:, None]
+        states += self.states[index]
+        states[:, 1] %= 360.0
+        return states
+
+    def at(self, meterset):
+        """States at relative cumulative metersets.
+
+        Parameters
+        ----------
+        meterset : array_like
+            Relative cumulative metersets, from 0 to 1.
+
+        Returns
+        -------
+        numpy.ndarray
+            A sample per meterset.
+        """
+        meterset = np.atleast_1d(np.asarray(meterset, dtype=float))
+        return self._interpolate(*_locate(self.weights, meterset))
+
+    def random(self, count, batch_size=BATCH_SIZE, seed=None):
+        """Yield samples at random metersets, one per particle history.
+
+        The metersets are uniform, so the control points are sampled in
+        proportion to their monitor units.
+
+        Parameters
+        ----------
+        count : int
+            Number of samples.
+        batch_size : int, default 10000
+            Maximum number of samples of each batch.
+        seed : int, default None
+            Seed of the random generator.
+
+        Yields
+        ------
+        numpy.ndarray
+            Batches of samples.
+
+        Raises
+        ------
+        ValueError
+            If the count is negative or the batch size is not positive.
+        """
+        if count < 0 or batch_size <= 0:
+            raise ValueError("The count and batch size must be positive")
+        rng = np.random.default_rng(seed)
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            yield self.at(rng.uniform(0.0, 1.0, size))
+
+    def steps(self, angle_step, batch_size=BATCH_SIZE):
+        """Yield samples at every step of the gantry rotation.
+
+        Parameters
+        ----------
+        angle_step : float
+            Rotation in degrees between consecutive samples.
+        batch_size : int, default 10000
+            Maximum number of samples of each batch.
+
+        Yields
+        ------
+        numpy.ndarray
+            Batches of samples, from the first control point to the
+            last one.
+
+        Raises
+        ------
+        ValueError
+            If the step or the batch size is not positive, or if the
+            gantry does not rotate.
+        """
+        if angle_step <= 0 or batch_size <= 0:
+            raise ValueError("The step and batch size must be positive")
+        total = self.travel[-1]
+        if total == 0.0:
+            raise ValueError("The gantry does not rotate")
+        count = int(np.floor(total / angle_step + 1e-9)) + 1
+        for start in range(0, count, batch_size):
+            stop = min(start + batch_size, count)
+            travel = np.minimum(np.arange(start, stop) * angle_step, total)
+            yield self._interpolate(*_locate(self.travel, travel))
+
+
+# =============================================================================
+# OUTPUT
+# =============================================================================
+
+
+def write(batches, path_or_buff, dtype=np.float32):
+    """Write batches of samples to a binary file.
+
+    The samples are written as rows of ``dtype`` values in the native
+    byte order, without header, so they are read with
+    ``numpy.fromfile(path, dtype).reshape(-1, len(columns))``.
+
+    Parameters
+    ----------
+    batches : iterable of numpy.ndarray
+        Batches of samples, e.g. of ``MLCSampler.random``.
+    path_or_buff : str, pathlib.Path or binary buffer
+        Path of the file or buffer opened in binary mode.
+    dtype : numpy.dtype, default numpy.float32
+        Type of the values.
+
+    Returns
+    -------
+    int
+        Number of samples written.
+    """
+    close = not hasattr(path_or_buff, "write")
+    buffer = open(path_or_buff, "wb") if close else path_or_buff
+    written = 0
+    try:
+        for batch in batches:
+            buffer.write(np.ascontiguousarray(batch, dtype=dtype).tobytes())
+            written += len(batch)
+    finally:
+        if close:
+            buffer.close()
+    return written
@@ -0,0 +1,293 @@
+"""Process-wide cache of the plan summaries.
+
+Allows to reuse the dataframes of ``DicomInfo.summarize_to_dataframe``
+between objects that load the same plan, e.g. a dashboard that reads
+the plans again at each request. The entries are keyed by the
+SOPInstanceUID of the plan and a hash of the sequences the summary is
+built from, so a modified plan is never served a stale summary. The
+least recently used entries are evicted when the number of entries or
+their size exceeds the limits::
+
+    >>> from dicomhandler import summary_cache
+    >>> summary_cache.configure(max_bytes=256 * 2**20, directory='cache')
+
+With a directory, the summaries are also written to disk and are found
+by the next processes.
+
+.. note::
+    The files of the directory are read with ``pickle``: only use
+    directories written by trusted processes.
+
+"""
+import hashlib
+import os
+import pathlib
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from pydicom.filebase import DicomBytesIO
+from pydicom.filewriter import write_data_element
+
+from . import instrumentation
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Sequences of the plan used by summarize_to_dataframe.
+SUMMARY_KEYWORDS = ["BeamSequence", "DoseReferenceSequence"]
+
+DEFAULT_MAX_ENTRIES = 256
+
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+# =============================================================================
+# KEYS
+# =============================================================================
+
+
+def _hash_element(digest, element, encoding):
+    """Add an element, and the items of a sequence, to a digest."""
+    digest.update(f"{int(element.tag):08x}{element.VR}".encode())
+    if element.is_raw:
+        value = element.value or b""
+        digest.update(b"R%d:" % len(value))
+        digest.update(value)
+    elif element.VR == "SQ":
+        digest.update(b"S%d:" % len(element.value))
+        for item in element.value:
+            digest.update(b"I")
+            for tag in sorted(item.keys()):
+                _hash_element(digest, item.get_item(tag), encoding)
+            digest.update(b"E")
+    else:
+        buffer = DicomBytesIO()
+        buffer.is_little_endian, buffer.is_implicit_VR = encoding
+        write_data_element(buffer, element)
+        digest.update(b"V")
+        digest.update(buffer.getvalue())
+
+
+def content_hash(dataset, keywords=SUMMARY_KEYWORDS):
+    """Hash the encoded bytes of some elements of a dataset.
+
+    The elements are visited with ``Dataset.get_item``, so the raw
+    elements (e.g. the sequences of a plan read from a file) are hashed
+    with the bytes that were read, without decoding them. Only the
+    elements that were already converted are encoded again, so the
+    hash is cheaper than a summary.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        Dataset to hash.
+    keywords : list, default SUMMARY_KEYWORDS
+        Keywords of the hashed elements.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest.
+    """
+    little_endian = getattr(dataset, "is_little_endian", None)
+    implicit_vr = getattr(dataset, "is_implicit_VR", None)
+    encoding = (
+        True if little_endian is None else little_endian,
+        True if implicit_vr is None else implicit_vr,
+    )
+    digest = hashlib.blake2b(digest_size=16)
+    for keyword in keywords:
+        if keyword in dataset:
+            _hash_element(digest, dataset.get_item(keyword), encoding)
+    return digest.hexdigest()
+
+
+def summary_key(plan, area):
+    """Return the cache key of the summary of a plan."""
+    return (
+        str(plan.get("SOPInstanceUID", "")),
+        content_hash(plan),
+        "area" if area else "plan",
+    )
+
+
+def _file_name(key):
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+    return f"{digest}.pkl"
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+
+class SummaryCache:
+    """Bounded LRU cache of dataframes, shared by the threads.
+
+    Parameters
+    ----------
+    max_entries : int, default 256
+        Maximum number of entries in memory. With 0 nothing is cached.
+    max_bytes : int, default 64 MiB
+        Maximum size in memory of the cached dataframes.
+    directory : str or pathlib.Path, default None
+        Directory to persist the entries. By default they are only kept
+        in memory.
+    max_disk_bytes : int, default None
+        Maximum size of the files of the directory. By default it is
+        not limited.
+
+    Examples
+    --------
+    >>> cache = SummaryCache(max_entries=1000, directory='cache')
+    >>> df = cache.get_or_compute(key, compute)
+    """
+
+    def __init__(
+        self,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        max_bytes=DEFAULT_MAX_BYTES,
+        directory=None,
+        max_disk_bytes=None,
+    ):
+        if max_entries < 0 or max_bytes < 0:
+            raise ValueError("The limits of the cache must be positive")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = None if directory is None else pathlib.Path(directory)
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self):
+        """Number of entries in memory."""
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        """Size in memory of the cached dataframes."""
+        return self._bytes
+
+    def _store(self, key, value):
+        size = int(value.memory_usage(deep=True).sum())
+        if size > self.max_bytes or self.max_entries == 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while (
+                len(self._entries) > self.max_entries
+                or self._bytes > self.max_bytes
+            ):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get(self, key):
+        """Return the dataframe of a key, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.directory is not None:
+            path = self.directory / _file_name(key)
+            try:
+                value = pd.read_pickle(path)
+                os.utime(path)
+            except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+                pass
+            else:
+                self._store(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Cache the dataframe of a key."""
+        self._store(key, value)
+        if self.directory is not None:
+            path = self.directory / _file_name(key)
+            temporary = path.with_suffix(
+                f".{os.getpid()}.{threading.get_ident()}.tmp"
+            )
+            value.to_pickle(temporary)
+            os.replace(temporary, path)
+            self._evict_files()
+
+    def get_or_compute(self, key, compute):
+        """Return the cached dataframe or compute and cache it."""
+        value = self.get(key)
+        if value is not None:
+            instrumentation.count("summary_cache_hits")
+            return value
+        instrumentation.count("summary_cache_misses")
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def _evict_files(self):
+        # The least recently used files are the oldest ones.
+        if self.max_disk_bytes is None:
+            return
+        files = []
+        for path in self.directory.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        """Remove the entries in memory and on disk."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+        if self.directory is not None:
+            for path in self.directory.glob("*.pkl"):
+                path.unlink(missing_ok=True)
+
+
+SUMMARY_CACHE = SummaryCache()
+
+
+def configure(
+    max_entries=DEFAULT_MAX_ENTRIES,
+    max_bytes=DEFAULT_MAX_BYTES,
+    directory=None,
+    max_disk_bytes=None,
+):
+    """Replace the process-wide cache.
+
+    The parameters are the ones of ``SummaryCache``. With
+    ``max_entries=0`` and no directory the cache is disabled.
+
+    Returns
+    -------
+    SummaryCache
+        The new cache.
+    """
+    global SUMMARY_CACHE
+    SUMMARY_CACHE = SummaryCache(
+        max_entries, max_bytes, directory, max_disk_bytes
+    )
+    return SUMMARY_CACHE
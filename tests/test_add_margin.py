@@ -1,3 +1,8 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler.dicom_info import DicomInfo
+
+from pydicom.dataset import Dataset
 from pydicom.multival import MultiValue
 
 import pytest
@@ -96,3 +101,137 @@ def test_add_margin(di_1p_fixt, struct, margin, index, expected):
     )
     assert len(x) == len(expected)
     assert all([abs(xi - yi) <= 0.00001 for xi, yi in zip(x, expected)])
+
+
+@pytest.mark.parametrize(
+    "struct, new_name, expected",
+    [
+        ("space", "space+1", pytest.raises(ValueError)),
+        ("space1", "space2", pytest.raises(ValueError)),
+        ("space1", "space1+1", does_not_raise()),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way, when the result is added as a new ROI.
+def test_raises_new_name(di_1p_fixt, struct, new_name, expected):
+    with expected:
+        dicom_info = di_1p_fixt("patient_2_s.gz", "test_add_margin")
+        dicom_info.add_margin(struct, 1.0, new_name=new_name)
+
+
+@pytest.mark.parametrize(
+    "struct, margin, index",
+    [
+        ("space1", 1.0, 0),
+        ("space2", -1.0, 1),
+        ("space4", 1.0, 3),
+    ],
+)
+# These tests verify that the structure with margin is appended as a
+# new ROI, with its observation, keeping the original structure.
+def test_add_margin_new_name(patients, struct, margin, index):
+    patient = patients("patient_2_s.gz", "test_add_margin")
+    for number, roi in enumerate(patient.StructureSetROISequence):
+        roi.ROINumber = number + 1
+        patient.ROIContourSequence[number].ReferencedROINumber = number + 1
+    observation = Dataset()
+    observation.ObservationNumber = 1
+    observation.ReferencedROINumber = index + 1
+    observation.ROIObservationLabel = struct
+    patient.RTROIObservationsSequence = [observation]
+    dicom_info = DicomInfo(patient)
+    length = len(patient.StructureSetROISequence)
+
+    appended = dicom_info.add_margin(struct, margin, new_name="new")
+    expected = dicom_info.add_margin(struct, margin)
+    x = appended.dicom_struct.ROIContourSequence[length].ContourSequence[0]
+    y = expected.dicom_struct.ROIContourSequence[index].ContourSequence[0]
+    assert appended.dicom_struct.StructureSetROISequence[length].ROIName == (
+        "new"
+    )
+    assert x.ContourData == y.ContourData
+    assert x is not y
+    new_observation = appended.dicom_struct.RTROIObservationsSequence[1]
+    assert new_observation.ReferencedROINumber == length + 1
+    assert new_observation.ObservationNumber == 2
+    assert new_observation.ROIObservationLabel == "new"
+    assert len(dicom_info.dicom_struct.RTROIObservationsSequence) == 1
+
+
+@pytest.mark.parametrize("new_name", [None, "space1+1"])
+# These tests verify that the margin is added in the same object,
+# without copying it, and that the result is the same as with a copy.
+def test_add_margin_inplace(di_1p_fixt, new_name):
+    dicom_info = di_1p_fixt("patient_2_s.gz", "test_add_margin")
+    expected = dicom_info.add_margin("space1", 1.0, new_name=new_name)
+    struct = dicom_info.dicom_struct
+    result = dicom_info.add_margin(
+        "space1", 1.0, new_name=new_name, inplace=True
+    )
+    assert result is dicom_info
+    assert result.dicom_struct is struct
+    for x, y in zip(
+        result.dicom_struct.ROIContourSequence,
+        expected.dicom_struct.ROIContourSequence,
+    ):
+        for xc, yc in zip(x.ContourSequence, y.ContourSequence):
+            assert xc.ContourData == yc.ContourData
+    assert len(result.dicom_struct.StructureSetROISequence) == len(
+        expected.dicom_struct.StructureSetROISequence
+    )
+
+
+@pytest.mark.parametrize(
+    "struct, expected",
+    [
+        (["space1", "space2", "space4"], does_not_raise()),
+        (["space1", "space7"], pytest.raises(ValueError)),
+        (["space1", "space5"], pytest.raises(ValueError)),
+        ("all", pytest.raises(ValueError)),
+        (1, pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way, when several structures are selected.
+def test_raises_many(di_1p_fixt, struct, expected):
+    with expected:
+        dicom_info = di_1p_fixt("patient_2_s.gz", "test_add_margin")
+        dicom_info.add_margin(struct, 1.0)
+
+
+@pytest.mark.parametrize("margin", [1.0, -0.5])
+# These tests verify that the margin of several structures added at
+# once is the same as the margin of each one.
+def test_add_margin_many(di_1p_fixt, margin):
+    dicom_info = di_1p_fixt("patient_2_s.gz", "test_add_margin")
+    selected = ["space1", "space2", "space4", "space6"]
+    result = dicom_info.add_margin(selected, margin)
+    for index, roi in enumerate(
+        dicom_info.dicom_struct.StructureSetROISequence
+    ):
+        expected = dicom_info
+        if roi.ROIName in selected:
+            expected = dicom_info.add_margin(roi.ROIName, margin)
+        x = result.dicom_struct.ROIContourSequence[index].ContourSequence
+        y = expected.dicom_struct.ROIContourSequence[index].ContourSequence
+        assert [c.ContourData for c in x] == [c.ContourData for c in y]
+
+
+@pytest.mark.parametrize("precision", [3, 10])
+# These tests verify that the slices with margin are written as encoded
+# DS with the precision.
+def test_add_margin_precision(di_1p_fixt, precision):
+    dicom_info = di_1p_fixt("patient_2_s.gz", "test_add_margin")
+    result = dicom_info.add_margin("space2", 1.0, precision=precision)
+    expected = dicom_info.add_margin("space2", 1.0)
+    x = result.dicom_struct.ROIContourSequence[1].ContourSequence[0]
+    y = expected.dicom_struct.ROIContourSequence[1].ContourSequence[0]
+    assert x.get_item("ContourData").is_raw
+    assert all(
+        [
+            abs(xi - yi) <= 10 ** (1 - precision) * max(abs(yi), 1)
+            for xi, yi in zip(x.ContourData, y.ContourData)
+        ]
+    )
+    with pytest.raises(ValueError):
+        dicom_info.add_margin("space2", 1.0, precision=12)
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from pathlib import Path
+
+from dicomhandler.aio import AsyncHandler
+from dicomhandler.dicom_info import DicomInfo
+
+import pydicom
+
+import pytest
+
+EXAMPLE_PLAN = Path(os.getcwd()) / (
+    "Examples/RP.1.2.276.0.20.1.4.106.968269887716.25132."
+    "1649170861.757182.1.dcm"
+)
+
+
+# This fixture returns the path of a structure file of the patient of
+# the example plan.
+@pytest.fixture()
+def struct_path(di_1p_fixt, tmp_path):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    plan = pydicom.dcmread(EXAMPLE_PLAN)
+    for keyword in ["PatientName", "PatientID", "PatientBirthDate"]:
+        setattr(dicom_info.dicom_struct, keyword, plan.get(keyword))
+    return dicom_info.save(tmp_path / "files")[0]
+
+
+# This test verifies that the patient files are loaded.
+def test_load(struct_path):
+    handler = AsyncHandler()
+    dicom = asyncio.run(handler.load(struct_path, EXAMPLE_PLAN))
+    assert isinstance(dicom, DicomInfo)
+    assert dicom.dicom_plan.SOPInstanceUID == (
+        "1.2.276.0.20.1.4.106.968269887716.25132.1649170861.757182.1"
+    )
+    assert dicom.dicom_struct.Modality == "RTSTRUCT"
+
+
+# This test verifies that the exports match the synchronous ones.
+def test_exports(struct_path, tmp_path):
+    handler = AsyncHandler(limit=2)
+
+    async def export():
+        dicom = await handler.load(struct_path, EXAMPLE_PLAN)
+        buffer = StringIO()
+        results = await asyncio.gather(
+            handler.struct_to_csv(dicom),
+            handler.struct_to_csv(dicom, tmp_path / "structures.csv"),
+            handler.mlc_to_csv(dicom, buffer),
+        )
+        return dicom, results, buffer
+
+    dicom, (text, written, _), buffer = asyncio.run(export())
+    expected_struct, expected_mlc = StringIO(), StringIO()
+    dicom.struct_to_csv(expected_struct)
+    dicom.mlc_to_csv(expected_mlc)
+    assert text == expected_struct.getvalue()
+    assert written is None
+    assert (tmp_path / "structures.csv").read_text() == text
+    assert buffer.getvalue() == expected_mlc.getvalue()
+
+
+# This test verifies that the transformations run in a process pool.
+def test_process_executor(struct_path):
+    async def transform(handler):
+        dicom = await handler.load(struct_path)
+        moved = await handler.move(dicom, "cubo", 10.0, "yaw")
+        expanded = await handler.add_margin(dicom, "cubo", 1.0)
+        return dicom, moved, expanded
+
+    with ProcessPoolExecutor(1) as pool:
+        handler = AsyncHandler(executor=pool)
+        dicom, moved, expanded = asyncio.run(transform(handler))
+    expected = dicom.move("cubo", 10.0, "yaw")
+    for x, y in zip(
+        moved.dicom_struct.ROIContourSequence,
+        expected.dicom_struct.ROIContourSequence,
+    ):
+        for xc, yc in zip(x.ContourSequence, y.ContourSequence):
+            assert xc.ContourData == yc.ContourData
+    assert expanded is not dicom
+
+
+# This test verifies that the number of running operations is bounded.
+def test_limit():
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+
+    async def main():
+        handler = AsyncHandler(limit=3)
+        await asyncio.gather(*[handler.run(work) for _ in range(20)])
+
+    asyncio.run(main())
+    assert peak[0] == 3
+
+
+# This test verifies that the limit must be positive.
+def test_raises_limit():
+    with pytest.raises(ValueError):
+        AsyncHandler(limit=0)
@@ -1,5 +1,8 @@
 import copy
 
+from dicomhandler.anonymizer import BASIC_PROFILE
+from dicomhandler.dicom_info import DicomInfo
+
 import pytest
 
 
@@ -150,3 +153,26 @@ def test_anonymize_warning(request):
     with pytest.warns(UserWarning):
         di = request.getfixturevalue("dicom_info_empty")
         di.anonymize()
+
+
+def test_anonymize_inplace(request):
+    di = request.getfixturevalue("dicom_info_8")
+    plan = di.dicom_plan
+    result = di.anonymize(inplace=True)
+    assert result is di
+    assert result.dicom_plan is plan
+    assert plan.PatientName == "PatientName"
+    assert result.PatientName == "PatientName"
+
+
+@pytest.mark.parametrize("profile", [None, BASIC_PROFILE])
+# These tests verify that the object that shares the files with a new
+# ROI is not modified by an inplace anonymization of the other object.
+def test_anonymize_inplace_shared(patients, profile):
+    source = DicomInfo(patients("patient_1_s.gz", "test_move"))
+    derived = source.move("cubo", 1.0, "x", new_name="copy")
+    result = derived.anonymize(profile=profile, inplace=True)
+    assert result is derived
+    assert result.dicom_struct.PatientName != "mario rossi"
+    assert source.dicom_struct.PatientName == "mario rossi"
+    assert source.dicom_struct.PatientBirthDate == "20000101"
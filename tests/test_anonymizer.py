@@ -0,0 +1,256 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+from dicomhandler import anonymizer
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, RTDoseStorage, generate_uid
+
+import pytest
+
+EXAMPLE_PLAN = Path(os.getcwd()) / (
+    "Examples/RP.1.2.276.0.20.1.4.106.968269887716.25132."
+    "1649170861.757182.1.dcm"
+)
+
+
+def write_dose(path):
+    dose = Dataset()
+    dose.PatientName = "Mike Wazowski"
+    dose.PatientID = "00"
+    dose.PatientBirthDate = "20000102"
+    dose.InstanceCreationDate = "20220101"
+    dose.Modality = "RTDOSE"
+    dose.SOPClassUID = RTDoseStorage
+    dose.SOPInstanceUID = generate_uid()
+    dose.Rows, dose.Columns, dose.NumberOfFrames = 4, 5, 2
+    dose.BitsAllocated, dose.BitsStored, dose.HighBit = 32, 32, 31
+    dose.PixelRepresentation, dose.SamplesPerPixel = 0, 1
+    dose.PhotometricInterpretation = "MONOCHROME2"
+    dose.PixelData = np.arange(40, dtype=np.uint32).tobytes()
+    dose.file_meta = FileMetaDataset()
+    dose.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    dose.file_meta.MediaStorageSOPClassUID = RTDoseStorage
+    dose.file_meta.MediaStorageSOPInstanceUID = dose.SOPInstanceUID
+    dose.is_little_endian, dose.is_implicit_VR = True, False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dose.save_as(path, write_like_original=False)
+
+
+# This fixture returns a directory tree with a plan, a dose and a
+# file that is not DICOM.
+@pytest.fixture()
+def archive(tmp_path):
+    source = tmp_path / "archive"
+    (source / "patient_1").mkdir(parents=True)
+    shutil.copy(EXAMPLE_PLAN, source / "patient_1" / "RP.dcm")
+    write_dose(source / "patient_2" / "RD.dcm")
+    (source / "patient_2" / "broken.dcm").write_bytes(b"not a dicom")
+    return source
+
+
+# This test verifies that the patient information is replaced and that
+# the pixel data is copied without changes.
+def test_anonymize_file(archive, tmp_path):
+    source = archive / "patient_2" / "RD.dcm"
+    destination = tmp_path / "RD.dcm"
+    anonymizer.anonymize_file(source, destination)
+    original = pydicom.dcmread(source)
+    result = pydicom.dcmread(destination)
+    assert result.PatientName == "PatientName"
+    assert result.PatientBirthDate == "19720101"
+    assert result.InstanceCreationDate == "19720101"
+    assert "OperatorsName" not in result
+    assert result.PatientID == original.PatientID
+    assert result.PixelData == original.PixelData
+    assert np.array_equal(result.pixel_array, original.pixel_array)
+
+
+# This test verifies that a file can not be overwritten in place.
+def test_raises_same_file(archive):
+    source = archive / "patient_1" / "RP.dcm"
+    with pytest.raises(ValueError):
+        anonymizer.anonymize_file(source, source)
+
+
+@pytest.mark.parametrize(
+    "name, birth, operator, creation, expected",
+    [
+        (True, True, True, True, 4),
+        (True, False, True, False, 2),
+        (False, False, False, False, 0),
+    ],
+)
+# These tests verify the selection of the anonymized attributes.
+def test_replacements(name, birth, operator, creation, expected):
+    profile = anonymizer.replacements(name, birth, operator, creation)
+    assert len(profile) == expected
+    if name:
+        assert profile["PatientName"] == ("replace", "PatientName")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+# These tests verify that a directory tree is anonymized, that the
+# errors are isolated and that a second run skips the finished files.
+def test_anonymize_directory(archive, tmp_path, workers):
+    destination = tmp_path / "export"
+    summary = anonymizer.anonymize_directory(
+        archive, destination, workers=workers, chunksize=1, operator=False
+    )
+    assert summary == {"anonymized": 2, "skipped": 0, "failed": 1}
+    plan = pydicom.dcmread(destination / "patient_1" / "RP.dcm")
+    original = pydicom.dcmread(EXAMPLE_PLAN)
+    assert plan.PatientName == "PatientName"
+    assert plan.OperatorsName == original.OperatorsName
+    assert len(plan.BeamSequence) == len(original.BeamSequence)
+
+    with open(destination / anonymizer.MANIFEST_NAME) as fp:
+        entries = [json.loads(line) for line in fp]
+    errors = {entry["file"]: entry["error"] for entry in entries}
+    assert errors["patient_1/RP.dcm"] is None
+    assert errors["patient_2/broken.dcm"].startswith("InvalidDicomError")
+
+    summary = anonymizer.anonymize_directory(
+        archive, destination, workers=workers
+    )
+    assert summary == {"anonymized": 0, "skipped": 2, "failed": 1}
+
+
+@pytest.mark.parametrize("partial", ['{"file": "patient_1/R', ""])
+# These tests verify that a run interrupted while writing the manifest
+# is resumed: a partial last line is dropped and the next entries start
+# on a new line.
+def test_anonymize_directory_truncated(archive, tmp_path, partial):
+    destination = tmp_path / "export"
+    anonymizer.anonymize_directory(archive, destination, workers=1)
+    path = destination / anonymizer.MANIFEST_NAME
+    with open(path) as fp:
+        lines = fp.readlines()
+    done = [line for line in lines if "patient_1/RP.dcm" in line]
+    with open(path, "w") as fp:
+        fp.writelines(line for line in lines if line not in done)
+        fp.write(partial or done[0].rstrip("\n"))
+    expected = {"patient_2/RD.dcm"} | (
+        set() if partial else {"patient_1/RP.dcm"}
+    )
+    assert anonymizer.read_manifest(path) == expected
+
+    summary = anonymizer.anonymize_directory(archive, destination, workers=1)
+    assert summary["anonymized"] == (1 if partial else 0)
+    with open(path) as fp:
+        entries = [json.loads(line) for line in fp]
+    assert len(entries) == len(lines) + 1
+
+
+def make_plan(patient_id="00"):
+    plan = Dataset()
+    plan.PatientName = "Mike Wazowski"
+    plan.PatientID = patient_id
+    plan.PatientBirthDate = "20000102"
+    plan.Modality = "RTPLAN"
+    plan.ReviewerName = "Boo"
+    plan.ApprovalStatus = "APPROVED"
+    referenced = Dataset()
+    referenced.ReferencedSOPInstanceUID = "1.2.3"
+    plan.ReferencedPatientSequence = [referenced]
+    request = Dataset()
+    request.RequestingPhysician = "Sullivan^James"
+    request.PatientName = "Mike Wazowski"
+    request.PatientID = patient_id
+    nested = Dataset()
+    nested.RequestAttributesSequence = [request]
+    plan.ReferencedStructureSetSequence = [nested]
+    return plan
+
+
+@pytest.mark.parametrize(
+    "profile",
+    [
+        {"NotAnAttribute": "remove"},
+        {"PatientName": "delete"},
+        {"PatientName": ("overwrite", "Anonymous")},
+    ],
+)
+# These tests verify that the profiles are validated.
+def test_raises_profile(profile):
+    with pytest.raises(ValueError):
+        anonymizer.compile_profile(profile)
+
+
+# This test verifies that the profile is applied to the nested sequences.
+def test_apply_profile_nested():
+    plan = make_plan()
+    result = anonymizer.apply_profile(plan, anonymizer.BASIC_PROFILE)
+    request = result.ReferencedStructureSetSequence[0]
+    request = request.RequestAttributesSequence[0]
+    assert result.PatientName == "PatientName"
+    assert result.ReviewerName == "ReviewerName"
+    assert result.ApprovalStatus == "APPROVED"
+    assert "ReferencedPatientSequence" not in result
+    assert "RequestingPhysician" not in request
+    assert request.PatientName == "PatientName"
+    assert request.PatientID == result.PatientID != "00"
+    assert plan.PatientName == "Mike Wazowski"
+    assert "ReferencedPatientSequence" in plan
+
+
+@pytest.mark.parametrize(
+    "profile, salt, expected",
+    [
+        ({"PatientID": "hash"}, "", "hashed"),
+        ({"PatientID": "hash"}, "secret", "salted"),
+        ({"PatientID": "keep"}, "", "00"),
+        ({"PatientID": ("replace", "X")}, "", "X"),
+    ],
+)
+# These tests verify the actions of the profiles and that the hashed
+# identifiers are the same for the same patient.
+def test_apply_profile_actions(profile, salt, expected):
+    first = anonymizer.apply_profile(make_plan(), profile, salt=salt)
+    second = anonymizer.apply_profile(make_plan(), profile, salt=salt)
+    other = anonymizer.apply_profile(make_plan("01"), profile, salt=salt)
+    unsalted = anonymizer.apply_profile(make_plan(), profile)
+    assert first.PatientID == second.PatientID
+    if expected in ["hashed", "salted"]:
+        assert first.PatientID != other.PatientID
+        assert len(first.PatientID) <= 64
+        assert (first.PatientID == unsalted.PatientID) is (salt == "")
+    else:
+        assert first.PatientID == expected
+
+
+# This test verifies that the dataset is modified when it is not copied.
+def test_apply_profile_inplace():
+    plan = make_plan()
+    table = anonymizer.compile_profile({"ReviewerName": "remove"})
+    result = anonymizer.apply_profile(plan, table, inplace=True)
+    assert result is plan
+    assert "ReviewerName" not in plan
+
+
+# This test verifies that DicomInfo anonymizes its files with a profile.
+def test_dicom_info_profile():
+    dicom_info = DicomInfo(make_plan())
+    result = dicom_info.anonymize(profile=anonymizer.BASIC_PROFILE)
+    assert result.PatientName == "PatientName"
+    assert result.PatientID == result.dicom_plan.PatientID != "00"
+    assert result.dicom_plan.ReviewerName == "ReviewerName"
+    assert dicom_info.dicom_plan.ReviewerName == "Boo"
+
+
+# This test verifies that a directory is anonymized with a profile.
+def test_anonymize_directory_profile(archive, tmp_path):
+    destination = tmp_path / "export"
+    summary = anonymizer.anonymize_directory(
+        archive, destination, workers=1, profile=anonymizer.BASIC_PROFILE
+    )
+    assert summary["anonymized"] == 2
+    plan = pydicom.dcmread(destination / "patient_1" / "RP.dcm")
+    assert plan.PatientName == "PatientName"
+    assert plan.PatientID != pydicom.dcmread(EXAMPLE_PLAN).PatientID
@@ -0,0 +1,141 @@
+import os
+import shutil
+from io import StringIO
+from pathlib import Path
+
+from dicomhandler import binary_cache, instrumentation
+from dicomhandler.binary_cache import BinaryCache, file_hash
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
+import pydicom
+
+import pytest
+
+EXAMPLE_PLAN = Path(os.getcwd()) / (
+    "Examples/RP.1.2.276.0.20.1.4.106.968269887716.25132."
+    "1649170861.757182.1.dcm"
+)
+
+
+# This fixture returns the paths of a structure file and a plan.
+@pytest.fixture()
+def files(di_1p_fixt, tmp_path):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    (struct,) = dicom_info.save(tmp_path / "patient")
+    plan = tmp_path / "patient" / "RP.dcm"
+    shutil.copy(EXAMPLE_PLAN, plan)
+    return struct, plan
+
+
+# This function returns the outer records of the loads.
+def counters(registry):
+    return [
+        record.counters
+        for record in registry.records
+        if record.name == "BinaryCache.load"
+    ]
+
+
+# This test verifies that the hash depends only on the contents.
+def test_file_hash(files, tmp_path):
+    struct, plan = files
+    copied = shutil.copy(struct, tmp_path / "copy.dcm")
+    assert file_hash(copied) == file_hash(struct)
+    assert file_hash(plan) != file_hash(struct)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+# These tests verify that the second load reads the entries and gives
+# the same results as the DICOM files.
+def test_load(files, tmp_path, mmap):
+    struct, plan = files
+    cache = BinaryCache(tmp_path / "cache", mmap=mmap)
+    with instrumentation.instrument() as registry:
+        first = cache.load(struct)
+        second = cache.load(struct)
+        plan_info = cache.load(plan)
+        plan_again = cache.load(plan)
+    assert [row.get("binary_cache_hits", 0) for row in counters(registry)] == [
+        0,
+        1,
+        0,
+        1,
+    ]
+    assert len(cache) == 2
+    expected = DicomInfo(pydicom.dcmread(struct))
+    for roi in expected.dicom_struct.StructureSetROISequence:
+        for dicom_info in [first, second]:
+            assert np.allclose(
+                dicom_info._roi_points(roi.ROIName),
+                expected._roi_points(roi.ROIName),
+            )
+    # The memory of a memory-mapped array belongs to a mmap object.
+    base = second._compact[0].points
+    while getattr(base, "base", None) is not None:
+        base = base.base
+    assert isinstance(base, np.ndarray) is not mmap
+    exported, original = StringIO(), StringIO()
+    second.struct_to_csv(exported, names=["cubo", "space"])
+    expected.struct_to_csv(original, names=["cubo", "space"])
+    assert exported.getvalue() == original.getvalue()
+    expected = DicomInfo(pydicom.dcmread(plan))
+    for dicom_info in [plan_info, plan_again]:
+        exported, original = StringIO(), StringIO()
+        dicom_info.mlc_to_csv(exported)
+        expected.mlc_to_csv(original)
+        assert exported.getvalue() == original.getvalue()
+
+
+# This test verifies that a file is parsed once when its entry is
+# written, and that a plan with an entry is read without converting its
+# sequences.
+def test_reads(files, tmp_path, monkeypatch):
+    reads = []
+
+    def dcmread(path, *args, **kwargs):
+        reads.append(Path(path).name)
+        return pydicom.dcmread(path, *args, **kwargs)
+
+    monkeypatch.setattr(binary_cache, "dcmread", dcmread)
+    struct, plan = files
+    cache = BinaryCache(tmp_path / "cache")
+    cache.load(struct)
+    cache.load(plan)
+    assert reads == [struct.name, plan.name]
+    reads.clear()
+    cache.load(struct)
+    dicom_info = cache.load(plan)
+    assert reads == ["struct.dcm", plan.name]
+    assert dicom_info.dicom_plan.get_item("BeamSequence").is_raw
+    assert len(dicom_info._mlc_arrays()) == 10
+
+
+# This test verifies that a modified file gets a new entry.
+def test_modified(files, tmp_path):
+    struct, _ = files
+    cache = BinaryCache(tmp_path / "cache")
+    cache.load(struct)
+    moved = DicomInfo(pydicom.dcmread(struct)).move("cubo", 5.0, "x")
+    (path,) = moved.save(tmp_path / "moved")
+    os.replace(path, struct)
+    loaded = cache.load(struct)
+    assert len(cache) == 2
+    assert np.allclose(loaded._roi_points("cubo"), moved._roi_points("cubo"))
+
+
+# This test verifies that the entries are removed.
+def test_clear(files, tmp_path):
+    cache = BinaryCache(tmp_path / "cache")
+    for path in files:
+        cache.load(path)
+    cache.clear()
+    assert len(cache) == 0
+
+
+# This test verifies that only a file of each modality is allowed.
+def test_raises(files, tmp_path):
+    struct, _ = files
+    with pytest.raises(ValueError):
+        BinaryCache(tmp_path / "cache").load(struct, struct)
@@ -0,0 +1,115 @@
+import os
+import shutil
+from io import StringIO
+from pathlib import Path
+
+from dicomhandler import cli
+
+import pandas as pd
+
+import pydicom
+
+import pytest
+
+EXAMPLE_PLAN = Path(os.getcwd()) / (
+    "Examples/RP.1.2.276.0.20.1.4.106.968269887716.25132."
+    "1649170861.757182.1.dcm"
+)
+
+
+# This fixture returns a directory tree with a patient with a
+# structure file and a plan, a patient with a plan only and a
+# directory without DICOM files.
+@pytest.fixture()
+def archive(di_1p_fixt, tmp_path):
+    source = tmp_path / "archive"
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    dicom_info.save(source / "center" / "patient_1")
+    shutil.copy(EXAMPLE_PLAN, source / "center" / "patient_1" / "RP.dcm")
+    (source / "patient_2").mkdir(parents=True)
+    shutil.copy(EXAMPLE_PLAN, source / "patient_2" / "RP.dcm")
+    (source / "empty").mkdir()
+    return source
+
+
+# This test verifies that the patients are the directories with DICOM
+# files.
+def test_find_patients(archive):
+    assert cli.find_patients(archive) == ["center/patient_1", "patient_2"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+# These tests verify that an error in a patient does not stop the
+# others.
+def test_struct(archive, tmp_path, capsys, workers):
+    output = tmp_path / "output"
+    code = cli.main(
+        ["struct", str(archive), str(output), "--workers", str(workers)]
+    )
+    captured = capsys.readouterr()
+    assert code == 1
+    assert "1 patients processed, 1 failed" in captured.out
+    assert "patient_2: ValueError: No RTSTRUCT file" in captured.err
+    expected = StringIO()
+    cli.load_patient(
+        archive / "center" / "patient_1", ["RTSTRUCT"]
+    ).struct_to_csv(expected)
+    csv = output / "center" / "patient_1" / "structures.csv"
+    assert csv.read_text() == expected.getvalue()
+    assert not (output / "patient_2" / "structures.csv").exists()
+
+
+# This test verifies the exports of the plans.
+def test_plan(archive, tmp_path):
+    output = tmp_path / "output"
+    assert cli.main(["mlc", str(archive), str(output)]) == 0
+    assert cli.main(["summary", str(archive), str(output), "--area"]) == 0
+    for patient in ["center/patient_1", "patient_2"]:
+        assert (output / patient / "mlc.csv").exists()
+        summary = pd.read_csv(output / patient / "summary.csv")
+        assert "area" in summary.columns
+
+
+@pytest.mark.parametrize(
+    "args, names",
+    [
+        (["move", "--value", "10", "--key", "yaw"], ["cubo"]),
+        (
+            ["move", "--value", "5", "--key", "x", "--new-name", "moved"],
+            ["cubo", "moved"],
+        ),
+        (["margin", "--margin", "1", "--new-name", "big"], ["cubo", "big"]),
+        (["margin", "--margin", "1", "--precision", "4"], ["cubo"]),
+    ],
+)
+# These tests verify that the transformed structures are saved.
+def test_transforms(archive, tmp_path, args, names):
+    output = tmp_path / "output"
+    code = cli.main(
+        args[:1]
+        + [str(archive), str(output), "--struct", "cubo", "--workers", "1"]
+        + args[1:]
+    )
+    assert code == 1
+    (path,) = (output / "center" / "patient_1").glob("RS*.dcm")
+    struct = pydicom.dcmread(path)
+    saved = [roi.ROIName for roi in struct.StructureSetROISequence]
+    assert [name for name in saved if name in names] == names
+
+
+# This test verifies that the anonymize command anonymizes every file.
+def test_anonymize(archive, tmp_path, capsys):
+    output = tmp_path / "output"
+    code = cli.main(
+        ["anonymize", str(archive), str(output), "--profile", "basic"]
+    )
+    assert code == 0
+    assert "3 anonymized, 0 skipped, 0 failed" in capsys.readouterr().out
+    plan = pydicom.dcmread(output / "patient_2" / "RP.dcm")
+    assert plan.PatientID != pydicom.dcmread(EXAMPLE_PLAN).PatientID
+
+
+# This test verifies that the command is required.
+def test_raises_command():
+    with pytest.raises(SystemExit):
+        cli.main([])
@@ -0,0 +1,145 @@
+import copy
+from io import StringIO
+
+from dicomhandler.compact import CompactROI
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.report import report
+
+import numpy as np
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import pydicom
+
+import pytest
+
+
+# This fixture returns a structure file and a compact object built
+# with it.
+@pytest.fixture()
+def compact_info(patients):
+    struct = patients("patient_1_s.gz", "test_move")
+    return struct, DicomInfo(struct).compact()
+
+
+# This function returns the points of a structure file by ROI. The
+# incomplete points are ignored.
+def points(struct):
+    rois = []
+    for roi in struct.ROIContourSequence:
+        arrays = []
+        for contour in roi.ContourSequence:
+            data = np.array(contour.ContourData, dtype=float)
+            arrays.append(data[: len(data) // 3 * 3].reshape(-1, 3))
+        rois.append(np.concatenate(arrays))
+    return rois
+
+
+# This test verifies the arrays of a record.
+def test_record():
+    contours = [pydicom.Dataset(), pydicom.Dataset(), pydicom.Dataset()]
+    contours[0].ContourData = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    contours[2].ContourData = [7.0, 8.0, 9.0]
+    record = CompactROI.from_contours(contours)
+    assert len(record) == 3
+    assert record.offsets.tolist() == [0, 2, 2, 3]
+    assert record.points.dtype == np.float32
+    assert record.contour(2).tolist() == [[7.0, 8.0, 9.0]]
+    assert record.contour(1).shape == (0, 3)
+    assert record.nbytes == 3 * 12 + 4 * 4
+    with pytest.raises(ValueError):
+        record.points[0, 0] = 0.0
+
+
+# This test verifies that the points are removed from the file of the
+# object and kept in the original file.
+def test_compact(compact_info):
+    struct, dicom_info = compact_info
+    expected = points(struct)
+    total = sum(len(array) for array in expected)
+    slices = sum(len(roi.ContourSequence) for roi in struct.ROIContourSequence)
+    assert dicom_info.compact_nbytes() == 12 * total + 4 * (
+        slices + len(expected)
+    )
+    for roi in dicom_info.dicom_struct.ROIContourSequence:
+        assert all("ContourData" not in item for item in roi.ContourSequence)
+    for roi in struct.ROIContourSequence:
+        assert all("ContourData" in item for item in roi.ContourSequence)
+    name = struct.StructureSetROISequence[0].ROIName
+    assert np.allclose(dicom_info._roi_points(name), expected[0])
+
+
+# This test verifies that the exports and the report of a compact
+# object match the ones of the full precision object.
+def test_read(compact_info):
+    struct, dicom_info = compact_info
+    full = DicomInfo(struct)
+    nbytes = dicom_info.compact_nbytes()
+    exported, expected = StringIO(), StringIO()
+    dicom_info.struct_to_csv(exported)
+    full.struct_to_csv(expected)
+    exported.seek(0)
+    expected.seek(0)
+    assert_frame_equal(pd.read_csv(exported), pd.read_csv(expected), rtol=1e-6)
+    assert_frame_equal(
+        report(dicom_info, dicom_info, "cubo"), report(full, full, "cubo")
+    )
+    assert dicom_info.compact_nbytes() == nbytes
+
+
+@pytest.mark.parametrize("inplace", [False, True])
+# These tests verify that the transformations expand only the modified
+# structure.
+def test_transforms(compact_info, inplace):
+    struct, dicom_info = compact_info
+    full = DicomInfo(struct)
+    moved = dicom_info.move("cubo", 10.0, "yaw", inplace=inplace)
+    expected = full.move("cubo", 10.0, "yaw")
+    assert np.allclose(
+        moved._roi_points("cubo"), expected._roi_points("cubo"), atol=1e-4
+    )
+    assert 0 not in moved._compact
+    assert len(moved._compact) == len(struct.ROIContourSequence) - 1
+    assert (0 in dicom_info._compact) is not inplace
+
+
+# This test verifies that a new structure can be added from a compact
+# one.
+def test_new_name(compact_info):
+    struct, dicom_info = compact_info
+    expanded = dicom_info.add_margin("cubo", 1.0, new_name="cubo+1")
+    expected = DicomInfo(struct).add_margin("cubo", 1.0, new_name="cubo+1")
+    assert np.allclose(
+        points(expanded.expand().dicom_struct)[-1],
+        points(expected.dicom_struct)[-1],
+        atol=1e-2,
+    )
+    assert 0 in dicom_info._compact
+
+
+# This test verifies that the compact points are written without
+# expanding the object.
+def test_save(compact_info, tmp_path):
+    struct, dicom_info = compact_info
+    original = copy.deepcopy(dicom_info.dicom_struct)
+    (path,) = dicom_info.save(tmp_path)
+    written = pydicom.dcmread(path)
+    for x, y in zip(points(written), points(struct)):
+        assert np.allclose(x, y, rtol=1e-6)
+    assert dicom_info.dicom_struct == original
+
+
+# This test verifies that expand stores the points in the file again.
+def test_expand(compact_info):
+    struct, dicom_info = compact_info
+    dicom_info.expand()
+    assert dicom_info.compact_nbytes() == 0
+    for x, y in zip(points(dicom_info.dicom_struct), points(struct)):
+        assert np.allclose(x, y, rtol=1e-6)
+
+
+# This test verifies that the structure file is required.
+def test_raises_compact(dicom_info_empty):
+    with pytest.raises(ValueError):
+        dicom_info_empty.compact()
@@ -0,0 +1,143 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler import complexity, instrumentation
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
+import pytest
+
+
+# This function returns the positions of a beam with a single aperture,
+# with the gaps of the leaves centred at 0.
+def aperture(*gaps):
+    gaps = np.array(gaps, dtype=float)
+    return np.stack([-gaps / 2, gaps / 2], axis=-2)
+
+
+@pytest.mark.parametrize(
+    "gaps, area, perimeter",
+    [
+        ([10, 10, 10], 150.0, 50.0),
+        ([10, 0, 10], 100.0, 60.0),
+        ([0, 0, 0], 0.0, 0.0),
+        ([4, 8, 4], 80.0, 46.0),
+    ],
+)
+# These tests verify the area and the perimeter of rectangular and
+# separated apertures with leaves of 5 mm.
+def test_area_perimeter(gaps, area, perimeter):
+    metrics = complexity.aperture_metrics(aperture(gaps), np.full(3, 5.0))
+    assert metrics["area"].tolist() == [area]
+    assert metrics["perimeter"].tolist() == [perimeter]
+    expected = perimeter / area if area else 0.0
+    assert metrics["edge_metric"] == pytest.approx([expected])
+
+
+@pytest.mark.parametrize(
+    "small_aperture, expected", [(5.0, 0.5), (1.0, 0.0), (20.0, 1.0)]
+)
+# These tests verify the fraction of open leaf pairs with a small gap.
+def test_small_aperture(small_aperture, expected):
+    positions = aperture([2, 10, 0, 3, 12])
+    metrics = complexity.aperture_metrics(
+        positions, np.ones(5), small_aperture
+    )
+    assert metrics["SAS"].tolist() == [expected]
+
+
+# This test verifies the MCS of a rectangle and of an irregular aperture.
+def test_mcs():
+    positions = np.concatenate([aperture([10, 10]), aperture([2, 10])])
+    metrics = complexity.aperture_metrics(positions, np.ones(2))
+    # Both banks of the second aperture vary 4 mm in 4 mm.
+    assert metrics["MCS"] == pytest.approx([1.0, 0.0])
+
+
+# This test verifies the weights of the segments and the leaf speeds.
+def test_beam_metrics():
+    positions = aperture([10, 10], [20, 20], [20, 20])
+    metrics = complexity.beam_metrics(
+        positions,
+        np.full(2, 5.0),
+        weights=[0.0, 0.5, 1.0],
+        gantry=[350.0, 2.0, 14.0],
+        meterset=100.0,
+    )
+    assert metrics["area"] == pytest.approx(0.5 * 150 + 0.5 * 200)
+    assert metrics["leaf_travel"] == 20.0
+    # The first segment takes 5 s for 50 MU at 600 MU/min.
+    assert metrics["max_leaf_speed"] == pytest.approx(1.0)
+    assert metrics["mean_leaf_speed"] == pytest.approx(0.5)
+
+
+# This test verifies that the number of weights must match the number
+# of control points.
+def test_raises_beam_metrics():
+    with pytest.raises(ValueError):
+        complexity.beam_metrics(aperture([1], [2]), [5.0], [0.0], [0.0, 1.0])
+
+
+# This test verifies that the beams are weighted with their monitor
+# units.
+def test_plan_metrics():
+    beams = [
+        complexity.beam_metrics(aperture(gaps, gaps), [5.0], [0, 1], [0, 0])
+        for gaps in ([10], [20])
+    ]
+    plan = complexity.plan_metrics(beams, [100.0, 300.0])
+    assert plan["area"] == pytest.approx(0.25 * 50 + 0.75 * 100)
+    assert complexity.plan_metrics(beams, [0.0, 0.0])["area"] == 75.0
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("patient_17_p.gz", does_not_raise()),
+        ("patient_18_p.gz", pytest.raises(ValueError)),
+        ("patient_19_p.gz", does_not_raise()),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(di_1p_fixt, name, expected):
+    with expected:
+        dicom_info = di_1p_fixt(name, "test_summarize_to_dataframe")
+        dicom_info.complexity_metrics()
+
+
+# This test verifies that the plan must be loaded.
+def test_raises_empty(dicom_info_empty):
+    with pytest.raises(ValueError):
+        dicom_info_empty.complexity_metrics()
+
+
+# This test verifies the rows of the beams and of the plan.
+def test_complexity_metrics(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_17_p.gz", "test_summarize_to_dataframe")
+    df = dicom_info.complexity_metrics()
+    assert df["beam"].tolist() == [1, 2, "plan"]
+    assert df["control_points"].tolist() == [2, 2, 4]
+    assert df["area [mm2]"].tolist() == [30.0, 30.0, 30.0]
+    assert df["leaf_travel [mm]"].tolist() == [24.0, 4.0, 28.0]
+    assert df["MCS"].tolist() == pytest.approx([0.25, 3 / 14, 13 / 56])
+    # The first beam turns 10 degrees at 6 degrees per second.
+    assert df["max_leaf_speed [mm/s]"].tolist()[0] == pytest.approx(3.6)
+
+
+# This test verifies that the metrics are computed again only after
+# modifying the plan.
+def test_cache(patients):
+    plan = patients("patient_17_p.gz", "test_summarize_to_dataframe")
+    dicom_info = DicomInfo(plan)
+    with instrumentation.instrument() as registry:
+        first = dicom_info.complexity_metrics()
+        first["MCS"] = 0.0
+        dicom_info.complexity_metrics()
+        dicom_info.mark_modified(plan=True)
+        dicom_info.complexity_metrics()
+    misses = [
+        record.counters.get("cache_misses", 0) for record in registry.records
+    ]
+    assert misses == [4, 0, 4]
+    assert dicom_info.complexity_metrics()["MCS"].iloc[0] == 0.25
@@ -0,0 +1,125 @@
+import os
+from pathlib import Path
+
+from dicomhandler import ds_codec
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
+import pydicom
+from pydicom.dataelem import RawDataElement
+from pydicom.dataset import Dataset
+from pydicom.tag import Tag
+
+import pytest
+
+EXAMPLE_PLAN = Path(os.getcwd()) / (
+    "Examples/RP.1.2.276.0.20.1.4.106.968269887716.25132."
+    "1649170861.757182.1.dcm"
+)
+
+CONTOUR_DATA = Tag("ContourData")
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (b"0.3\\-1\\2.5 ", [0.3, -1.0, 2.5]),
+        (b" 1e-3\\ +4 \\5.", [0.001, 4.0, 5.0]),
+        (b"7", [7.0]),
+        (b"", []),
+        (b"  ", []),
+        (None, []),
+    ],
+)
+# These tests verify the parsed values of DS byte strings.
+def test_parse_ds(value, expected):
+    assert ds_codec.parse_ds(value).tolist() == expected
+
+
+# This test verifies that the parsed values are the formatted ones.
+def test_parse_format():
+    values = np.random.default_rng(0).normal(0, 100, 300)
+    parsed = ds_codec.parse_ds(ds_codec.format_ds(values))
+    assert np.allclose(parsed, values, rtol=1e-9)
+
+
+@pytest.mark.parametrize("precision", [9, 10])
+# These tests verify that the values with a three digit exponent are
+# formatted in the 16 characters of DS.
+def test_format_ds_length(precision):
+    values = [-1.234567891e-100, 1.234567891e-100, -9.87654321e200, 0.5]
+    encoded = ds_codec.format_ds(values, precision=precision)
+    assert all(len(value) <= 16 for value in encoded.split(b"\\"))
+    assert np.allclose(ds_codec.parse_ds(encoded), values, rtol=1e-8)
+
+
+# This test verifies that a value that is not a number raises.
+def test_raises_parse_ds():
+    with pytest.raises(ValueError):
+        ds_codec.parse_ds(b"1.0\\a\\2.0")
+
+
+@pytest.mark.parametrize("vr", ["DS", None])
+# These tests verify that a raw element is parsed and kept raw, also
+# when it is read from an implicit VR file.
+def test_ds_array_raw(vr):
+    contour = Dataset()
+    value = b"1.5\\2\\-3 "
+    contour[CONTOUR_DATA] = RawDataElement(
+        CONTOUR_DATA, vr, len(value), value, 0, True, True
+    )
+    assert ds_codec.ds_array(contour, "ContourData").tolist() == [
+        1.5,
+        2.0,
+        -3.0,
+    ]
+    assert contour.get_item(CONTOUR_DATA).is_raw
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    [([1.0, 2.0, 3.0], [1.0, 2.0, 3.0]), (4.0, [4.0]), (None, [])],
+)
+# These tests verify the values of converted elements.
+def test_ds_array_values(values, expected):
+    contour = Dataset()
+    contour.add_new(CONTOUR_DATA, "DS", values)
+    assert ds_codec.ds_array(contour, CONTOUR_DATA).tolist() == expected
+    assert ds_codec.ds_array(Dataset(), CONTOUR_DATA).tolist() == []
+
+
+@pytest.mark.parametrize(
+    "value, expected", [(b"1.5\\2\\-3 ", 3), (b"7 ", 1), (b"", 0)]
+)
+# These tests verify that the values of a raw element are counted and
+# that the element is kept raw.
+def test_ds_count_raw(value, expected):
+    contour = Dataset()
+    contour[CONTOUR_DATA] = RawDataElement(
+        CONTOUR_DATA, "DS", len(value), value, 0, True, True
+    )
+    assert ds_codec.ds_count(contour, "ContourData") == expected
+    assert contour.get_item(CONTOUR_DATA).is_raw
+
+
+@pytest.mark.parametrize(
+    "values, expected", [([1.0, 2.0, 3.0], 3), (4.0, 1), (None, 0)]
+)
+# These tests verify the number of values of converted elements.
+def test_ds_count_values(values, expected):
+    contour = Dataset()
+    contour.add_new(CONTOUR_DATA, "DS", values)
+    assert ds_codec.ds_count(contour, CONTOUR_DATA) == expected
+    assert ds_codec.ds_count(Dataset(), CONTOUR_DATA) == 0
+
+
+# This test verifies that the leaf positions of a plan are read without
+# converting the elements.
+def test_plan_raw():
+    plan = pydicom.dcmread(EXAMPLE_PLAN)
+    mlc = DicomInfo(plan)._mlc_arrays()
+    point = plan.BeamSequence[0].ControlPointSequence[1]
+    device = point.BeamLimitingDevicePositionSequence[0]
+    assert device.get_item("LeafJawPositions").is_raw
+    assert mlc[0][1].tolist() == [float(x) for x in device.LeafJawPositions]
@@ -0,0 +1,146 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler import fluence, instrumentation
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
+import pytest
+
+
+# This function returns the positions of a beam with leaves of 10 mm
+# from -20 to 20 mm, with a single aperture at each control point.
+def beam(*apertures):
+    return np.array(apertures, dtype=float).reshape(len(apertures), 2, 4)
+
+
+BOUNDARIES = [-20.0, -10.0, 0.0, 10.0, 20.0]
+
+
+@pytest.mark.parametrize(
+    "start, stop, resolution, expected",
+    [(0.0, 10.0, 1.0, 11), (0.0, 10.0, 3.0, 5), (-1.0, -1.0, 1.0, 2)],
+)
+# These tests verify the number of edges of the grid.
+def test_grid_edges(start, stop, resolution, expected):
+    edges = fluence.grid_edges(start, stop, resolution)
+    assert len(edges) == expected
+    assert edges[0] == start
+    assert edges[-1] >= stop
+
+
+# This test verifies the fractions of the pixels at the ends of an
+# interval.
+def test_coverage():
+    edges = np.arange(5.0)
+    fractions = fluence.coverage(np.array([0.5]), np.array([2.25]), edges)
+    assert fractions.tolist() == [[0.5, 1.0, 0.25, 0.0]]
+
+
+@pytest.mark.parametrize(
+    "weights, expected",
+    [([0.0, 0.5, 1.0], [0.25, 0.5, 0.25]), ([1.0], [1.0])],
+)
+# These tests verify the meterset of the control points.
+def test_control_point_weights(weights, expected):
+    assert fluence.control_point_weights(weights).tolist() == expected
+
+
+# This test verifies the fluence of a static rectangular field.
+def test_static_field():
+    positions = beam(
+        [-5, -5, -5, -5, 5, 5, 5, 5], [-5, -5, -5, -5, 5, 5, 5, 5]
+    )
+    fluence_map, x, y = fluence.fluence_map(
+        positions, BOUNDARIES, [0.0, 100.0], resolution=2.5
+    )
+    assert fluence_map.shape == (16, 16)
+    assert x[0] == y[0] == -18.75
+    assert fluence_map.max() == 100.0
+    # 100 MU through 10 x 40 mm.
+    assert fluence_map.sum() * 2.5**2 == pytest.approx(100.0 * 400.0)
+    assert np.all(fluence_map[:, np.abs(x) > 5] == 0.0)
+
+
+# This test verifies the partial pixels at the leaf tips and the
+# limits of the jaws.
+def test_partial_pixels():
+    positions = beam([-1.5, -1.5, -1.5, -1.5, 1.5, 1.5, 1.5, 1.5])
+    fluence_map, x, y = fluence.fluence_map(
+        positions,
+        BOUNDARIES,
+        [1.0],
+        extent=(-2.0, 2.0, -20.0, 20.0),
+        jaws=(-10.0, 10.0, -5.0, 20.0),
+    )
+    assert fluence_map[0].tolist() == [0.0] * 4
+    assert fluence_map[-1].tolist() == [0.5, 1.0, 1.0, 0.5]
+    assert fluence_map.sum() == pytest.approx(3.0 * 25)
+
+
+@pytest.mark.parametrize(
+    "resolution, extent, weights",
+    [
+        (0.0, None, [0.0, 1.0]),
+        (1.0, (0.0, 0.0, -1.0, 1.0), [0.0, 1.0]),
+        (1.0, None, [1.0]),
+    ],
+)
+# These tests verify that the grid and the weights must be valid.
+def test_raises_fluence_map(resolution, extent, weights):
+    positions = beam([0] * 8, [0] * 8)
+    with pytest.raises(ValueError):
+        fluence.fluence_map(positions, BOUNDARIES, weights, resolution, extent)
+
+
+@pytest.mark.parametrize(
+    "name, number, expected",
+    [
+        ("patient_17_p.gz", 1, does_not_raise()),
+        ("patient_17_p.gz", 2, does_not_raise()),
+        ("patient_17_p.gz", 3, pytest.raises(ValueError)),
+        ("patient_18_p.gz", 1, pytest.raises(ValueError)),
+        ("patient_19_p.gz", 1, does_not_raise()),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(di_1p_fixt, name, number, expected):
+    with expected:
+        dicom_info = di_1p_fixt(name, "test_summarize_to_dataframe")
+        dicom_info.fluence_map(number)
+
+
+# This test verifies that the plan must be loaded.
+def test_raises_empty(dicom_info_empty):
+    with pytest.raises(ValueError):
+        dicom_info_empty.fluence_map()
+
+
+# This test verifies the relative fluence of a beam without monitor
+# units, with the control points weighted equally.
+def test_fluence_map(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_17_p.gz", "test_summarize_to_dataframe")
+    fluence_map, x, y = dicom_info.fluence_map(1, resolution=0.5)
+    assert fluence_map.shape == (15, 400)
+    # The first control point has gaps of 9, 8 and 7 mm and the second
+    # is closed.
+    assert fluence_map.sum() * 0.5**2 == pytest.approx(0.5 * 60.0)
+
+
+# This test verifies that the fluence is computed again only after
+# modifying the plan.
+def test_cache(patients):
+    plan = patients("patient_17_p.gz", "test_summarize_to_dataframe")
+    dicom_info = DicomInfo(plan)
+    with instrumentation.instrument() as registry:
+        first, _, _ = dicom_info.fluence_map(2)
+        first[:] = 0.0
+        dicom_info.fluence_map(2)
+        dicom_info.mark_modified(plan=True)
+        dicom_info.fluence_map(2)
+    misses = [
+        record.counters.get("cache_misses", 0) for record in registry.records
+    ]
+    assert misses == [4, 0, 4]
+    assert dicom_info.fluence_map(2)[0].sum() > 0
@@ -0,0 +1,142 @@
+from dicomhandler import geometry
+
+import numpy as np
+
+import pytest
+
+
+# This function returns a circle of radius 10 mm with n points.
+def circle(n, z=0.0):
+    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return np.column_stack(
+        [10 * np.cos(angles), 10 * np.sin(angles), np.full(n, z)]
+    )
+
+
+@pytest.mark.parametrize(
+    "points, start, end, expected",
+    [
+        ([[1.0, 1.0, 0.0]], [0.0, 0.0, 0.0], [2.0, 0.0, 0.0], [1.0]),
+        ([[3.0, 0.0, 0.0]], [0.0, 0.0, 0.0], [2.0, 0.0, 0.0], [1.0]),
+        ([[0.0, 2.0, 0.0]], [1.0, 1.0, 1.0], [1.0, 1.0, 1.0], [3**0.5]),
+    ],
+)
+# These tests verify the distances to the segments, also to a
+# degenerate one.
+def test_segment_distances(points, start, end, expected):
+    distances = geometry.segment_distances(points, start, end)
+    assert distances == pytest.approx(expected)
+
+
+@pytest.mark.parametrize(
+    "closed, expected",
+    [(True, [True, False, True, True, False]), (False, [1, 0, 1, 1, 1])],
+)
+# These tests verify that the consecutive duplicates are found.
+def test_remove_duplicates(closed, expected):
+    points = [[0, 0, 0], [0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 0, 0]]
+    keep = geometry.remove_duplicates(points, closed)
+    assert keep.tolist() == [bool(value) for value in expected]
+
+
+# This test verifies that the collinear points of a square are removed.
+def test_square():
+    side = np.linspace(0, 10, 11)
+    square = np.concatenate(
+        [
+            np.column_stack([side, np.zeros(11), np.zeros(11)])[:-1],
+            np.column_stack([np.full(11, 10), side, np.zeros(11)])[:-1],
+            np.column_stack([side[::-1], np.full(11, 10), np.zeros(11)])[:-1],
+            np.column_stack([np.zeros(11), side[::-1], np.zeros(11)])[:-1],
+        ]
+    )
+    simplified, deviation = geometry.simplify(square, 0.0)
+    assert sorted(map(tuple, simplified.tolist())) == [
+        (0.0, 0.0, 0.0),
+        (0.0, 10.0, 0.0),
+        (10.0, 0.0, 0.0),
+        (10.0, 10.0, 0.0),
+    ]
+    assert deviation == 0.0
+
+
+@pytest.mark.parametrize("tolerance", [0.01, 0.1, 0.5, 2.0])
+# These tests verify that the deviation of the simplified circles is
+# below the tolerance.
+def test_circle(tolerance):
+    points = circle(2000)
+    simplified, deviation = geometry.simplify(points, tolerance)
+    assert 3 <= len(simplified) < len(points)
+    assert deviation <= tolerance
+    keep = geometry.douglas_peucker(points, tolerance)
+    assert geometry.deviation(points, keep) == pytest.approx(deviation)
+
+
+# This test verifies that an open contour keeps its ends.
+def test_open():
+    points = np.column_stack([np.arange(10.0), np.zeros(10), np.zeros(10)])
+    keep = geometry.douglas_peucker(points, 0.1, closed=False)
+    assert np.flatnonzero(keep).tolist() == [0, 9]
+
+
+# This test verifies that the tolerance must be positive.
+def test_raises_tolerance():
+    with pytest.raises(ValueError):
+        geometry.simplify(circle(10), -1.0)
+
+
+@pytest.mark.parametrize(
+    "closed, expected", [(True, [0, 1, 2, 3, 4]), (False, [0, 1, 2, 3])]
+)
+# These tests verify the cumulative lengths of a contour.
+def test_arc_lengths(closed, expected):
+    points = [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]]
+    assert geometry.arc_lengths(points, closed).tolist() == expected
+
+
+@pytest.mark.parametrize(
+    "spacing, count, closed, expected",
+    [
+        (1.0, None, True, 63),
+        (0.7, None, True, 90),
+        (None, 64, True, 64),
+        (None, 5, False, 5),
+        (100.0, None, True, 3),
+        (100.0, None, False, 2),
+    ],
+)
+# These tests verify that the points of an uneven contour are placed at
+# the same distance, below the spacing.
+def test_resample(spacing, count, closed, expected):
+    angles = np.linspace(0, 1, 50, endpoint=False) ** 2 * 2 * np.pi
+    points = np.column_stack(
+        [10 * np.cos(angles), 10 * np.sin(angles), np.zeros(50)]
+    )
+    resampled = geometry.resample(points, spacing, count, closed)
+    assert len(resampled) == expected
+    assert resampled[0].tolist() == points[0].tolist()
+    steps = np.diff(
+        np.vstack([resampled, resampled[:1]]) if closed else resampled,
+        axis=0,
+    )
+    steps = np.linalg.norm(steps, axis=1)
+    assert steps.max() - steps.min() < 0.05 * steps.max()
+    if spacing is not None:
+        assert steps.max() <= spacing
+    assert np.allclose(np.linalg.norm(resampled[:, :2], axis=1), 10, atol=1)
+
+
+# This test verifies that the points of a degenerated contour are kept.
+def test_resample_point():
+    resampled = geometry.resample([[1, 2, 3]] * 4, count=4)
+    assert resampled.tolist() == [[1.0, 2.0, 3.0]] * 4
+
+
+@pytest.mark.parametrize(
+    "spacing, count",
+    [(None, None), (1.0, 10), (0.0, None), (-1.0, None), (None, 2)],
+)
+# These tests verify that the spacing or the count must be valid.
+def test_raises_resample(spacing, count):
+    with pytest.raises(ValueError):
+        geometry.resample(circle(10), spacing, count)
@@ -0,0 +1,142 @@
+from io import StringIO
+
+from dicomhandler import instrumentation
+from dicomhandler.report import report
+
+import pytest
+
+
+# This fixture disables the global instrumentation after each test.
+@pytest.fixture()
+def registry():
+    instrumentation.REGISTRY.clear()
+    yield instrumentation.REGISTRY
+    instrumentation.disable()
+    instrumentation.REGISTRY.clear()
+
+
+# This test verifies that nothing is recorded by default.
+def test_disabled(di_1p_fixt, registry):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    dicom_info.move("cubo", 10.0, "yaw")
+    assert not instrumentation.is_enabled()
+    assert len(registry) == 0
+    with instrumentation.stage("copy"):
+        instrumentation.count("points", 10)
+
+
+# This test verifies the stages and counters of struct_to_csv.
+def test_struct_to_csv(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    buffer = StringIO()
+    with instrumentation.instrument() as registry:
+        dicom_info.struct_to_csv(buffer)
+    assert not instrumentation.is_enabled()
+    (record,) = registry.records
+    rois = dicom_info.dicom_struct.ROIContourSequence
+    assert record.name == "DicomInfo.struct_to_csv"
+    assert record.error is None
+    assert set(record.stages) == {"copy", "dataframe", "write"}
+    assert sum(record.stages.values()) <= record.duration
+    assert record.counters["rois"] == len(rois)
+    assert record.counters["slices"] == sum(
+        len(roi.ContourSequence) for roi in rois
+    )
+    assert record.counters["points"] == sum(
+        len(contour.ContourData) // 3
+        for roi in rois
+        for contour in roi.ContourSequence
+    )
+    assert record.counters["bytes_written"] == len(buffer.getvalue())
+
+
+# This test verifies the counters of the plan methods.
+def test_plan(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_0_p.gz", "test_mlc_to_csv")
+    beams = dicom_info.dicom_plan.BeamSequence
+    control_points = sum(len(beam.ControlPointSequence) for beam in beams)
+    with instrumentation.instrument() as registry:
+        dicom_info.mlc_to_csv(StringIO())
+        dicom_info.summarize_to_dataframe(area=True)
+    for record in registry.records:
+        assert record.counters["beams"] == len(beams)
+        assert record.counters["control_points"] == control_points
+    df = registry.to_dataframe()
+    assert list(df["name"]) == [
+        "DicomInfo.mlc_to_csv",
+        "DicomInfo.summarize_to_dataframe",
+    ]
+    assert {"duration", "stage_copy", "control_points"} <= set(df.columns)
+
+
+@pytest.mark.parametrize(
+    "method, args",
+    [
+        ("move", ("cubo", 10.0, "x")),
+        ("add_margin", ("cubo", 1.0)),
+        ("simplify", ("cubo", 0.5)),
+        ("resample", ("cubo", 2.0)),
+    ],
+)
+# These tests verify the counters of the slices and points processed by
+# the geometry methods.
+def test_geometry(di_1p_fixt, method, args):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    contours = dicom_info.dicom_struct.ROIContourSequence[0].ContourSequence
+    with instrumentation.instrument() as registry:
+        getattr(dicom_info, method)(*args)
+    (record,) = registry.records
+    assert record.name == f"DicomInfo.{method}"
+    assert record.counters["slices"] == len(contours)
+    assert record.counters["points"] == sum(
+        len(contour.ContourData) // 3 for contour in contours
+    )
+
+
+# This test verifies that the callbacks and the global registry receive
+# the calls, including the nested ones and the failed ones.
+def test_callbacks(di_1p_fixt, registry):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    received = []
+    instrumentation.add_callback(received.append)
+    instrumentation.enable()
+    try:
+        moved = dicom_info.move("cubo", 10.0, "x")
+        report(dicom_info, moved, "cubo")
+        with pytest.raises(ValueError):
+            dicom_info.move("error", 10.0, "x")
+    finally:
+        instrumentation.remove_callback(received.append)
+    assert received == registry.records
+    names = [record.name for record in received]
+    assert names == ["DicomInfo.move", "report", "DicomInfo.move"]
+    assert received[0].counters["points"] == received[1].counters["points"] / 2
+    assert received[1].stages["parse"] > 0
+    assert received[2].error == "ValueError"
+    instrumentation.disable()
+    dicom_info.move("cubo", 10.0, "x")
+    assert len(registry) == 3
+
+
+@instrumentation.instrumented("pipeline")
+def pipeline(dicom_info, directory):
+    return dicom_info.move("cubo", 1.0, "y").save(directory)
+
+
+# This test verifies the nested blocks and the depth of the nested calls.
+def test_nested(di_1p_fixt, tmp_path):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    with instrumentation.instrument() as outer:
+        with instrumentation.instrument() as inner:
+            paths = pipeline(dicom_info, tmp_path)
+        dicom_info.anonymize()
+    assert [(record.name, record.depth) for record in inner.records] == [
+        ("DicomInfo.move", 1),
+        ("DicomInfo.save", 1),
+        ("pipeline", 0),
+    ]
+    assert len(outer) == 4
+    save = inner.records[1]
+    assert save.counters["files"] == 1
+    assert save.counters["bytes_written"] == paths[0].stat().st_size
+    assert {"encode", "write"} <= set(save.stages)
@@ -0,0 +1,235 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler import isodose
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ImplicitVRLittleEndian
+
+import pytest
+
+
+# This function returns a dose of 20 Gy at (0, 0) that decreases
+# with the distance r as 20 * exp(-r**2 / 200).
+def gaussian(x, y):
+    return 20.0 * np.exp(-(x**2 + y**2) / 200.0)
+
+
+# This function returns the distance to (0, 0) of a dose level in Gy.
+def radius(dose):
+    return np.sqrt(-200.0 * np.log(dose / 20.0))
+
+
+# This fixture returns an RTDOSE dataset of 3 planes with the gaussian
+# dose, with 1 mm pixels from -20 to 20 mm.
+@pytest.fixture()
+def dose():
+    dataset = Dataset()
+    dataset.file_meta = FileMetaDataset()
+    dataset.file_meta.TransferSyntaxUID = ImplicitVRLittleEndian
+    dataset.is_little_endian = True
+    dataset.is_implicit_VR = True
+    dataset.Modality = "RTDOSE"
+    dataset.PatientName = "mario rossi"
+    dataset.PatientID = "3"
+    dataset.PatientBirthDate = "20000101"
+    dataset.Rows = dataset.Columns = 41
+    dataset.NumberOfFrames = 3
+    dataset.SamplesPerPixel = 1
+    dataset.PhotometricInterpretation = "MONOCHROME2"
+    dataset.BitsAllocated = dataset.BitsStored = 32
+    dataset.HighBit = 31
+    dataset.PixelRepresentation = 0
+    dataset.PixelSpacing = [1.0, 1.0]
+    dataset.ImagePositionPatient = [-20.0, -20.0, 10.0]
+    dataset.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    dataset.GridFrameOffsetVector = [0.0, 2.5, 5.0]
+    dataset.DoseGridScaling = 0.001
+    y, x = np.mgrid[-20:21, -20:21]
+    frames = np.stack([gaussian(x, y)] * 3) * 1000
+    dataset.PixelData = np.round(frames).astype(np.uint32).tobytes()
+    return dataset
+
+
+# This fixture returns an object with the structures and the dose.
+@pytest.fixture()
+def dose_info(patients, dose):
+    return DicomInfo(patients("patient_1_s.gz", "test_move"), dose)
+
+
+@pytest.mark.parametrize(
+    "plane, levels, expected",
+    [
+        ([[0, 0, 0], [0, 2, 0], [0, 0, 0]], [1.0], [4]),
+        ([[0, 0, 0], [0, 2, 0], [0, 0, 0]], [1.0, 3.0], [4, None]),
+        ([[2, 2], [2, 2]], [1.0], [4]),
+        ([[2, 0, 2], [0, 0, 0], [2, 0, 2]], [1.0], [3, 3, 3, 3]),
+        ([[2, 0], [0, 2]], [0.9, 1.0, 1.1], [6, 6, 3, 3]),
+    ],
+)
+# These tests verify the number of points of the iso-lines, including
+# those at the border and at the saddle cells, that are joined or
+# separated by the mean of the cell.
+def test_marching_squares(plane, levels, expected):
+    lines = isodose.marching_squares(plane, levels)
+    found = [len(line) for level in lines for line in level]
+    assert found == [value for value in expected if value is not None]
+
+
+# This test verifies the positions of the iso-lines of a cone.
+def test_circle():
+    y, x = np.mgrid[-20:21, -20:21]
+    lines = isodose.marching_squares(gaussian(x, y), [5.0, 10.0, 18.0])
+    for level, found in zip([5.0, 10.0, 18.0], lines):
+        assert len(found) == 1
+        distances = np.linalg.norm(found[0] - 20, axis=1)
+        assert np.allclose(distances, radius(level), atol=0.1)
+
+
+@pytest.mark.parametrize(
+    "offsets, expected", [([0.0, 2.5], [0.0, 2.5]), ([10.0, 7.5], [0, -2.5])]
+)
+# These tests verify the relative and absolute offsets of the planes.
+def test_grid_geometry(dose, offsets, expected):
+    dose.GridFrameOffsetVector = offsets
+    geometry = isodose.grid_geometry(dose)
+    assert geometry["offsets"].tolist() == expected
+    assert geometry["normal"].tolist() == [0, 0, 1]
+
+
+# This test verifies that the number of planes must match the offsets.
+def test_raises_isodose_contours(dose):
+    geometry = isodose.grid_geometry(dose)
+    with pytest.raises(ValueError):
+        isodose.isodose_contours(np.zeros((2, 3, 3)), [1.0], geometry)
+
+
+@pytest.mark.parametrize(
+    "little, signed", [(True, False), (False, False), (True, True)]
+)
+# These tests verify that the planes are a view of the pixel data with
+# its byte order and sign.
+def test_dose_frames(dose, little, signed):
+    y, x = np.mgrid[-20:21, -20:21]
+    expected = np.round(np.stack([gaussian(x, y)] * 3) * 1000)
+    dtype = np.dtype("i4" if signed else "u4")
+    dtype = dtype.newbyteorder("<" if little else ">")
+    dose.is_little_endian = little
+    dose.PixelRepresentation = int(signed)
+    dose.PixelData = expected.astype(dtype).tobytes()
+    frames = isodose.dose_frames(dose)
+    assert frames.shape == (3, 41, 41)
+    assert not frames.flags.owndata
+    assert np.array_equal(frames, expected)
+
+
+@pytest.mark.parametrize(
+    "levels, reference, names, expected",
+    [
+        ([50, 95], None, None, does_not_raise()),
+        (50.5, 20.0, ["iso"], does_not_raise()),
+        ([], None, None, pytest.raises(ValueError)),
+        ([-50], None, None, pytest.raises(ValueError)),
+        (["50"], None, None, pytest.raises(TypeError)),
+        ([50], 0.0, None, pytest.raises(ValueError)),
+        ([50, 95], None, ["iso"], pytest.raises(ValueError)),
+        ([50], None, ["cubo"], pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(dose_info, levels, reference, names, expected):
+    with expected:
+        dose_info.isodose(levels, reference, names)
+
+
+@pytest.mark.parametrize("files", [["struct"], ["dose"]])
+# These tests verify that the structure and dose files must be loaded.
+def test_raises_files(patients, dose, files):
+    datasets = {
+        "struct": patients("patient_1_s.gz", "test_move"),
+        "dose": dose,
+    }
+    dicom_info = DicomInfo(*[datasets[name] for name in files])
+    with pytest.raises(ValueError):
+        dicom_info.isodose([50])
+
+
+@pytest.mark.parametrize("reference", [None, 40.0])
+# These tests verify the contours of the new structures.
+def test_isodose(dose_info, reference):
+    dicom_iso = dose_info.isodose([50, 95], reference=reference)
+    rois = dicom_iso.dicom_struct.StructureSetROISequence
+    assert [roi.ROIName for roi in rois][-2:] == [
+        "Isodose 50%",
+        "Isodose 95%",
+    ]
+    for level, roi, contours in zip(
+        [50, 95], rois[-2:], dicom_iso.dicom_struct.ROIContourSequence[-2:]
+    ):
+        dose = level / 100 * (reference or 20.0)
+        assert roi.ROIGenerationAlgorithm == "AUTOMATIC"
+        assert contours.ReferencedROINumber == roi.ROINumber
+        slices = contours.ContourSequence
+        if dose >= 20.0:
+            assert len(slices) == 0
+            continue
+        assert len(slices) == 3
+        for z, contour in zip([10.0, 12.5, 15.0], slices):
+            points = np.array(contour.ContourData).reshape(-1, 3)
+            assert contour.NumberOfContourPoints == len(points)
+            assert np.all(points[:, 2] == z)
+            distances = np.linalg.norm(points[:, :2], axis=1)
+            assert np.allclose(distances, radius(dose), atol=0.1)
+        assert dicom_iso.roi_version(roi.ROIName) == 1
+    assert len(dose_info.dicom_struct.StructureSetROISequence) == 5
+
+
+# This test verifies that the structures are added to the object.
+def test_inplace(dose_info):
+    dicom_iso = dose_info.isodose([50], names=["iso"], inplace=True)
+    assert dicom_iso is dose_info
+    names = [roi.ROIName for roi in dose_info.dicom_struct[0x30060020]]
+    assert names[-1] == "iso"
+
+
+@pytest.mark.parametrize("names", [["iso", "iso"], ["iso", "cubo"]])
+# These tests verify that no structure is added in place when a name is
+# repeated or already exists.
+def test_raises_inplace(dose_info, names):
+    with pytest.raises(ValueError):
+        dose_info.isodose([50, 95], names=names, inplace=True)
+    assert len(dose_info.dicom_struct.StructureSetROISequence) == 5
+    assert len(dose_info.dicom_struct.ROIContourSequence) == 5
+
+
+# This test verifies the observations of the new structures.
+def test_observations(dose_info):
+    observation = Dataset()
+    observation.ObservationNumber = 1
+    observation.ReferencedROINumber = 1
+    observation.RTROIInterpretedType = "ORGAN"
+    dose_info.dicom_struct.RTROIObservationsSequence = [observation]
+    dicom_iso = dose_info.isodose([50])
+    observations = dicom_iso.dicom_struct.RTROIObservationsSequence
+    assert [item.RTROIInterpretedType for item in observations] == [
+        "ORGAN",
+        "ISODOSE",
+    ]
+
+
+# This test verifies that a new ROI can copy the attributes of a
+# structure without its contours.
+def test_append_roi_attributes(dose_info):
+    original = dose_info.dicom_struct.ROIContourSequence[0]
+    original.ROIDisplayColor = [255, 0, 0]
+    dicom_new, index = dose_info._append_roi(0, "empty", contours=False)
+    new = dicom_new.dicom_struct.ROIContourSequence[index]
+    roi = dicom_new.dicom_struct.StructureSetROISequence[index]
+    assert len(new.ContourSequence) == 0
+    assert len(original.ContourSequence) == 4
+    assert new.ReferencedROINumber == roi.ROINumber
+    assert new.ROIDisplayColor == [255, 0, 0]
+    assert "ReferencedROINumber" not in original
@@ -0,0 +1,100 @@
+from contextlib import nullcontext as does_not_raise
+
+import numpy as np
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "roi, expected",
+    [
+        ("cubo", does_not_raise()),
+        (["cubo", "space"], does_not_raise()),
+        ("all", does_not_raise()),
+        ("error", does_not_raise()),
+        ("cuadrado", pytest.raises(ValueError)),
+        ([], pytest.raises(ValueError)),
+        (1, pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way, before the first slice is requested.
+def test_raises(di_1p_fixt, roi, expected):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    with expected:
+        dicom_info.iter_contours(roi)
+
+
+# This test verifies that the structure file must be loaded.
+def test_raises_empty(dicom_info_empty):
+    with pytest.raises(ValueError):
+        dicom_info_empty.iter_all_contours()
+
+
+@pytest.mark.parametrize("compact", [False, True])
+# These tests verify the slices against the ContourData of the files.
+def test_iter_contours(di_1p_fixt, compact):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    if compact:
+        dicom_info = dicom_info.compact()
+    original = di_1p_fixt("patient_1_s.gz", "test_move").dicom_struct
+    expected = []
+    for roi, contours in zip(
+        original.StructureSetROISequence, original.ROIContourSequence
+    ):
+        for item, contour in enumerate(contours.ContourSequence):
+            expected.append((roi.ROIName, item, contour.ContourData))
+    slices = list(dicom_info.iter_all_contours())
+    assert [(roi, item) for roi, item, _, _ in slices] == [
+        (roi, item) for roi, item, _ in expected
+    ]
+    for (_, _, z, points), (_, _, data) in zip(slices, expected):
+        assert points.shape == (len(data) // 3, 3)
+        assert np.allclose(points.ravel(), data[: len(points) * 3])
+        assert z == pytest.approx(float(data[2]))
+        assert not points.flags.writeable
+
+
+# This function returns the array that owns the memory of a view.
+def owner(array):
+    while array.base is not None:
+        array = array.base
+    return array
+
+
+@pytest.mark.parametrize("compact", [False, True])
+# These tests verify that the slices are views of a single array, that
+# of the compact storage if the structure is compact.
+def test_views(di_1p_fixt, compact):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    if compact:
+        dicom_info = dicom_info.compact()
+    views = [points for _, _, _, points in dicom_info.iter_contours("cubo")]
+    base = owner(views[0])
+    assert base is not views[0]
+    assert all(owner(points) is base for points in views)
+    if compact:
+        assert base is owner(dicom_info._compact[0].points)
+    again = [points for _, _, _, points in dicom_info.iter_contours("cubo")]
+    assert all(owner(points) is base for points in again)
+
+
+# This test verifies that a slice without points is yielded empty.
+def test_empty_slice(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    _, _, z, points = next(dicom_info.iter_contours("space5"))
+    assert np.isnan(z)
+    assert points.shape == (0, 3)
+
+
+# This test verifies that the views keep their values after moving the
+# structure, and that the new slices have the moved points.
+def test_modified(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    before = [p for _, _, _, p in dicom_info.iter_contours("cubo")]
+    original = [points.copy() for points in before]
+    dicom_info.move("cubo", 10.0, "z", inplace=True)
+    after = [p for _, _, z, p in dicom_info.iter_contours("cubo")]
+    for old, copy, new in zip(before, original, after):
+        assert np.array_equal(old, copy)
+        assert np.allclose(new[:, 2], copy[:, 2] + 10.0)
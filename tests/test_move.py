@@ -1,5 +1,7 @@
 from contextlib import nullcontext as does_not_raise
 
+import numpy as np
+
 from pydicom.multival import MultiValue
 
 import pytest
@@ -204,3 +206,224 @@ def test_move_punto(di_1p_fixt, struct, angle, key, expected):
         )
         assert len(x) == len(expected)
         assert all([abs(xi - yi) <= 0.00001 for xi, yi in zip(x, expected)])
+
+
+@pytest.mark.parametrize(
+    "struct, angle, key, new_name, expected",
+    [
+        ("cubo", 10.0, "yaw", "cubo", pytest.raises(ValueError)),
+        ("cubo", 10.0, "yaw", "punto", pytest.raises(ValueError)),
+        ("cubo", 10.0, "yaw", "cubo yaw", does_not_raise()),
+        ("error", 10.0, "x", "error x", pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way, when the result is added as a new ROI.
+def test_raises_new_name(di_1p_fixt, struct, angle, key, new_name, expected):
+    with expected:
+        dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+        dicom_info.move(struct, angle, key, new_name=new_name)
+
+
+@pytest.mark.parametrize(
+    "struct, index, angle, key",
+    [
+        ("cubo", 0, 30.0, "yaw"),
+        ("space", 1, 5.0, "x"),
+        ("punto", 2, 90.0, "roll"),
+    ],
+)
+# These tests verify that the moved structure is appended as a new ROI,
+# equal to the overwritten one, keeping the original structure.
+def test_move_new_name(di_1p_fixt, patients, struct, index, angle, key):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    length = len(dicom_info.dicom_struct.StructureSetROISequence)
+    appended = dicom_info.move(struct, angle, key, new_name="new")
+    overwritten = dicom_info.move(struct, angle, key)
+    rois = appended.dicom_struct.StructureSetROISequence
+    assert len(rois) == length + 1
+    assert rois[length].ROIName == "new"
+    assert rois[length].ROINumber == length + 1
+    assert len(dicom_info.dicom_struct.StructureSetROISequence) == length
+    for x, y in zip(
+        appended.dicom_struct.ROIContourSequence[length].ContourSequence,
+        overwritten.dicom_struct.ROIContourSequence[index].ContourSequence,
+    ):
+        assert all(
+            [
+                abs(xi - yi) <= 1e-8
+                for xi, yi in zip(x.ContourData, y.ContourData)
+            ]
+        )
+    original = patients("patient_1_s.gz", "test_move")
+    for x, y in zip(
+        appended.dicom_struct.ROIContourSequence[index].ContourSequence,
+        original.ROIContourSequence[index].ContourSequence,
+    ):
+        assert x.ContourData == y.ContourData
+
+
+# This test verifies that the untouched structures are shared and not
+# copied when the result is added as a new ROI.
+def test_move_new_name_shared(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    appended = dicom_info.move("cubo", 1.0, "z", new_name="cubo z")
+    for x, y in zip(
+        appended.dicom_struct.ROIContourSequence,
+        dicom_info.dicom_struct.ROIContourSequence,
+    ):
+        assert x is y
+    assert appended.dicom_plan is dicom_info.dicom_plan
+
+
+@pytest.mark.parametrize("new_name", [None, "cubo pitch"])
+# These tests verify that the structure is moved in the same object,
+# without copying it, and that the result is the same as with a copy.
+def test_move_inplace(di_1p_fixt, new_name):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    expected = dicom_info.move("cubo", 20.0, "pitch", new_name=new_name)
+    struct = dicom_info.dicom_struct
+    moved = dicom_info.move(
+        "cubo", 20.0, "pitch", new_name=new_name, inplace=True
+    )
+    assert moved is dicom_info
+    assert moved.dicom_struct is struct
+    for x, y in zip(
+        moved.dicom_struct.ROIContourSequence,
+        expected.dicom_struct.ROIContourSequence,
+    ):
+        for xc, yc in zip(x.ContourSequence, y.ContourSequence):
+            assert xc.ContourData == yc.ContourData
+    assert len(moved.dicom_struct.StructureSetROISequence) == len(
+        expected.dicom_struct.StructureSetROISequence
+    )
+
+
+@pytest.mark.parametrize(
+    "struct, new_name, expected",
+    [
+        (["cubo", "space"], None, does_not_raise()),
+        (("cubo", "cubo"), None, does_not_raise()),
+        (["cubo", "cuadrado"], None, pytest.raises(ValueError)),
+        ([], None, pytest.raises(ValueError)),
+        (["cubo", "error"], None, pytest.raises(ValueError)),
+        ("all", None, pytest.raises(ValueError)),
+        (["cubo", "space"], "new", pytest.raises(ValueError)),
+        (["cubo"], "new", does_not_raise()),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way, when several structures are selected.
+def test_raises_many(di_1p_fixt, struct, new_name, expected):
+    with expected:
+        dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+        dicom_info.move(struct, 10.0, "roll", new_name=new_name)
+
+
+@pytest.mark.parametrize(
+    "struct, angle, key",
+    [
+        (["cubo", "space", "punto"], 10.0, "yaw"),
+        (["space", "cubo"], -3.0, "z"),
+        ("all", 45.0, "pitch"),
+    ],
+)
+# These tests verify that moving several structures at once is the same
+# as moving each one, and that the rest are not modified.
+def test_move_many(di_1p_fixt, struct, angle, key):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    for sequence in [
+        dicom_info.dicom_struct.StructureSetROISequence,
+        dicom_info.dicom_struct.ROIContourSequence,
+    ]:
+        del sequence[3]
+    names = [
+        roi.ROIName for roi in dicom_info.dicom_struct.StructureSetROISequence
+    ]
+    selected = names if struct == "all" else struct
+    moved = dicom_info.move(struct, angle, key)
+    for index, name in enumerate(names):
+        expected = dicom_info
+        if name in selected:
+            expected = dicom_info.move(name, angle, key)
+            assert moved.roi_version(name) == 1
+        for x, y in zip(
+            moved.dicom_struct.ROIContourSequence[index].ContourSequence,
+            expected.dicom_struct.ROIContourSequence[index].ContourSequence,
+        ):
+            assert len(x.ContourData) == len(y.ContourData)
+            assert all(
+                [
+                    abs(xi - yi) <= 1e-8
+                    for xi, yi in zip(x.ContourData, y.ContourData)
+                ]
+            )
+
+
+@pytest.mark.parametrize(
+    "precision, expected",
+    [
+        (10, does_not_raise()),
+        (4, does_not_raise()),
+        (0, pytest.raises(ValueError)),
+        (11, pytest.raises(ValueError)),
+        (4.0, pytest.raises(ValueError)),
+    ],
+)
+# These tests verify that the moved slices are written as encoded DS
+# with the precision.
+def test_move_precision(di_1p_fixt, precision, expected):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    with expected:
+        moved = dicom_info.move("cubo", 10.0, "yaw", precision=precision)
+        full = dicom_info.move("cubo", 10.0, "yaw")
+        for x, y in zip(
+            moved.dicom_struct.ROIContourSequence[0].ContourSequence,
+            full.dicom_struct.ROIContourSequence[0].ContourSequence,
+        ):
+            element = x.get_item("ContourData")
+            assert element.is_raw
+            assert all(
+                len(value) <= 16 for value in element.value.split(b"\\")
+            )
+            assert all(
+                [
+                    abs(xi - yi) <= 10 ** (1 - precision) * max(abs(yi), 1)
+                    for xi, yi in zip(x.ContourData, y.ContourData)
+                ]
+            )
+
+
+@pytest.mark.parametrize(
+    "method, args",
+    [
+        ("move", ("cubo", 5.0, "x")),
+        ("add_margin", ("cubo", 1.0)),
+        ("simplify", ("cubo", 0.5)),
+        ("resample", ("cubo", 2.0)),
+    ],
+)
+# These tests verify that the object that shares the files with a new
+# ROI (and its derived results) is not modified by an inplace method of
+# the other object, in both directions.
+def test_inplace_shared(di_1p_fixt, method, args):
+    source = di_1p_fixt("patient_1_s.gz", "test_move")
+    derived = source.move("cubo", 1.0, "x", new_name="copy")
+    for modified, kept in [(derived, source), (source, derived)]:
+        points = kept._roi_points("cubo").copy()
+        expected = [
+            list(contour.ContourData)
+            for contour in kept.dicom_struct.ROIContourSequence[0][
+                "ContourSequence"
+            ]
+        ]
+        version = kept.roi_version("cubo")
+        getattr(modified, method)(*args, inplace=True)
+        assert [
+            list(contour.ContourData)
+            for contour in kept.dicom_struct.ROIContourSequence[0][
+                "ContourSequence"
+            ]
+        ] == expected
+        assert kept.roi_version("cubo") == version
+        assert np.array_equal(kept._roi_points("cubo"), points)
@@ -0,0 +1,208 @@
+from io import StringIO
+
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.progress import (
+    CancellationToken,
+    Cancelled,
+    ProgressInfo,
+    Tracker,
+)
+
+import pydicom
+
+import pytest
+
+
+# This class stores the notifications and cancels the token after
+# ``cancel_after`` of them.
+class Recorder:
+    def __init__(self, cancel_after=None, token=None):
+        self.calls = []
+        self.cancel_after = cancel_after
+        self.token = token
+
+    def __call__(self, info):
+        self.calls.append((info.item, info.done, info.items_done))
+        self.last = info
+        if self.cancel_after is not None:
+            if len(self.calls) >= self.cancel_after:
+                self.token.cancel()
+
+
+# This test verifies the state reported by the tracker.
+def test_tracker():
+    recorder = Recorder()
+    tracker = Tracker("test", recorder, total=10, items=2, interval=0.0)
+    tracker.start_item("a")
+    tracker.advance(4)
+    tracker.finish_item()
+    tracker.start_item("b")
+    tracker.advance(6)
+    tracker.finish_item()
+    tracker.finish()
+    assert recorder.calls == [
+        ("a", 0, 0),
+        ("a", 4, 0),
+        ("a", 4, 1),
+        ("b", 4, 1),
+        ("b", 10, 1),
+        ("b", 10, 2),
+        (None, 10, 2),
+    ]
+    assert recorder.last.finished
+    assert recorder.last.fraction == 1.0
+    assert recorder.last.rate > 0
+
+
+@pytest.mark.parametrize(
+    "done, total, finished, expected",
+    [
+        (0, 0, False, 0.0),
+        (0, 0, True, 1.0),
+        (5, 10, False, 0.5),
+        (12, 10, False, 1.0),
+    ],
+)
+# These tests verify the processed fraction.
+def test_fraction(done, total, finished, expected):
+    info = ProgressInfo("test", "points", total, 1)
+    info.done, info.finished = done, finished
+    assert info.fraction == expected
+
+
+# This test verifies that a cancelled token stops the tracker.
+def test_token():
+    token = CancellationToken()
+    tracker = Tracker("test", cancel=token)
+    tracker.advance()
+    assert not token.cancelled
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(Cancelled):
+        tracker.advance()
+
+
+# This test verifies that struct_to_csv reports all the points and
+# structures.
+def test_struct_to_csv(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    recorder = Recorder()
+    dicom_info.struct_to_csv(StringIO(), progress=recorder)
+    rois = dicom_info.dicom_struct.ROIContourSequence
+    points = sum(
+        len(contour.ContourData) // 3
+        for roi in rois
+        for contour in roi.ContourSequence
+    )
+    info = recorder.last
+    assert info.operation == "struct_to_csv"
+    assert info.finished
+    assert info.done == info.total == points
+    assert info.items_done == info.items_total == len(rois)
+
+
+# This test verifies that mlc_to_csv reports the control points.
+def test_mlc_to_csv(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_0_p.gz", "test_mlc_to_csv")
+    recorder = Recorder()
+    dicom_info.mlc_to_csv(StringIO(), progress=recorder)
+    beams = dicom_info.dicom_plan.BeamSequence
+    info = recorder.last
+    assert info.unit == "control points"
+    assert (
+        info.done
+        == info.total
+        == sum(len(beam.ControlPointSequence) for beam in beams)
+    )
+    assert info.items_done == len(beams)
+
+
+# This test verifies that a cancelled export does not write the file.
+def test_cancel_struct_to_csv(di_1p_fixt, tmp_path):
+    dicom_info = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    token = CancellationToken()
+    recorder = Recorder(cancel_after=1, token=token)
+    with pytest.raises(Cancelled):
+        dicom_info.struct_to_csv(
+            tmp_path / "output.csv", progress=recorder, cancel=token
+        )
+    assert not (tmp_path / "output.csv").exists()
+    assert len(recorder.calls) == 1
+
+
+@pytest.mark.parametrize(
+    "method, args",
+    [
+        ("move", ("cubo", 10.0, "yaw")),
+        ("add_margin", ("cubo", 1.0)),
+    ],
+)
+# These tests verify that the transformations report their progress
+# and that they can be cancelled.
+def test_transforms(di_1p_fixt, method, args):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    recorder = Recorder()
+    getattr(dicom_info, method)(*args, progress=recorder)
+    info = recorder.last
+    assert info.operation == method
+    assert info.finished
+    assert info.done == info.total > 0
+    assert recorder.calls[0][0] == "cubo"
+
+    token = CancellationToken()
+    token.cancel()
+    with pytest.raises(Cancelled):
+        getattr(dicom_info, method)(*args, cancel=token)
+
+
+# This class is a token cancelled after ``checks`` checks.
+class CountdownToken(CancellationToken):
+    def __init__(self, checks):
+        super().__init__()
+        self.checks = checks
+
+    def raise_if_cancelled(self):
+        self.checks -= 1
+        if self.checks <= 0:
+            self.cancel()
+        super().raise_if_cancelled()
+
+
+@pytest.mark.parametrize(
+    "method, args",
+    [
+        ("move", (["cubo", "space"], 1.0, "x")),
+        ("add_margin", (["cubo", "space"], 1.0)),
+    ],
+)
+# These tests verify that the transformations are cancelled while the
+# slices are read, before any slice of the object is modified.
+def test_cancel_before_transform(di_1p_fixt, method, args):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    expected = [
+        [list(contour.ContourData) for contour in roi.ContourSequence]
+        for roi in dicom_info.dicom_struct.ROIContourSequence
+    ]
+    with pytest.raises(Cancelled):
+        getattr(dicom_info, method)(
+            *args, inplace=True, cancel=CountdownToken(3)
+        )
+    assert [
+        [list(contour.ContourData) for contour in roi.ContourSequence]
+        for roi in dicom_info.dicom_struct.ROIContourSequence
+    ] == expected
+    assert dicom_info.roi_version("cubo") == 0
+
+
+# This test verifies that counting the points for the progress keeps
+# the ContourData elements read from a file raw.
+def test_progress_raw(di_1p_fixt, tmp_path):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    (path,) = dicom_info.move("cubo", 1.0, "x").save(tmp_path)
+    dicom_info = DicomInfo(pydicom.dcmread(path))
+    dicom_info.simplify("space", 0.0, inplace=True, progress=Recorder())
+    assert all(
+        contour.get_item("ContourData").is_raw
+        for roi in dicom_info.dicom_struct.ROIContourSequence
+        for contour in roi.ContourSequence
+    )
@@ -0,0 +1,103 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler import geometry
+from dicomhandler.report import report
+
+import numpy as np
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "struct, spacing, count, expected",
+    [
+        ("cubo", 1.0, None, does_not_raise()),
+        (["cubo", "space"], None, 10, does_not_raise()),
+        ("cubo", None, None, pytest.raises(ValueError)),
+        ("cubo", 1.0, 10, pytest.raises(ValueError)),
+        ("cubo", -1.0, None, pytest.raises(ValueError)),
+        ("cubo", None, 2, pytest.raises(ValueError)),
+        ("cubo", "1.0", None, pytest.raises(TypeError)),
+        ("cubo", None, 10.0, pytest.raises(TypeError)),
+        ("cuadrado", 1.0, None, pytest.raises(ValueError)),
+        ("error", 1.0, None, pytest.raises(ValueError)),
+        ("all", 1.0, None, pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(di_1p_fixt, struct, spacing, count, expected):
+    with expected:
+        dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+        dicom_info.resample(struct, spacing, count)
+
+
+# This test verifies that the structure file is required.
+def test_raises_empty(dicom_info_empty):
+    with pytest.raises(ValueError):
+        dicom_info_empty.resample(spacing=1.0)
+
+
+@pytest.mark.parametrize("spacing", [0.5, 2.0, 7.0])
+# These tests verify that the points of each slice are placed along the
+# perimeter at the same distance, not greater than the spacing.
+def test_spacing(di_1p_fixt, spacing):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    resampled = dicom_info.resample(["cubo", "space"], spacing)
+    for index in [0, 1]:
+        x = resampled.dicom_struct.ROIContourSequence[index]
+        y = dicom_info.dicom_struct.ROIContourSequence[index]
+        for xc, yc in zip(x.ContourSequence, y.ContourSequence):
+            points = np.array(xc.ContourData).reshape(-1, 3)
+            perimeter = geometry.arc_lengths(
+                np.array(yc.ContourData).reshape(-1, 3)
+            )[-1]
+            assert len(points) == max(np.ceil(perimeter / spacing), 3)
+            steps = np.linalg.norm(
+                np.diff(np.vstack([points, points[:1]]), axis=0), axis=1
+            )
+            assert steps.max() <= spacing + 1e-9
+        assert (
+            resampled.roi_version(
+                resampled.dicom_struct.StructureSetROISequence[index].ROIName
+            )
+            == 1
+        )
+    original = dicom_info.dicom_struct.ROIContourSequence[0]
+    assert len(original.ContourSequence[0].ContourData) == 12
+
+
+@pytest.mark.parametrize("new_name, inplace", [(None, True), ("new", False)])
+# These tests verify the new structures and the modification of the
+# object.
+def test_options(di_1p_fixt, new_name, inplace):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    length = len(dicom_info.dicom_struct.StructureSetROISequence)
+    resampled = dicom_info.resample(
+        "cubo", count=20, new_name=new_name, inplace=inplace
+    )
+    assert (resampled is dicom_info) is inplace
+    index = length if new_name else 0
+    roi = resampled.dicom_struct.ROIContourSequence[index]
+    for contour in roi.ContourSequence:
+        assert len(contour.ContourData) == 60
+    original = dicom_info.dicom_struct.ROIContourSequence[0]
+    expected = 60 if inplace else 12
+    assert len(original.ContourSequence[0].ContourData) == expected
+
+
+# This test verifies that two objects with different points can be
+# compared after resampling them with the same count.
+def test_report(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    moved = dicom_info.move("cubo", 2.0, "x").resample("cubo", spacing=0.5)
+    with pytest.raises(ValueError):
+        report(dicom_info, moved, "cubo")
+    result = report(
+        dicom_info.resample("cubo", count=40),
+        moved.resample("cubo", count=40),
+        "cubo",
+    )
+    values = dict(zip(result["Parameter"], result["Value [mm]"]))
+    assert values["Distance between center mass"] == pytest.approx(2.0)
+    assert values["Mean distance"] == pytest.approx(2.0)
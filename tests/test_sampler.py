@@ -0,0 +1,158 @@
+import io
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler import sampler
+from dicomhandler.sampler import MLCSampler
+
+import numpy as np
+
+import pytest
+
+
+# This fixture returns a sampler of an arc from 350 to 10 degrees with
+# two leaf pairs, where the second segment has no meterset.
+@pytest.fixture()
+def arc():
+    return MLCSampler(
+        weights=[0.0, 50.0, 50.0, 100.0],
+        gantry=[350.0, 0.0, 5.0, 10.0],
+        jaws=[[-10, 10, -20, 20]] * 4,
+        leaves=[
+            [-4, -4, 4, 4],
+            [-2, -4, 2, 4],
+            [0, 0, 0, 0],
+            [-6, -6, 6, 6],
+        ],
+    )
+
+
+# This test verifies the names of the columns.
+def test_columns(arc):
+    assert arc.columns == [
+        "meterset",
+        "gantry",
+        "X1",
+        "X2",
+        "Y1",
+        "Y2",
+        "A1",
+        "A2",
+        "B1",
+        "B2",
+    ]
+
+
+@pytest.mark.parametrize(
+    "meterset, expected",
+    [
+        (0.0, [0.0, 350.0, -4.0, -4.0, 4.0, 4.0]),
+        (0.25, [0.25, 355.0, -3.0, -4.0, 3.0, 4.0]),
+        (0.5, [0.5, 5.0, 0.0, 0.0, 0.0, 0.0]),
+        (0.75, [0.75, 7.5, -3.0, -3.0, 3.0, 3.0]),
+        (1.0, [1.0, 10.0, -6.0, -6.0, 6.0, 6.0]),
+    ],
+)
+# These tests verify the interpolation across 0 degrees and that the
+# segment without meterset is skipped.
+def test_at(arc, meterset, expected):
+    state = arc.at(meterset)[0]
+    assert state[[0, 1, 6, 7, 8, 9]] == pytest.approx(expected)
+    assert state[2:6].tolist() == [-10.0, 10.0, -20.0, 20.0]
+
+
+@pytest.mark.parametrize("count, batch_size", [(10, 3), (0, 5), (5, 10)])
+# These tests verify the sizes of the batches and the seed.
+def test_random(arc, count, batch_size):
+    batches = list(arc.random(count, batch_size, seed=1))
+    assert [len(batch) for batch in batches] == [
+        min(batch_size, count - start) for start in range(0, count, batch_size)
+    ]
+    again = list(arc.random(count, batch_size, seed=1))
+    for batch, other in zip(batches, again):
+        assert np.array_equal(batch, other)
+
+
+# This test verifies that the samples follow the meterset.
+def test_random_distribution(arc):
+    samples = np.concatenate(list(arc.random(20000, seed=0)))
+    assert samples[:, 0].mean() == pytest.approx(0.5, abs=0.01)
+    assert np.all((samples[:, 1] >= 350.0) | (samples[:, 1] <= 10.0))
+
+
+# This test verifies the samples at every degree of the arc, including
+# the segment without meterset.
+def test_steps(arc):
+    batches = list(arc.steps(1.0, batch_size=7))
+    assert [len(batch) for batch in batches] == [7, 7, 7]
+    samples = np.concatenate(batches)
+    expected = np.arange(350.0, 371.0) % 360.0
+    assert samples[:, 1] == pytest.approx(expected)
+    assert samples[15, 0] == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize(
+    "function, args, expected",
+    [
+        ("random", (-1,), pytest.raises(ValueError)),
+        ("random", (1, 0), pytest.raises(ValueError)),
+        ("steps", (0.0,), pytest.raises(ValueError)),
+        ("steps", (0.5, 0), pytest.raises(ValueError)),
+        ("steps", (0.5,), does_not_raise()),
+    ],
+)
+# These tests verify that the counts and steps must be valid.
+def test_raises(arc, function, args, expected):
+    with expected:
+        list(getattr(arc, function)(*args))
+
+
+# This test verifies that a static beam can't be sampled by angle.
+def test_static():
+    static = MLCSampler([0.0], [90.0], [[-1, 1, -1, 1]], [[-1, 1]])
+    assert static.at([0.0, 1.0])[:, 1].tolist() == [90.0, 90.0]
+    with pytest.raises(ValueError):
+        list(static.steps(1.0))
+
+
+# This test verifies the values written to a binary buffer.
+def test_write(arc):
+    buffer = io.BytesIO()
+    written = sampler.write(arc.steps(1.0, batch_size=4), buffer)
+    values = np.frombuffer(buffer.getvalue(), dtype=np.float32)
+    samples = np.concatenate(list(arc.steps(1.0)))
+    assert written == 21
+    assert np.allclose(values.reshape(-1, len(arc.columns)), samples)
+
+
+# This test verifies that the file is written from a path.
+def test_write_path(arc, tmp_path):
+    path = tmp_path / "states.bin"
+    sampler.write(arc.random(10, seed=0), path, dtype=np.float64)
+    values = np.fromfile(path).reshape(-1, len(arc.columns))
+    assert np.array_equal(values, next(arc.random(10, seed=0)))
+
+
+@pytest.mark.parametrize(
+    "name, number, expected",
+    [
+        ("patient_17_p.gz", 2, does_not_raise()),
+        ("patient_17_p.gz", 3, pytest.raises(ValueError)),
+        ("patient_18_p.gz", 1, pytest.raises(ValueError)),
+        ("patient_19_p.gz", 1, does_not_raise()),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises_dicom(di_1p_fixt, name, number, expected):
+    with expected:
+        dicom_info = di_1p_fixt(name, "test_summarize_to_dataframe")
+        dicom_info.mlc_sampler(number)
+
+
+# This test verifies the states of a plan without jaws and meterset.
+def test_mlc_sampler(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_17_p.gz", "test_summarize_to_dataframe")
+    states = np.concatenate(list(dicom_info.mlc_sampler(1).steps(2.5)))
+    assert states[:, 1].tolist() == [0.0, 2.5, 5.0, 7.5, 10.0]
+    assert np.isnan(states[:, 2:6]).all()
+    assert states[2, 6:].tolist() == [-6.0, -5.0, -4.0, -1.5, -1.0, -0.5]
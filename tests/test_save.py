@@ -0,0 +1,155 @@
+import os
+from pathlib import Path
+
+from dicomhandler.dicom_info import DicomInfo
+
+import pydicom
+from pydicom.dataset import Dataset
+from pydicom.uid import generate_uid
+
+import pytest
+
+EXAMPLE_PLAN = Path(os.getcwd()) / (
+    "Examples/RP.1.2.276.0.20.1.4.106.968269887716.25132."
+    "1649170861.757182.1.dcm"
+)
+
+
+# This test verifies that an empty object can not be saved.
+def test_raises_empty(dicom_info_empty, tmp_path):
+    with pytest.raises(ValueError):
+        dicom_info_empty.save(tmp_path)
+
+
+@pytest.mark.parametrize("precision", [0, 11])
+# This test verifies that the precision must keep DS values valid.
+def test_raises_precision(di_1p_fixt, tmp_path, precision):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    moved = dicom_info.move("cubo", 10.0, "yaw")
+    with pytest.raises(ValueError):
+        moved.save(tmp_path, precision=precision)
+
+
+@pytest.mark.parametrize(
+    "struct, angle, key",
+    [
+        ("cubo", 33.3, "yaw"),
+        ("space", 0.1, "x"),
+        ("punto", 90.0, "roll"),
+    ],
+)
+# These tests verify that the moved structure is written with a new UID
+# and that the coordinates read back match the moved ones.
+def test_save_moved(di_1p_fixt, tmp_path, struct, angle, key):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    moved = dicom_info.move(struct, angle, key)
+    expected = [
+        [
+            list(map(float, contour.ContourData))
+            for contour in roi.ContourSequence
+        ]
+        for roi in moved.dicom_struct.ROIContourSequence
+    ]
+    paths = moved.save(tmp_path)
+    assert len(paths) == 1
+    assert paths[0].name.startswith("RS.")
+    saved = pydicom.dcmread(paths[0])
+    assert saved.SOPInstanceUID == saved.file_meta.MediaStorageSOPInstanceUID
+    assert paths[0].name == f"RS.{saved.SOPInstanceUID}.dcm"
+    for item, roi in enumerate(saved.ROIContourSequence):
+        for number, contour in enumerate(roi.ContourSequence):
+            assert all(
+                abs(xi - yi) <= 1e-8
+                for xi, yi in zip(contour.ContourData, expected[item][number])
+            )
+
+
+# This test verifies that the written values fit in the DS length.
+def test_save_ds_length(di_1p_fixt, tmp_path):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    moved = dicom_info.move("cubo", 0.123456789, "pitch")
+    path = moved.save(tmp_path)[0]
+    saved = pydicom.dcmread(path)
+    for roi in saved.ROIContourSequence:
+        for contour in roi.ContourSequence:
+            raw = contour.get_item("ContourData").value
+            assert all(len(value) <= 16 for value in raw.split(b"\\"))
+
+
+# This test verifies that a plan is saved with a new SOPInstanceUID
+# and that the original object is not modified.
+def test_save_plan(tmp_path):
+    plan = pydicom.dcmread(EXAMPLE_PLAN)
+    original_uid = plan.SOPInstanceUID
+    dicom_info = DicomInfo(plan)
+    path = dicom_info.save(tmp_path, workers=2)[0]
+    saved = pydicom.dcmread(path)
+    assert path.name.startswith("RP.")
+    assert saved.SOPInstanceUID != original_uid
+    assert dicom_info.dicom_plan.SOPInstanceUID == original_uid
+    assert saved.BeamSequence[0].BeamName == plan.BeamSequence[0].BeamName
+    assert len(saved.BeamSequence) == len(plan.BeamSequence)
+
+
+# This function returns a dataset of the patient of the structures that
+# references other files by their UIDs.
+def referencing(modality, **references):
+    dataset = Dataset()
+    dataset.Modality = modality
+    dataset.PatientName = "mario rossi"
+    dataset.PatientID = "3"
+    dataset.PatientBirthDate = "20000101"
+    dataset.SOPInstanceUID = generate_uid()
+    for keyword, uids in references.items():
+        items = []
+        for uid in uids:
+            item = Dataset()
+            item.ReferencedSOPInstanceUID = uid
+            items.append(item)
+        setattr(dataset, keyword, items)
+    return dataset
+
+
+# This test verifies that the files saved together reference each other
+# with their new UIDs, that the references to other files are kept and
+# that the original files are not modified.
+def test_save_references(patients, tmp_path):
+    struct = patients("patient_1_s.gz", "test_move")
+    struct.SOPInstanceUID = generate_uid()
+    other = generate_uid()
+    plan = referencing(
+        "RTPLAN", ReferencedStructureSetSequence=[struct.SOPInstanceUID]
+    )
+    dose = referencing(
+        "RTDOSE",
+        ReferencedRTPlanSequence=[plan.SOPInstanceUID, other],
+        ReferencedStructureSetSequence=[struct.SOPInstanceUID],
+    )
+    dicom_info = DicomInfo(struct, plan, dose)
+    saved = {
+        dataset.Modality: dataset
+        for dataset in map(pydicom.dcmread, dicom_info.save(tmp_path))
+    }
+    new_struct = saved["RTSTRUCT"].SOPInstanceUID
+    new_plan = saved["RTPLAN"].SOPInstanceUID
+    assert new_struct != struct.SOPInstanceUID
+    assert [
+        item.ReferencedSOPInstanceUID
+        for item in saved["RTPLAN"].ReferencedStructureSetSequence
+    ] == [new_struct]
+    assert [
+        item.ReferencedSOPInstanceUID
+        for item in saved["RTDOSE"].ReferencedRTPlanSequence
+    ] == [new_plan, other]
+    assert [
+        item.ReferencedSOPInstanceUID
+        for item in saved["RTDOSE"].ReferencedStructureSetSequence
+    ] == [new_struct]
+    assert (
+        plan.ReferencedStructureSetSequence[0].ReferencedSOPInstanceUID
+        == struct.SOPInstanceUID
+    )
+    assert (
+        dose.ReferencedRTPlanSequence[0].ReferencedSOPInstanceUID
+        == plan.SOPInstanceUID
+    )
@@ -0,0 +1,82 @@
+from contextlib import nullcontext as does_not_raise
+
+import numpy as np
+
+from pydicom.multival import MultiValue
+
+import pytest
+
+
+# This fixture returns an object where the structure 'cubo' has
+# oversampled circles with repeated points.
+@pytest.fixture()
+def dense_info(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    angles = np.linspace(0, 2 * np.pi, 500, endpoint=False)
+    for z, contour in enumerate(
+        dicom_info.dicom_struct.ROIContourSequence[0].ContourSequence
+    ):
+        points = np.column_stack(
+            [10 * np.cos(angles), 10 * np.sin(angles), np.full(500, z)]
+        )
+        points = np.repeat(points, 2, axis=0)
+        contour.ContourData = MultiValue(float, points.ravel().tolist())
+        contour.NumberOfContourPoints = len(points)
+    return dicom_info
+
+
+@pytest.mark.parametrize(
+    "struct, tolerance, expected",
+    [
+        ("cubo", 0.1, does_not_raise()),
+        ("punto", 0.1, does_not_raise()),
+        ("error", 0.1, pytest.raises(ValueError)),
+        ("cubo", -0.1, pytest.raises(ValueError)),
+        ("cubo", "0.1", pytest.raises(TypeError)),
+        ("cuadrado", 0.1, pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(di_1p_fixt, struct, tolerance, expected):
+    with expected:
+        dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+        dicom_info.simplify(struct, tolerance)
+
+
+@pytest.mark.parametrize("tolerance", [0.0, 0.05, 0.5])
+# These tests verify the simplified contours and the summary.
+def test_simplify(dense_info, tolerance):
+    simplified, summary = dense_info.simplify("cubo", tolerance)
+    row = summary.iloc[0]
+    assert row["structure"] == "cubo"
+    assert row["slices"] == 4
+    assert row["points"] == 4000
+    assert row["max_deviation [mm]"] <= tolerance
+    contours = simplified.dicom_struct.ROIContourSequence[0].ContourSequence
+    kept = sum(len(contour.ContourData) // 3 for contour in contours)
+    assert row["removed"] == 4000 - kept
+    assert kept <= 2000
+    for contour in contours:
+        assert contour.NumberOfContourPoints == len(contour.ContourData) // 3
+    original = dense_info.dicom_struct.ROIContourSequence[0]
+    assert len(original.ContourSequence[0].ContourData) == 3000
+
+
+@pytest.mark.parametrize(
+    "new_name, inplace", [(None, True), ("cubo simple", False)]
+)
+# These tests verify the new structures and the modification of the
+# object.
+def test_options(dense_info, new_name, inplace):
+    simplified, _ = dense_info.simplify(
+        "cubo", 0.5, new_name=new_name, inplace=inplace
+    )
+    assert (simplified is dense_info) is inplace
+    names = [
+        roi.ROIName for roi in simplified.dicom_struct.StructureSetROISequence
+    ]
+    index = names.index(new_name or "cubo")
+    contours = simplified.dicom_struct.ROIContourSequence[index]
+    assert len(contours.ContourSequence[0].ContourData) < 3000
+    assert simplified.roi_version(new_name or "cubo") == 1
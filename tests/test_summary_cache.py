@@ -0,0 +1,123 @@
+import os
+from pathlib import Path
+
+from dicomhandler import instrumentation, summary_cache
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.summary_cache import SummaryCache
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import pydicom
+
+import pytest
+
+
+EXAMPLE_PLAN = Path(os.getcwd()) / (
+    "Examples/RP.1.2.276.0.20.1.4.106.968269887716.25132."
+    "1649170861.757182.1.dcm"
+)
+
+
+# This fixture replaces the process-wide cache by an empty one.
+@pytest.fixture()
+def shared_cache():
+    cache = summary_cache.configure()
+    yield cache
+    summary_cache.configure()
+
+
+# This function returns a dataframe of about ``rows`` * 8 bytes.
+def frame(rows):
+    return pd.DataFrame({"value": range(rows)})
+
+
+# This test verifies that the least recently used entries are evicted.
+def test_lru():
+    cache = SummaryCache(max_entries=2)
+    cache.put("a", frame(1))
+    cache.put("b", frame(1))
+    cache.get("a")
+    cache.put("c", frame(1))
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+# This test verifies that the entries are evicted by size.
+def test_max_bytes():
+    size = int(frame(100).memory_usage(deep=True).sum())
+    cache = SummaryCache(max_bytes=2 * size)
+    for key in "abc":
+        cache.put(key, frame(100))
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * size
+    cache.put("big", frame(1000))
+    assert cache.get("big") is None
+    assert len(cache) == 2
+
+
+# This test verifies that the entries are found by a new cache with the
+# same directory and that the directory is bounded.
+def test_directory(tmp_path):
+    cache = SummaryCache(directory=tmp_path)
+    cache.put("a", frame(10))
+    assert_frame_equal(SummaryCache(directory=tmp_path).get("a"), frame(10))
+
+    size = sum(path.stat().st_size for path in tmp_path.glob("*.pkl"))
+    cache = SummaryCache(directory=tmp_path, max_disk_bytes=2 * size)
+    for key in "bcd":
+        cache.put(key, frame(10))
+    assert len(list(tmp_path.glob("*.pkl"))) == 2
+    assert cache.get("d") is not None
+    cache.clear()
+    assert not list(tmp_path.glob("*.pkl"))
+    assert cache.get("d") is None
+
+
+# This test verifies that the limits must be positive.
+def test_raises_limits():
+    with pytest.raises(ValueError):
+        SummaryCache(max_entries=-1)
+
+
+@pytest.mark.parametrize("area", [False, True])
+# These tests verify that the objects with the same plan share the
+# summaries and that a modified plan is summarized again.
+def test_summarize(patients, shared_cache, area):
+    plan = patients("patient_0_p.gz", "test_mlc_to_csv")
+    expected = DicomInfo(plan).summarize_to_dataframe(area=area)
+    with instrumentation.instrument() as registry:
+        df = DicomInfo(plan).summarize_to_dataframe(area=area)
+    assert registry.records[-1].counters["summary_cache_hits"] == 1
+    assert_frame_equal(df, expected)
+
+    point = plan.BeamSequence[0].ControlPointSequence[0]
+    point.GantryAngle = float(point.GantryAngle) + 1.0
+    df = DicomInfo(plan).summarize_to_dataframe(area=area)
+    assert shared_cache.misses == 2
+    if area:
+        angle = expected.loc[0, "gantry_angle"] + 1.0
+        assert df.loc[0, "gantry_angle"] == pytest.approx(angle)
+
+
+# This test verifies that the cache can be disabled.
+def test_disabled(patients):
+    cache = summary_cache.configure(max_entries=0)
+    plan = patients("patient_0_p.gz", "test_mlc_to_csv")
+    DicomInfo(plan).summarize_to_dataframe()
+    DicomInfo(plan).summarize_to_dataframe()
+    assert (cache.hits, len(cache)) == (0, 0)
+    summary_cache.configure()
+
+
+# This test verifies that a cache hit does not decode the raw elements
+# of a plan read from a file.
+def test_summarize_raw(shared_cache):
+    DicomInfo(pydicom.dcmread(EXAMPLE_PLAN)).summarize_to_dataframe()
+    plan = pydicom.dcmread(EXAMPLE_PLAN)
+    with instrumentation.instrument() as registry:
+        DicomInfo(plan).summarize_to_dataframe()
+    assert registry.records[-1].counters["summary_cache_hits"] == 1
+    assert plan.get_item("BeamSequence").is_raw
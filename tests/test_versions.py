@@ -0,0 +1,134 @@
+from dicomhandler import instrumentation
+from dicomhandler.report import report
+
+import numpy as np
+
+from pandas.testing import assert_frame_equal
+
+import pydicom
+
+import pytest
+
+
+# This function returns the cache counters recorded during a call.
+def cache_counters(function, *args, **kwargs):
+    with instrumentation.instrument() as registry:
+        function(*args, **kwargs)
+    counters = registry.records[-1].counters
+    return counters.get("cache_hits", 0), counters.get("cache_misses", 0)
+
+
+@pytest.mark.parametrize("area", [False, True])
+# These tests verify that the summary is built once while the plan is
+# not modified and that the returned dataframe can be modified.
+def test_summary(di_1p_fixt, area):
+    dicom_info = di_1p_fixt("patient_0_p.gz", "test_mlc_to_csv")
+    first = dicom_info.summarize_to_dataframe(area=area)
+    first.iloc[0, 0] = -1
+    assert cache_counters(dicom_info.summarize_to_dataframe, area) == (1, 0)
+    second = dicom_info.summarize_to_dataframe(area=area)
+    assert second.iloc[0, 0] != -1
+
+    dicom_info.mark_modified(plan=True)
+    assert dicom_info.plan_version == 1
+    assert cache_counters(dicom_info.summarize_to_dataframe, area)[1] >= 1
+    assert_frame_equal(dicom_info.summarize_to_dataframe(area=area), second)
+
+
+@pytest.mark.parametrize("inplace", [False, True])
+# These tests verify that a movement only invalidates the moved
+# structure.
+def test_move(di_1p_fixt, inplace):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    names = [
+        roi.ROIName for roi in dicom_info.dicom_struct.StructureSetROISequence
+    ]
+    points = {name: dicom_info._roi_points(name) for name in names}
+    moved = dicom_info.move("cubo", 10.0, "x", inplace=inplace)
+    assert moved.roi_version("cubo") == 1
+    assert all(moved.roi_version(name) == 0 for name in names[1:])
+    assert dicom_info.roi_version("cubo") == (1 if inplace else 0)
+    for name in names:
+        cached = moved._roi_points(name) is points[name]
+        assert cached == (name != "cubo")
+    assert np.allclose(moved._roi_points("cubo"), points["cubo"] + [10, 0, 0])
+
+
+# This test verifies that a new structure leaves the original one
+# cached.
+def test_new_name(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    points = dicom_info._roi_points("cubo")
+    moved = dicom_info.add_margin("cubo", 1.0, new_name="cubo+1")
+    assert moved.roi_version("cubo+1") == 1
+    assert moved.roi_version("cubo") == 0
+    assert moved._roi_points("cubo") is points
+    assert not np.array_equal(moved._roi_points("cubo+1"), points)
+    assert "cubo+1" not in [
+        roi.ROIName for roi in dicom_info.dicom_struct.StructureSetROISequence
+    ]
+
+
+# This test verifies that the report uses the updated points.
+def test_report(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    report(dicom_info, dicom_info, "cubo")
+    moved = dicom_info.move("cubo", 10.0, "x")
+    df = report(dicom_info, moved, "cubo")
+    distance = df.set_index("Parameter").loc[
+        "Distance between center mass", "Value [mm]"
+    ]
+    assert distance == pytest.approx(10.0)
+
+
+# This test verifies that the points are read-only.
+def test_frozen(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    with pytest.raises(ValueError):
+        dicom_info._roi_points("cubo")[0, 0] = 0.0
+
+
+# This test verifies that a direct modification is seen after
+# mark_modified.
+def test_mark_modified(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    before = dicom_info._centroid("cubo").copy()
+    for contour in dicom_info.dicom_struct.ROIContourSequence[
+        0
+    ].ContourSequence:
+        contour.ContourData = [
+            value + 1.0 if i % 3 == 0 else value
+            for i, value in enumerate(contour.ContourData)
+        ]
+    assert np.array_equal(dicom_info._centroid("cubo"), before)
+    dicom_info.mark_modified()
+    assert dicom_info.roi_version("cubo") == 1
+    assert dicom_info._centroid("cubo")[0] == pytest.approx(before[0] + 1.0)
+
+
+# This test verifies that save encodes the modified structures in a
+# copy, so the object keeps its values and derived results.
+def test_save(di_1p_fixt, tmp_path):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    contour = dicom_info.dicom_struct.ROIContourSequence[0].ContourSequence[0]
+    contour.ContourData = [value + 0.123456 for value in contour.ContourData]
+    dicom_info.mark_modified(["cubo"])
+    before = dicom_info._roi_points("cubo")
+    (path,) = dicom_info.save(tmp_path, precision=3)
+    assert dicom_info.roi_version("cubo") == 1
+    assert dicom_info._roi_points("cubo") is before
+    assert not contour.get_item("ContourData").is_raw
+    saved = pydicom.dcmread(path).ROIContourSequence[0].ContourSequence[0]
+    assert np.allclose(saved.ContourData, contour.ContourData, atol=0.5)
+    assert saved.ContourData != contour.ContourData
+
+
+# This test verifies that the structures encoded by a transformation
+# are not encoded again by save.
+def test_save_encoded(di_1p_fixt, tmp_path):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    moved = dicom_info.move("cubo", 0.123456, "x", precision=3)
+    before = moved._roi_points("cubo")
+    moved.save(tmp_path, precision=3)
+    assert moved.roi_version("cubo") == 1
+    assert moved._roi_points("cubo") is before